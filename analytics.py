@@ -0,0 +1,192 @@
+# File: analytics.py
+
+"""Booking analytics: incremental time-bucketed rollups and trend queries.
+
+``booking_rollups`` holds booking counts and summed completion time per
+bucket and status. There are three series: hourly and daily per service,
+and daily per mechanic. A booking counts in the bucket it was *created* in,
+under its *current* status, so a bucket's acceptance and completion numbers
+settle as its bookings are answered.
+
+``refresh_rollups`` walks bookings in ``(updated_at, id)`` order from a
+stored cursor. Every UTC day that a changed booking was created on is
+rebuilt from the raw rows, archived bookings included. Rebuilding whole
+days keeps the rollups exact and idempotent: running it twice, or after a
+crash, gives the same rows. Rows
+changed within the last ``settle`` seconds are left for the next run, so a
+transaction that has not committed yet is never skipped.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, tuple_, union_all
+
+from db_helpers import upsert
+from models import db, ArchivedBooking, Booking, BookingRollup, RollupCursor
+from scheduler import heartbeat
+
+CURSOR_NAME = "booking_rollups"
+PERIODS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Largest number of buckets one trends() call returns
+MAX_TREND_BUCKETS = 2000
+
+# Booking statuses that mean a mechanic took the job
+_ACCEPTED = ("Accepted", "Completed")
+
+
+def floor_to(period, ts):
+    if period == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return datetime(ts.year, ts.month, ts.day)
+
+
+def _day_rows(day):
+    """Rollup rows for bookings created on ``day``, aggregated from the raw table."""
+    totals = defaultdict(lambda: [0, 0.0])
+    # Archived bookings still count towards the day they were created on
+    bookings = db.session.execute(union_all(*(
+        select(model.service_id, model.mechanic_id, model.status, model.created_at, model.updated_at)
+        .where(model.created_at >= day, model.created_at < day + PERIODS["day"])
+        for model in (Booking, ArchivedBooking)
+    )))
+    for service_id, mechanic_id, status, created_at, updated_at in bookings:
+        status = status or "Pending"
+        seconds = 0.0
+        if status == "Completed" and updated_at:
+            seconds = max((updated_at - created_at).total_seconds(), 0.0)
+        for key in (("hour", "service", floor_to("hour", created_at), service_id or 0),
+                    ("day", "service", day, service_id or 0),
+                    ("day", "mechanic", day, mechanic_id or 0)):
+            entry = totals[key + (status,)]
+            entry[0] += 1
+            entry[1] += seconds
+    return [
+        {"period": period, "dimension": dimension, "bucket": bucket, "key": key,
+         "status": status, "bookings": count, "completion_seconds": seconds}
+        for (period, dimension, bucket, key, status), (count, seconds) in totals.items()
+    ]
+
+
+def rebuild_day(day):
+    """Replace every rollup row of ``day`` (hourly and daily); the caller commits."""
+    db.session.execute(delete(BookingRollup).where(
+        BookingRollup.bucket >= day, BookingRollup.bucket < day + PERIODS["day"]
+    ))
+    rows = _day_rows(day)
+    if rows:
+        db.session.execute(insert(BookingRollup), rows)
+    return len(rows)
+
+
+def rollup_cursor():
+    """The ``(updated_at, id)`` of the last booking folded into the rollups, or None."""
+    row = db.session.execute(
+        select(RollupCursor.updated_at, RollupCursor.row_id).where(RollupCursor.name == CURSOR_NAME)
+    ).first()
+    return tuple(row) if row else None
+
+
+def refresh_rollups(batch_size=5000, settle=30, max_batches=None):
+    """Rebuild the days of bookings changed since the last run; returns days and bookings seen.
+
+    Each batch of ``batch_size`` changed bookings is committed together with
+    the cursor, so a failed run resumes where it stopped. The scheduler lease
+    is renewed after every batch.
+    """
+    horizon = datetime.utcnow() - timedelta(seconds=settle)
+    days = bookings = batches = 0
+    while max_batches is None or batches < max_batches:
+        cursor = rollup_cursor()
+        query = (
+            select(Booking.id, Booking.created_at, Booking.updated_at)
+            .where(Booking.updated_at < horizon)
+            .order_by(Booking.updated_at, Booking.id)
+            .limit(batch_size)
+        )
+        if cursor:
+            query = query.where(tuple_(Booking.updated_at, Booking.id) > tuple_(*cursor))
+        changed = db.session.execute(query).all()
+        if not changed:
+            break
+
+        touched = sorted({floor_to("day", row.created_at) for row in changed if row.created_at})
+        for day in touched:
+            rebuild_day(day)
+        last = changed[-1]
+        upsert(RollupCursor.__table__,
+               [{"name": CURSOR_NAME, "updated_at": last.updated_at, "row_id": last.id}],
+               index_elements=["name"], update_columns=["updated_at", "row_id"])
+        db.session.commit()
+        heartbeat()
+
+        days += len(touched)
+        bookings += len(changed)
+        batches += 1
+        if len(changed) < batch_size:
+            break
+    return {"days": days, "bookings": bookings}
+
+
+def trends(since, until, period="day", service_id=None, mechanic_id=None):
+    """Per-bucket booking counts and rates over ``[since, until)``, oldest first.
+
+    Hourly series exist per service only; ``mechanic_id`` needs ``period="day"``.
+    Buckets without bookings are returned with zero counts.
+    """
+    step = PERIODS[period]
+    dimension, key = ("mechanic", mechanic_id) if mechanic_id is not None else ("service", service_id)
+    if dimension == "mechanic" and period != "day":
+        raise ValueError("Mechanic trends are daily only")
+    start = floor_to(period, since)
+    if (until - start) / step > MAX_TREND_BUCKETS:
+        raise ValueError(f"At most {MAX_TREND_BUCKETS} {period} buckets per request")
+
+    query = (
+        select(BookingRollup.bucket, BookingRollup.status,
+               func.sum(BookingRollup.bookings), func.sum(BookingRollup.completion_seconds))
+        .where(BookingRollup.period == period, BookingRollup.dimension == dimension,
+               BookingRollup.bucket >= start, BookingRollup.bucket < until)
+        .group_by(BookingRollup.bucket, BookingRollup.status)
+    )
+    if key is not None:
+        query = query.where(BookingRollup.key == key)
+
+    by_bucket = defaultdict(lambda: ({}, [0.0]))
+    for bucket, status, count, seconds in db.session.execute(query):
+        statuses, completion = by_bucket[bucket]
+        statuses[status] = int(count)
+        completion[0] += seconds or 0.0
+
+    series = []
+    bucket = start
+    while bucket < until:
+        statuses, completion = by_bucket.get(bucket, ({}, [0.0]))
+        accepted = sum(statuses.get(s, 0) for s in _ACCEPTED)
+        answered = accepted + statuses.get("Rejected", 0)
+        completed = statuses.get("Completed", 0)
+        series.append({
+            "bucket": bucket.isoformat(),
+            "bookings": sum(statuses.values()),
+            "statuses": statuses,
+            "acceptance_rate": round(accepted / answered, 4) if answered else None,
+            "avg_completion_minutes": round(completion[0] / completed / 60, 1) if completed else None,
+        })
+        bucket += step
+    return series
+
+
+def status_totals(since=None):
+    """``{status: bookings}`` from the rollups, archived bookings included.
+
+    With ``since``, only bookings created from the start of that hour on.
+    """
+    period = "day" if since is None else "hour"
+    query = (
+        select(BookingRollup.status, func.sum(BookingRollup.bookings))
+        .where(BookingRollup.period == period, BookingRollup.dimension == "service")
+        .group_by(BookingRollup.status)
+    )
+    if since is not None:
+        query = query.where(BookingRollup.bucket >= floor_to("hour", since))
+    return {status: int(count) for status, count in db.session.execute(query)}
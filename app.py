@@ -1,30 +1,90 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from models import db, User, Mechanic, Service, Booking, mechanic_services, MechanicAvailability,Admin,FraudReport,SystemAudit,UserReport,Notification,Rating
-from datetime import datetime
+from models import db, User, Mechanic, Service, Booking, mechanic_services, Admin,FraudReport,UserReport,Notification,Rating,MechanicAvailabilityOverride,MechanicRiskProfile,ArchivedBooking,BookingDispatchAttempt
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import func, case, select, union_all, update
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
-from math import radians, cos, sin, asin, sqrt
+from math import radians, degrees, cos, sin, asin, sqrt
+from operator import itemgetter
+import heapq
 from flask_socketio import SocketIO, emit, join_room
 import calendar 
 import base64
 import io
 from PIL import Image
 import re
+from urllib.parse import quote
+import atexit
+import logging
+from config import get_config
+from sqlite_tuning import install_sqlite_tuning, wal_checkpoint
+from db_helpers import dialect_insert
+from availability import (
+    parse_day_payload, upsert_availability, upsert_overrides, load_week_masks, load_schedules,
+    save_schedules, week_mask_to_days, day_mask, with_day, intervals_to_day_mask, day_mask_to_intervals,
+    available_at, backfill_schedules_from_legacy, refresh_utc_masks, validate_timezone,
+    default_timezone, local_today, rewindow_overrides, bytes_to_mask, FULL_DAY, FULL_WEEK
+)
+from idempotency import idempotent, purge_expired_keys
+from scheduler import scheduler
+from audit import audit_log, encode_cursor, decode_cursor
+from analytics import refresh_rollups, rollup_cursor, status_totals, trends
+import archive
+import fraud_scoring
+import ratelimit
+import report_dedup
+from search import search, SEARCH_KINDS, SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE
+from metrics import init_metrics, render_metrics
+from query_profiler import query_profiler
+from logging_setup import configure_logging
+from notifications import notification_service, admin_recipients, recipient_of, RECIPIENT_COLUMNS, INBOX_PAGE_SIZE
+from cache import service_catalog, mechanic_profiles, configure_caches, cache_stats
+from serializers import (
+    FastJSONProvider, socketio_json, stream_json_list, stream_ndjson, stream_csv,
+    NEW_BOOKING_EVENT, BOOKING_UPDATED_EVENT, BOOKING, BOOKING_DETAIL,
+    ADMIN_BOOKING, MECHANIC_BOOKING, USER_BOOKING,
+    USER_LIST_ITEM, MECHANIC_LIST_ITEM, ADMIN_MECHANIC_LIST_ITEM,
+    BOOKING_EXPORT, USER_EXPORT, MECHANIC_EXPORT, USER_SEARCH_RESULT, MECHANIC_SEARCH_RESULT
+)
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mech_app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config.from_object(get_config())
+configure_logging(app.config)
+logger = logging.getLogger("mechapp")
 db.init_app(app)
-
-socketio = SocketIO(app, cors_allowed_origins="*")
+with app.app_context():
+    install_sqlite_tuning(db.engine, app.config)
+
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    json=socketio_json,
+    async_mode=app.config["SOCKETIO_ASYNC_MODE"],
+    message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"]
+)
+with app.app_context():
+    init_metrics(app, db.engine, socketio)
+    query_profiler.init_app(app, db.engine)
+notification_service.init_app(socketio)
+audit_log.init_app(app)
+atexit.register(audit_log.flush_on_exit)
+
+configure_caches(app.config.get("CACHE_REDIS_URL"))
 
 # ------------------------
 # Helper functions
 # ------------------------
+EARTH_RADIUS_KM = 6371
+# Radius searches start this small and double until they hold enough matches
+SEARCH_START_RADIUS_KM = 1
+# Dispatch searches this far before falling back to the whole fleet
+DISPATCH_RADIUS_KM = 250
+
 def haversine(lat1, lon1, lat2, lon2):
     # Calculate the great circle distance between two points on the earth (km)
     lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
@@ -32,47 +92,115 @@ def haversine(lat1, lon1, lat2, lon2):
     dlat = lat2 - lat1
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * asin(sqrt(a))
-    km = 6371 * c
+    km = EARTH_RADIUS_KM * c
     return km
 
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing every point within radius_km"""
+    angle = radius_km / EARTH_RADIUS_KM
+    min_lat, max_lat = lat - degrees(angle), lat + degrees(angle)
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle covers a pole: every longitude qualifies
+        return max(min_lat, -90), min(max_lat, 90), -180, 180
+    dlng = degrees(asin(min(sin(angle) / cos(radians(lat)), 1)))
+    if lng - dlng < -180 or lng + dlng > 180:
+        # Crosses the antimeridian; a wider band is cheaper than two boxes
+        return min_lat, max_lat, -180, 180
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+def _mechanics_within(query, lat, lng, radius_km, available_now):
+    query = query.filter(Mechanic.latitude.isnot(None), Mechanic.longitude.isnot(None))
+    if radius_km is not None:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        query = query.filter(
+            Mechanic.latitude.between(min_lat, max_lat),
+            Mechanic.longitude.between(min_lng, max_lng)
+        )
+    candidates = [(haversine(lat, lng, row.latitude, row.longitude), row) for row in query]
+    if radius_km is not None:
+        candidates = [c for c in candidates if c[0] <= radius_km]
+    if available_now:
+        available_ids = available_at([row.id for _, row in candidates], datetime.utcnow())
+        candidates = [c for c in candidates if c[1].id in available_ids]
+    return candidates
+
+def nearest_mechanics(query, lat, lng, radius_km=None, limit=1, available_now=False):
+    """Up to limit (distance_km, row) pairs from a Mechanic query within radius_km, nearest first.
+
+    The query is narrowed to a bounding box on the indexed coordinates and
+    exact distances are only computed inside it. The box starts small and
+    doubles until it holds limit matches, so the rows read depend on local
+    density rather than fleet size. radius_km=None searches everywhere.
+    """
+    radii = [radius_km]
+    if radius_km is not None:
+        radii = []
+        radius = SEARCH_START_RADIUS_KM
+        while radius < radius_km:
+            radii.append(radius)
+            radius *= 2
+        radii.append(radius_km)
+    for radius in radii:
+        candidates = _mechanics_within(query, lat, lng, radius, available_now)
+        # Everything nearer than the limit-th match lies inside this radius too
+        if len(candidates) >= limit:
+            break
+    return heapq.nsmallest(limit, candidates, key=itemgetter(0))
+
+def services_by_mechanic(mechanic_ids=None):
+    """Map mechanic id -> [{"id", "name"}] of offered services in a single query."""
+    query = db.session.query(mechanic_services.c.mechanic_id, Service.id, Service.name).join(
+        Service, Service.id == mechanic_services.c.service_id
+    )
+    if mechanic_ids is not None:
+        query = query.filter(mechanic_services.c.mechanic_id.in_(mechanic_ids))
+
+    result = {}
+    for mechanic_id, service_id, service_name in query:
+        result.setdefault(mechanic_id, []).append({"id": service_id, "name": service_name})
+    return result
+
+def find_nearest_available_mechanic(service_id, lat, lng, exclude_ids=()):
+    """Nearest active mechanic offering the service who is available right now, or None"""
+    # Active mechanics offering this service inside a growing radius, then a
+    # bit test of the current UTC 15-minute slot against each one's
+    # precomputed UTC mask (or an override window covering now). Mechanics'
+    # local days are already folded into the UTC index, so no per-candidate
+    # timezone math here. Past DISPATCH_RADIUS_KM the whole fleet is searched.
+    query = db.session.query(Mechanic).join(
+        mechanic_services, mechanic_services.c.mechanic_id == Mechanic.id
+    ).filter(
+        mechanic_services.c.service_id == service_id,
+        Mechanic.status == 'active'
+    )
+    if exclude_ids:
+        query = query.filter(Mechanic.id.notin_(exclude_ids))
+
+    found = nearest_mechanics(query, lat, lng, DISPATCH_RADIUS_KM, available_now=True)
+    if not found:
+        found = nearest_mechanics(query, lat, lng, available_now=True)
+    return found[0][1] if found else None
+
 # --- Helper: send booking event to mechanic's Socket.IO room ---
 def send_new_booking_to_mechanic(booking):
     mechanic_room = f"mechanic_{booking.mechanic_id}"
     
-    socketio.emit("NEW_BOOKING", {
-        "id": booking.id,
-        "type": booking.type,
-        "location": booking.location,
-        "latitude": booking.latitude,
-        "longitude": booking.longitude,
-        "status": booking.status,
-        "customer": {"id": booking.customer.id, "name": booking.customer.name, "phone": booking.customer.phone},
-        "service": {"id": booking.service.id, "name": booking.service.name} if booking.service else None,
-        "created_at": booking.created_at.isoformat() if booking.created_at else None
-    }, room=mechanic_room, namespace="/")
+    socketio.emit("NEW_BOOKING", NEW_BOOKING_EVENT.dump(booking), room=mechanic_room, namespace="/")
 
 # --- NEW HELPER: Send updated booking event to clients ---
-def send_booking_update_to_client(booking):
+def send_booking_update_to_client(booking, previous_mechanic_id=None):
     mechanic_room = f"mechanic_{booking.mechanic_id}"
     customer_room = f"user_{booking.customer_id}"
 
-    booking_data = {
-        "id": booking.id,
-        "type": booking.type,
-        "location": booking.location,
-        "latitude": booking.latitude,
-        "longitude": booking.longitude,
-        "status": booking.status,
-        "customer": {"id": booking.customer.id, "name": booking.customer.name, "phone": booking.customer.phone},
-        "service": {"id": booking.service.id, "name": booking.service.name} if booking.service else None,
-        "mechanic": {"id": booking.mechanic.id, "name": booking.mechanic.name, "phone": booking.mechanic.phone} if booking.mechanic else None,
-        "updated_at": booking.updated_at.isoformat() if booking.updated_at else None
-    }
+    booking_data = BOOKING_UPDATED_EVENT.dump(booking)
     
     # Broadcast to mechanic's room and customer's room
     socketio.emit("BOOKING_UPDATED", booking_data, room=mechanic_room, namespace="/")
     socketio.emit("BOOKING_UPDATED", booking_data, room=customer_room, namespace="/")
-    print(f"✅ BOOKING_UPDATED broadcasted for ID: {booking.id}, Status: {booking.status}")
+    if previous_mechanic_id and previous_mechanic_id != booking.mechanic_id:
+        # The mechanic it was taken from drops it from their list
+        socketio.emit("BOOKING_UPDATED", booking_data, room=f"mechanic_{previous_mechanic_id}", namespace="/")
+    logger.info("BOOKING_UPDATED broadcast", extra={"booking_id": booking.id, "status": booking.status})
 
 # ------------------------
 # Routes
@@ -117,9 +245,10 @@ def get_admin_stats():
     try:
         total_users = User.query.count()
         total_mechanics = Mechanic.query.count()
-        total_bookings = Booking.query.count()
+        archived = archive.status_counts()
+        total_bookings = Booking.query.count() + sum(archived.values())
         pending_bookings = Booking.query.filter_by(status='Pending').count()
-        completed_bookings = Booking.query.filter_by(status='Completed').count()
+        completed_bookings = Booking.query.filter_by(status='Completed').count() + archived.get('Completed', 0)
         
         seven_days_ago = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         recent_bookings = Booking.query.filter(Booking.created_at >= seven_days_ago).count()
@@ -134,89 +263,77 @@ def get_admin_stats():
                 "recent_bookings": recent_bookings
             }
         }), 200
-    except Exception as e:
-        print(f"Error getting admin stats: {e}")
+    except Exception:
+        logger.exception("Error getting admin stats")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/users", methods=["GET"])
 def get_all_users():
     try:
-        users = User.query.all()
-        result = []
-        for user in users:
-            result.append({
-                "id": user.id,
-                "name": user.name,
-                "email": user.email,
-                "phone": user.phone,
-                "status": user.status,
-                "created_at": user.created_at.isoformat() if user.created_at else None,
-                "bookings_count": len(user.bookings)
-            })
-        return jsonify(result), 200
-    except Exception as e:
-        print(f"Error getting users: {e}")
+        users = db.session.query(
+            User.id, User.name, User.email, User.phone, User.status, User.created_at,
+            User.bookings_count.label("bookings_count")
+        )
+        return jsonify(USER_LIST_ITEM.dump_many(users)), 200
+    except Exception:
+        logger.exception("Error getting users")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/mechanics", methods=["GET"])
 def get_all_mechanics_admin():
     try:
-        mechanics = Mechanic.query.all()
+        all_bookings = union_all(
+            select(Booking.mechanic_id, Booking.status),
+            select(ArchivedBooking.mechanic_id, ArchivedBooking.status)
+        ).subquery()
+        booking_counts = db.session.query(
+            all_bookings.c.mechanic_id,
+            func.count().label("total_bookings"),
+            func.count(case((all_bookings.c.status == 'Completed', 1))).label("completed_bookings")
+        ).group_by(all_bookings.c.mechanic_id).subquery()
+
+        mechanics = db.session.query(
+            Mechanic.id, Mechanic.name, Mechanic.email, Mechanic.phone,
+            Mechanic.garage_name, Mechanic.garage_location, Mechanic.status, Mechanic.created_at,
+            func.coalesce(booking_counts.c.total_bookings, 0).label("total_bookings"),
+            func.coalesce(booking_counts.c.completed_bookings, 0).label("completed_bookings")
+        ).outerjoin(booking_counts, booking_counts.c.mechanic_id == Mechanic.id).all()
+
+        services = services_by_mechanic()
         result = []
         for mechanic in mechanics:
-            total_bookings = Booking.query.filter_by(mechanic_id=mechanic.id).count()
-            completed_bookings = Booking.query.filter_by(mechanic_id=mechanic.id, status='Completed').count()
-            
-            result.append({
-                "id": mechanic.id,
-                "name": mechanic.name,
-                "email": mechanic.email,
-                "phone": mechanic.phone,
-                "garage_name": mechanic.garage_name,
-                "garage_location": mechanic.garage_location,
-                "status": mechanic.status,
-                "created_at": mechanic.created_at.isoformat() if mechanic.created_at else None,
-                "total_bookings": total_bookings,
-                "completed_bookings": completed_bookings,
-                "services_offered": [{"id": s.id, "name": s.name} for s in mechanic.services]
-            })
+            data = ADMIN_MECHANIC_LIST_ITEM.dump(mechanic)
+            data["services_offered"] = services.get(mechanic.id, [])
+            result.append(data)
         return jsonify(result), 200
-    except Exception as e:
-        print(f"Error getting mechanics: {e}")
+    except Exception:
+        logger.exception("Error getting mechanics")
         return jsonify({"error": "Internal server error"}), 500
 
+def include_archived():
+    """True when a history endpoint should also read archived bookings (?include_archived=1)"""
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+def booking_history(bookings, archived):
+    """``bookings``, merged newest first with ``archived`` when the request includes archived bookings.
+
+    Both queries must be ordered by created_at descending.
+    """
+    if include_archived():
+        return archive.newest_first(bookings.yield_per(500), archived.yield_per(500))
+    return bookings.yield_per(500)
+
 @app.route("/admin/bookings", methods=["GET"])
 def get_all_bookings_admin():
+    """All bookings, newest first (?include_archived=)"""
     try:
-        bookings = Booking.query.options(joinedload(Booking.customer), joinedload(Booking.mechanic), joinedload(Booking.service)).order_by(Booking.created_at.desc()).all()
-        
-        result = []
-        for booking in bookings:
-            result.append({
-                "id": booking.id,
-                "type": booking.type,
-                "location": booking.location,
-                "status": booking.status,
-                "created_at": booking.created_at.isoformat() if booking.created_at else None,
-                "updated_at": booking.updated_at.isoformat() if booking.updated_at else None,
-                "customer": {
-                    "id": booking.customer.id,
-                    "name": booking.customer.name,
-                    "phone": booking.customer.phone
-                },
-                "mechanic": {
-                    "id": booking.mechanic.id,
-                    "name": booking.mechanic.name,
-                    "phone": booking.mechanic.phone
-                } if booking.mechanic else None,
-                "service": {
-                    "id": booking.service.id,
-                    "name": booking.service.name
-                } if booking.service else None
-            })
-        return jsonify(result), 200
-    except Exception as e:
-        print(f"Error getting bookings: {e}")
+        bookings = Booking.query.options(joinedload(Booking.customer), joinedload(Booking.mechanic), joinedload(Booking.service)).order_by(Booking.created_at.desc())
+        archived = ArchivedBooking.query.options(
+            joinedload(ArchivedBooking.customer), joinedload(ArchivedBooking.mechanic), joinedload(ArchivedBooking.service)
+        ).order_by(ArchivedBooking.created_at.desc())
+        return stream_json_list(booking_history(bookings, archived), ADMIN_BOOKING), 200
+    except Exception:
+        logger.exception("Error getting bookings")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/users/<int:user_id>/status", methods=["PUT"])
@@ -235,9 +352,9 @@ def update_user_status(user_id):
         db.session.commit()
         
         return jsonify({"message": f"User {new_status} successfully"}), 200
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error updating user status: {e}")
+        logger.exception("Error updating user status")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/mechanics/<int:mechanic_id>/status", methods=["PUT"])
@@ -254,11 +371,234 @@ def update_mechanic_status(mechanic_id):
             
         mechanic.status = new_status
         db.session.commit()
+        mechanic_profiles.invalidate(mechanic_id)
         
         return jsonify({"message": f"Mechanic {new_status} successfully"}), 200
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error updating mechanic status: {e}")
+        logger.exception("Error updating mechanic status")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/admin/mechanics/availability", methods=["POST"])
+def bulk_set_mechanic_availability():
+    """Set weekly days or date overrides for many mechanics at once (e.g. public-holiday closures)"""
+    data = request.json or {}
+    days = data.get('days')
+    dates = data.get('dates')
+    if dates is None:
+        if not isinstance(days, list):
+            return jsonify({"error": "Invalid data format. Expected 'days' as a list of day objects or 'dates'."}), 400
+        day_values = parse_day_payload(days)
+        if not day_values:
+            return jsonify({"error": "No valid days provided"}), 400
+    elif not isinstance(dates, list) or not dates:
+        return jsonify({"error": "'dates' must be a non-empty list of YYYY-MM-DD strings"}), 400
+
+    try:
+        if dates is not None:
+            override_dates = [date.fromisoformat(d) for d in dates]
+            override_slots = parse_override_slots(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid override: {e}"}), 400
+
+    try:
+        if data.get('all_mechanics'):
+            mechanic_ids = [row.id for row in db.session.query(Mechanic.id)]
+        else:
+            requested_ids = data.get('mechanic_ids')
+            if not isinstance(requested_ids, list) or not requested_ids:
+                return jsonify({"error": "Provide 'mechanic_ids' or set 'all_mechanics'"}), 400
+            mechanic_ids = [row.id for row in db.session.query(Mechanic.id).filter(Mechanic.id.in_(requested_ids))]
+
+        if dates is not None:
+            # Date-specific overrides, e.g. a public holiday for everyone
+            updated = upsert_overrides(mechanic_ids, override_dates, override_slots, data.get('reason'))
+        else:
+            updated = upsert_availability(mechanic_ids, day_values)
+        db.session.commit()
+
+        return jsonify({
+            "message": "Availability updated successfully",
+            "mechanics_updated": len(mechanic_ids),
+            "records_written": updated
+        }), 200
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error bulk setting availability")
+        return jsonify({"error": "Failed to update availability"}), 500
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape endpoint (this worker's metrics)"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/jobs", methods=["GET"])
+def get_job_stats():
+    """Run metrics for the background job scheduler"""
+    return jsonify(dict(scheduler.stats(), audit_log=audit_log.stats())), 200
+
+@app.route("/admin/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """Hit/miss counters for the read-through caches"""
+    return jsonify({"caches": cache_stats()}), 200
+
+@app.route("/admin/search", methods=["GET"])
+def admin_search():
+    """Ranked prefix search over users and mechanics (?q=&type=user|mechanic&page=&per_page=)"""
+    try:
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('type')
+        if not query:
+            return jsonify({"error": "q is required"}), 400
+        if kind and kind not in SEARCH_KINDS:
+            return jsonify({"error": "type must be user or mechanic"}), 400
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', SEARCH_PAGE_SIZE, type=int), 1), MAX_SEARCH_PAGE_SIZE)
+
+        # One extra hit tells whether another page exists
+        hits = search(query, kind=kind, limit=per_page + 1, offset=(page - 1) * per_page)
+        has_more = len(hits) > per_page
+        hits = hits[:per_page]
+
+        ids = {"user": [], "mechanic": []}
+        for hit_kind, hit_id, _ in hits:
+            ids[hit_kind].append(hit_id)
+        rows = {}
+        if ids["user"]:
+            users = db.session.query(
+                User.id, User.name, User.email, User.phone, User.status
+            ).filter(User.id.in_(ids["user"]))
+            rows.update((("user", u.id), USER_SEARCH_RESULT.dump(u)) for u in users)
+        if ids["mechanic"]:
+            mechanics = db.session.query(
+                Mechanic.id, Mechanic.name, Mechanic.email, Mechanic.phone,
+                Mechanic.garage_name, Mechanic.garage_location, Mechanic.status
+            ).filter(Mechanic.id.in_(ids["mechanic"]))
+            rows.update((("mechanic", m.id), MECHANIC_SEARCH_RESULT.dump(m)) for m in mechanics)
+
+        results = []
+        for hit_kind, hit_id, score in hits:
+            row = rows.get((hit_kind, hit_id))
+            if row:
+                results.append(dict(row, type=hit_kind, score=score))
+        return jsonify({
+            "results": results,
+            "page": page,
+            "per_page": per_page,
+            "has_more": has_more
+        }), 200
+    except Exception:
+        logger.exception("Error searching")
+        return jsonify({"error": "Internal server error"}), 500
+
+# ------------------------
+# Admin exports
+# ------------------------
+# Rows fetched per round trip; memory stays flat however many rows are exported
+EXPORT_YIELD_PER = 1000
+
+def export_filters(query, model):
+    """Apply ?since=&until=&status= to an export query; raises ValueError on bad dates."""
+    since = request.args.get('since')
+    until = request.args.get('until')
+    if since:
+        query = query.filter(model.created_at >= datetime.fromisoformat(since))
+    if until:
+        query = query.filter(model.created_at < datetime.fromisoformat(until))
+    status = request.args.get('status')
+    if status:
+        query = query.filter(model.status == status)
+    return query
+
+def export_response(query, schema, name, archived_query=None):
+    """Stream ``query`` as ?format=ndjson (default) or csv, as a file download.
+
+    ``archived_query``, when given, is merged in by id; both must be ordered by id.
+    """
+    rows = query.yield_per(EXPORT_YIELD_PER)
+    if archived_query is not None:
+        rows = archive.in_id_order(rows, archived_query.yield_per(EXPORT_YIELD_PER))
+    export_format = request.args.get('format', 'ndjson')
+    if export_format == 'csv':
+        response = stream_csv(rows, schema)
+    elif export_format == 'ndjson':
+        response = stream_ndjson(rows, schema)
+    else:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+def booking_export_query(model):
+    """Export rows of ``model`` (Booking or ArchivedBooking) with the request's filters, by id."""
+    bookings = db.session.query(
+        model.id, model.type, model.status, model.location,
+        model.latitude, model.longitude, model.created_at, model.updated_at,
+        model.customer_id, User.name.label("customer_name"),
+        model.mechanic_id, Mechanic.name.label("mechanic_name"),
+        model.service_id, Service.name.label("service_name")
+    ).join(User, User.id == model.customer_id
+    ).outerjoin(Mechanic, Mechanic.id == model.mechanic_id
+    ).outerjoin(Service, Service.id == model.service_id)
+    bookings = export_filters(bookings, model)
+    for param, column in (('mechanic_id', model.mechanic_id), ('service_id', model.service_id),
+                          ('customer_id', model.customer_id)):
+        value = request.args.get(param, type=int)
+        if value is not None:
+            bookings = bookings.filter(column == value)
+    return bookings.order_by(model.id)
+
+@app.route("/admin/export/bookings", methods=["GET"])
+def export_bookings():
+    """Stream bookings (?format=&since=&until=&status=&mechanic_id=&service_id=&customer_id=&include_archived=)"""
+    try:
+        try:
+            bookings = booking_export_query(Booking)
+            archived = booking_export_query(ArchivedBooking) if include_archived() else None
+        except ValueError:
+            return jsonify({"error": "Invalid since or until"}), 400
+        return export_response(bookings, BOOKING_EXPORT, "bookings", archived)
+    except Exception:
+        logger.exception("Error exporting bookings")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/admin/export/users", methods=["GET"])
+def export_users():
+    """Stream users (?format=&since=&until=&status=)"""
+    try:
+        users = db.session.query(
+            User.id, User.name, User.email, User.phone, User.status, User.created_at
+        )
+        try:
+            users = export_filters(users, User)
+        except ValueError:
+            return jsonify({"error": "Invalid since or until"}), 400
+        return export_response(users.order_by(User.id), USER_EXPORT, "users")
+    except Exception:
+        logger.exception("Error exporting users")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/admin/export/mechanics", methods=["GET"])
+def export_mechanics():
+    """Stream mechanics (?format=&since=&until=&status=&service_id=)"""
+    try:
+        mechanics = db.session.query(
+            Mechanic.id, Mechanic.name, Mechanic.email, Mechanic.phone,
+            Mechanic.garage_name, Mechanic.garage_location,
+            Mechanic.latitude, Mechanic.longitude, Mechanic.status, Mechanic.created_at
+        )
+        try:
+            mechanics = export_filters(mechanics, Mechanic)
+        except ValueError:
+            return jsonify({"error": "Invalid since or until"}), 400
+        service_id = request.args.get('service_id', type=int)
+        if service_id is not None:
+            mechanics = mechanics.join(
+                mechanic_services, mechanic_services.c.mechanic_id == Mechanic.id
+            ).filter(mechanic_services.c.service_id == service_id)
+        return export_response(mechanics.order_by(Mechanic.id), MECHANIC_EXPORT, "mechanics")
+    except Exception:
+        logger.exception("Error exporting mechanics")
         return jsonify({"error": "Internal server error"}), 500
 
 # -------- Users --------
@@ -298,8 +638,8 @@ def create_user():
                     # Convert back to base64 for storage
                     profile_picture_url = f"data:image/jpeg;base64,{base64.b64encode(processed_image_data).decode('utf-8')}"
                     
-                except Exception as e:
-                    print(f"Error processing profile picture: {e}")
+                except Exception:
+                    logger.exception("Error processing profile picture")
                     return jsonify({"error": "Invalid image format"}), 400
             else:
                 # Assume it's already a URL or simple string
@@ -397,29 +737,18 @@ def get_user(user_id):
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        user_data = {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "phone": user.phone,
-            "profile_picture": user.profile_picture,
-            "status": user.status,
-            "created_at": user.created_at.isoformat() if user.created_at else None,
-            "membership": "Premium Member",
-            "bookings_count": len(user.bookings) if user.bookings else 0
-        }
-        
-        return jsonify(user_data), 200
+        return jsonify(user.to_dict()), 200
         
-    except Exception as e:
-        print(f"Error fetching user: {e}")
+    except Exception:
+        logger.exception("Error fetching user")
         return jsonify({"error": "Internal server error"}), 500
 
 # -------- Services --------
 @app.route("/services", methods=["GET"])
 def get_services():
-    services = Service.query.all()
-    result = [{"id": s.id, "name": s.name} for s in services]
+    result = service_catalog.get_or_load(
+        "all", lambda: [{"id": s.id, "name": s.name} for s in Service.query.all()]
+    )
     return jsonify(result)
 
 @app.route("/services", methods=["POST"])
@@ -428,32 +757,79 @@ def create_service():
     service = Service(name=data['name'])
     db.session.add(service)
     db.session.commit()
+    service_catalog.clear()
     return jsonify({"message": "Service created", "service": {"id": service.id, "name": service.name}}), 201
 
 # -------- Mechanics --------
 @app.route("/mechanics", methods=["GET"])
 def get_mechanics():
-    mechanics = Mechanic.query.all()
+    mechanics = db.session.query(
+        Mechanic.id, Mechanic.name, Mechanic.email, Mechanic.phone, Mechanic.profile_picture,
+        Mechanic.garage_name, Mechanic.garage_location, Mechanic.latitude, Mechanic.longitude,
+        Mechanic.status
+    ).all()
+
+    services = services_by_mechanic()
     result = []
     for m in mechanics:
-        result.append({
-            "id": m.id,
-            "name": m.name,
-            "email": m.email,
-            "phone": m.phone,
-            "profile_picture": m.profile_picture,
-            "garage_name": m.garage_name,
-            "garage_location": m.garage_location,
-            "latitude": m.latitude,
-            "longitude": m.longitude,
-            "status": m.status,
-            "services_offered": [{"id": s.id, "name": s.name} for s in m.services]
-        })
+        data = MECHANIC_LIST_ITEM.dump(m)
+        data["services_offered"] = services.get(m.id, [])
+        result.append(data)
     return jsonify(result)
 
+NEARBY_DEFAULT_RADIUS_KM = 10
+NEARBY_MAX_RADIUS_KM = 200
+NEARBY_DEFAULT_LIMIT = 20
+NEARBY_MAX_LIMIT = 100
+
+@app.route("/mechanics/nearby", methods=["GET"])
+def get_nearby_mechanics():
+    """Nearest active mechanics (?lat=&lng=&radius_km=&service_id=&available_now=&limit=)"""
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({"error": "Valid lat and lng are required"}), 400
+    radius_km = request.args.get('radius_km', NEARBY_DEFAULT_RADIUS_KM, type=float)
+    if not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        return jsonify({"error": f"radius_km must be between 0 and {NEARBY_MAX_RADIUS_KM}"}), 400
+    limit = min(max(request.args.get('limit', NEARBY_DEFAULT_LIMIT, type=int), 1), NEARBY_MAX_LIMIT)
+    service_id = request.args.get('service_id', type=int)
+    available_now = request.args.get('available_now', '').lower() in ('1', 'true', 'yes')
+
+    query = db.session.query(
+        Mechanic.id, Mechanic.name, Mechanic.email, Mechanic.phone, Mechanic.profile_picture,
+        Mechanic.garage_name, Mechanic.garage_location, Mechanic.latitude, Mechanic.longitude,
+        Mechanic.status
+    ).filter(Mechanic.status == 'active')
+    if service_id is not None:
+        query = query.join(
+            mechanic_services, mechanic_services.c.mechanic_id == Mechanic.id
+        ).filter(mechanic_services.c.service_id == service_id)
+    nearest = nearest_mechanics(query, lat, lng, radius_km, limit=limit, available_now=available_now)
+
+    ids = [m.id for _, m in nearest]
+    services = services_by_mechanic(ids) if ids else {}
+    ratings = archive.rating_totals(ids) if ids else {}
+
+    result = []
+    for distance, m in nearest:
+        data = MECHANIC_LIST_ITEM.dump(m)
+        total, count = ratings.get(m.id, (0, 0))
+        data["distance_km"] = round(distance, 2)
+        data["average_rating"] = round(total / count, 1) if count else None
+        data["total_ratings"] = count
+        data["services_offered"] = services.get(m.id, [])
+        result.append(data)
+    return jsonify({"mechanics": result, "count": len(result)}), 200
+
 @app.route("/mechanics", methods=["POST"])
 def create_mechanic():
     data = request.json
+    try:
+        mechanic_timezone = validate_timezone(data.get('timezone') or default_timezone())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         mechanic = Mechanic(
             name=data['name'],
@@ -480,14 +856,11 @@ def create_mechanic():
         if service:
             mechanic.services.append(service)
     
-    # Initialize availability for the new mechanic (default all days True)
-    default_availability = [
-        MechanicAvailability(mechanic_id=mechanic.id, day_of_week=day, is_available=True)
-        for day in calendar.day_name
-    ]
-    db.session.add_all(default_availability)
+    # Initialize availability for the new mechanic (default: every slot of every day)
+    save_schedules({mechanic.id: (FULL_WEEK, mechanic_timezone)})
     
     db.session.commit()
+    mechanic_profiles.invalidate(mechanic.id)
 
     return jsonify({
         "message": "Mechanic created",
@@ -507,33 +880,39 @@ def create_mechanic():
 
 @app.route("/mechanics/<int:mechanic_id>", methods=["GET"])
 def get_mechanic(mechanic_id):
+    profile = mechanic_profiles.get_or_load(mechanic_id, lambda: load_mechanic_profile(mechanic_id))
+    if profile is None:
+        return jsonify({"error": "Mechanic not found"}), 404
+
+    return jsonify({"mechanic": profile})
+
+def load_mechanic_profile(mechanic_id):
+    """Build the public mechanic profile (cached in mechanic_profiles)."""
     mechanic = Mechanic.query.get(mechanic_id)
     if not mechanic:
-        return jsonify({"error": "Mechanic not found"}), 404
+        return None
 
     jobs_completed = Booking.query.filter_by(
         mechanic_id=mechanic_id, 
         status="Completed"
-    ).count()
-
-    return jsonify({
-        "mechanic": {
-            "id": mechanic.id,
-            "name": mechanic.name,
-            "email": mechanic.email,
-            "phone": mechanic.phone,
-            "profile_picture": mechanic.profile_picture,
-            "garage_name": mechanic.garage_name,
-            "garage_location": mechanic.garage_location,
-            "latitude": mechanic.latitude,
-            "longitude": mechanic.longitude,
-            "status": mechanic.status,
-            "services_offered": [{"id": s.id, "name": s.name} for s in mechanic.services],
-            "jobsCompleted": jobs_completed,
-            "rating": 4.8, 
-            "aboutShop": f"Professional auto services at {mechanic.garage_location}" if mechanic.garage_location else "Professional auto services"
-        }
-    })
+    ).count() + archive.status_counts(mechanic_id=mechanic_id).get("Completed", 0)
+
+    return {
+        "id": mechanic.id,
+        "name": mechanic.name,
+        "email": mechanic.email,
+        "phone": mechanic.phone,
+        "profile_picture": mechanic.profile_picture,
+        "garage_name": mechanic.garage_name,
+        "garage_location": mechanic.garage_location,
+        "latitude": mechanic.latitude,
+        "longitude": mechanic.longitude,
+        "status": mechanic.status,
+        "services_offered": [{"id": s.id, "name": s.name} for s in mechanic.services],
+        "jobsCompleted": jobs_completed,
+        "rating": 4.8, 
+        "aboutShop": f"Professional auto services at {mechanic.garage_location}" if mechanic.garage_location else "Professional auto services"
+    }
 
 # -------- Mechanic Availability Routes --------
 @app.route("/mechanics/<int:mechanic_id>/availability", methods=["GET"])
@@ -542,27 +921,9 @@ def get_mechanic_availability(mechanic_id):
     if not mechanic:
         return jsonify({"error": "Mechanic not found"}), 404
 
-    availability = MechanicAvailability.query.filter_by(mechanic_id=mechanic_id).all()
-    
-    # Map the database results to the desired frontend format
-    result = {
-        item.day_of_week: item.is_available
-        for item in availability
-    }
-    
-    # Ensure all days are returned, even if not explicitly set (defaults to True)
-    for day in calendar.day_name:
-        if day not in result:
-             # Default to True if the day isn't found in the database
-            result[day] = True 
-            
-    # Convert back to the list structure used by the frontend for consistency
-    frontend_format = [
-        {"day": day, "is_available": result[day]}
-        for day in calendar.day_name
-    ]
-        
-    return jsonify(frontend_format), 200
+    # Day-level compatibility view of the slot schedule (a day is available if any slot is)
+    week_mask = load_week_masks([mechanic_id])[mechanic_id]
+    return jsonify(week_mask_to_days(week_mask)), 200
 
 @app.route("/mechanics/<int:mechanic_id>/availability", methods=["POST"])
 def set_mechanic_availability(mechanic_id):
@@ -576,40 +937,119 @@ def set_mechanic_availability(mechanic_id):
         return jsonify({"error": "Invalid data format. Expected a list of day objects."}), 400
 
     try:
-        for day_data in data:
-            day_name = day_data.get('day')
-            is_available = day_data.get('is_available')
-
-            if day_name not in calendar.day_name or is_available is None:
-                continue # Skip invalid entries
-
-            # Find or create the availability record
-            availability_record = MechanicAvailability.query.filter_by(
-                mechanic_id=mechanic_id, 
-                day_of_week=day_name
-            ).first()
-
-            if availability_record:
-                # Update existing record
-                availability_record.is_available = is_available
-            else:
-                # Create new record
-                new_record = MechanicAvailability(
-                    mechanic_id=mechanic_id, 
-                    day_of_week=day_name, 
-                    is_available=is_available
-                )
-                db.session.add(new_record)
-        
+        # Invalid entries are skipped; all valid days go in one upsert
+        upsert_availability([mechanic_id], parse_day_payload(data))
         db.session.commit()
         return jsonify({"message": "Availability updated successfully"}), 200
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error setting availability: {e}")
+        logger.exception("Error setting availability")
         return jsonify({"error": "Failed to update availability"}), 500
 
+@app.route("/mechanics/<int:mechanic_id>/schedule", methods=["GET"])
+def get_mechanic_schedule(mechanic_id):
+    """Weekly schedule as 15-minute aligned intervals per day"""
+    mechanic = Mechanic.query.get(mechanic_id)
+    if not mechanic:
+        return jsonify({"error": "Mechanic not found"}), 404
+
+    week_mask, tz_name = load_schedules([mechanic_id])[mechanic_id]
+    result = {
+        day: day_mask_to_intervals(day_mask(week_mask, weekday))
+        for weekday, day in enumerate(calendar.day_name)
+    }
+    result["timezone"] = tz_name
+    return jsonify(result), 200
+
+@app.route("/mechanics/<int:mechanic_id>/schedule", methods=["PUT"])
+def set_mechanic_schedule(mechanic_id):
+    """Replace the intervals of the given days, e.g. {"Monday": [{"start": "08:00", "end": "17:00"}], "timezone": "Africa/Nairobi"}"""
+    data = request.json
+    mechanic = Mechanic.query.get(mechanic_id)
+    if not mechanic:
+        return jsonify({"error": "Mechanic not found"}), 404
+
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid data format. Expected an object keyed by day name."}), 400
+    unknown = sorted(set(data) - set(calendar.day_name) - {"timezone"})
+    if unknown:
+        return jsonify({"error": f"Unknown schedule key(s): {', '.join(unknown)}"}), 400
+
+    try:
+        week_mask, previous_tz = load_schedules([mechanic_id])[mechanic_id]
+        tz_name = validate_timezone(data["timezone"]) if "timezone" in data else previous_tz
+        for weekday, day in enumerate(calendar.day_name):
+            if day in data:
+                week_mask = with_day(week_mask, weekday, intervals_to_day_mask(data[day]))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid schedule: {e}"}), 400
+
+    try:
+        save_schedules({mechanic_id: (week_mask, tz_name)})
+        if tz_name != previous_tz:
+            # Override dates are local, so their UTC windows move with the zone
+            rewindow_overrides(mechanic_id, tz_name)
+        db.session.commit()
+        return jsonify({"message": "Schedule updated successfully"}), 200
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error setting schedule")
+        return jsonify({"error": "Failed to update schedule"}), 500
+
+def parse_override_slots(data):
+    """Day mask for an override payload: explicit "slots" intervals or a whole-day "is_available"."""
+    if "slots" in data:
+        return intervals_to_day_mask(data["slots"])
+    if data.get("is_available") is None:
+        raise ValueError("Provide 'slots' or 'is_available'")
+    return FULL_DAY if data["is_available"] else 0
+
+@app.route("/mechanics/<int:mechanic_id>/availability/overrides", methods=["GET"])
+def get_availability_overrides(mechanic_id):
+    """Upcoming date-specific overrides for a mechanic"""
+    mechanic = Mechanic.query.get(mechanic_id)
+    if not mechanic:
+        return jsonify({"error": "Mechanic not found"}), 404
+
+    # Override dates are local to the mechanic, so "upcoming" is too
+    _, tz_name = load_schedules([mechanic_id])[mechanic_id]
+    overrides = MechanicAvailabilityOverride.query.filter(
+        MechanicAvailabilityOverride.mechanic_id == mechanic_id,
+        MechanicAvailabilityOverride.date >= local_today(tz_name)
+    ).order_by(MechanicAvailabilityOverride.date).all()
+
+    return jsonify([{
+        "date": o.date.isoformat(),
+        "slots": day_mask_to_intervals(bytes_to_mask(o.day_slots)),
+        "reason": o.reason
+    } for o in overrides]), 200
+
+@app.route("/mechanics/<int:mechanic_id>/availability/overrides", methods=["POST"])
+def set_availability_override(mechanic_id):
+    """Override one date, e.g. {"date": "2025-12-25", "is_available": false} or with "slots" """
+    data = request.json or {}
+    mechanic = Mechanic.query.get(mechanic_id)
+    if not mechanic:
+        return jsonify({"error": "Mechanic not found"}), 404
+
+    try:
+        override_date = date.fromisoformat(data["date"])
+        slots = parse_override_slots(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid override: {e}"}), 400
+
+    try:
+        upsert_overrides([mechanic_id], [override_date], slots, data.get("reason"))
+        db.session.commit()
+        return jsonify({"message": "Availability override saved"}), 200
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error saving availability override")
+        return jsonify({"error": "Failed to save override"}), 500
+
 # -------- Bookings --------
 @app.route("/bookings", methods=["POST"])
+@idempotent("create_booking", caller_field="customer_id")
 def create_booking():
     data = request.json
 
@@ -626,46 +1066,12 @@ def create_booking():
     if not service:
         return jsonify({"error": "Service not found"}), 404
         
-    # --- NEW AVAILABILITY CHECK ---
-    # 1. Determine the current day of the week (e.g., 'Thursday')
-    current_day = datetime.now().strftime('%A')
-    
-    # 2. Get all mechanics offering this service AND join their availability data
-    mechanics_query = db.session.query(Mechanic).join(Mechanic.services).join(Mechanic.availability, isouter=True).filter(
-        Service.id == service.id
-    ).options(
-        joinedload(Mechanic.availability)
-    ).all()
-    
-    available_mechanics = []
-    
-    for m in mechanics_query:
-        # Check if the mechanic has a specific availability record for today
-        availability_record = next(
-            (a for a in m.availability if a.day_of_week == current_day), 
-            None
-        )
-        
-        # Logic: If a record exists and is False, they're unavailable. 
-        # Otherwise (record doesn't exist or is True), they are available by default.
-        is_available = True 
-        if availability_record and not availability_record.is_available:
-            is_available = False
-            
-        if is_available and m.status == 'active': # Also ensure general status is active
-            available_mechanics.append(m)
-
-    if not available_mechanics:
-        return jsonify({"error": "No mechanics available for this service at this time"}), 400
-
     user_lat = data['latitude']
     user_lng = data['longitude']
-    
-    # Find nearest mechanic from the filtered list
-    nearest_mechanic = min(
-        available_mechanics,
-        key=lambda m: haversine(user_lat, user_lng, m.latitude, m.longitude)
-    )
+
+    nearest_mechanic = find_nearest_available_mechanic(service.id, user_lat, user_lng)
+    if not nearest_mechanic:
+        return jsonify({"error": "No mechanics available for this service at this time"}), 400
 
     # Create booking
     booking = Booking(
@@ -711,55 +1117,29 @@ def create_booking():
 
 @app.route("/bookings", methods=["GET"])
 def get_bookings():
-    bookings = Booking.query.all()
-    result = []
-    for b in bookings:
-        result.append({
-            "id": b.id,
-            "type": b.type,
-            "location": b.location,
-            "latitude": b.latitude,
-            "longitude": b.longitude,
-            "status": b.status,
-            "created_at": b.created_at.isoformat() if b.created_at else None,
-            "updated_at": b.updated_at.isoformat() if b.updated_at else None,
-            "customer": {"id": b.customer.id, "name": b.customer.name, "phone": b.customer.phone},
-            "mechanic": {"id": b.mechanic.id, "name": b.mechanic.name, "phone": b.mechanic.phone} if b.mechanic else None,
-            "service": {"id": b.service.id, "name": b.service.name} if b.service else None
-        })
-    return jsonify(result)
+    bookings = Booking.query.options(joinedload(Booking.customer), joinedload(Booking.mechanic), joinedload(Booking.service))
+    return stream_json_list(bookings.yield_per(500), BOOKING)
 
 @app.route("/bookings/<int:booking_id>", methods=["GET"])
 def get_booking(booking_id):
-    booking = Booking.query.get(booking_id)
+    booking = archive.get_booking(booking_id)
     if not booking:
         return jsonify({"error": "Booking not found"}), 404
 
-    return jsonify({
-        "id": booking.id,
-        "type": booking.type,
-        "location": booking.location,
-        "latitude": booking.latitude,
-        "longitude": booking.longitude,
-        "status": booking.status,
-        "customer": {
-            "id": booking.customer.id,
-            "name": booking.customer.name,
-            "phone": booking.customer.phone
-        },
-        "mechanic": {
-            "id": booking.mechanic.id,
-            "name": booking.mechanic.name,
-            "phone": booking.mechanic.phone,
-            "garage_name": booking.mechanic.garage_name,
-            "latitude": booking.mechanic.latitude,
-            "longitude": booking.mechanic.longitude
-        } if booking.mechanic else None,
-        "service": {
-            "id": booking.service.id,
-            "name": booking.service.name
-        } if booking.service else None
-    })
+    return jsonify(BOOKING_DETAIL.dump(booking))
+
+# Action -> statuses a booking may be in when it is taken
+def missing_booking_response(booking_id, archived_error):
+    """409 with archived_error for a booking that moved to the archive, else 404"""
+    if db.session.get(ArchivedBooking, booking_id):
+        return jsonify({"error": archived_error}), 409
+    return jsonify({"error": "Booking not found"}), 404
+
+BOOKING_TRANSITIONS = {
+    "Accepted": ("Pending",),
+    "Rejected": ("Pending",),
+    "Completed": ("Accepted",),
+}
 
 @app.route("/bookings/<int:booking_id>/action", methods=["POST"])
 def handle_booking_action(booking_id):
@@ -767,17 +1147,43 @@ def handle_booking_action(booking_id):
     action = data.get("action")
     booking = Booking.query.get(booking_id)
     if not booking:
-        return jsonify({"error": "Booking not found"}), 404
+        return missing_booking_response(booking_id, "Booking is archived and can no longer change")
 
-    if action not in ["Accepted", "Rejected", "Completed"]:
+    if action not in BOOKING_TRANSITIONS:
         return jsonify({"error": "Invalid action"}), 400
-    
+    mechanic_id = data.get("mechanic_id")
+    if action in ("Accepted", "Rejected") and not mechanic_id:
+        return jsonify({"error": "mechanic_id is required to accept or reject a booking"}), 400
+
+    if action == "Completed" and booking.mechanic_id:
+        # Counted in the same transaction as the guarded update below, whose
+        # rollback takes it back unless this is the booking's one Accepted -> Completed
+        fraud_scoring.record_completion(booking.mechanic_id)
+    # Conditional on the current state, so a booking the stale job expired or
+    # took away in the meantime cannot be answered
+    from_statuses = BOOKING_TRANSITIONS[action]
+    allowed = Booking.status.in_(from_statuses)
+    if "Pending" in from_statuses:
+        allowed = allowed | Booking.status.is_(None)
+    guarded = update(Booking).where(Booking.id == booking_id, allowed)
+    if mechanic_id:
+        guarded = guarded.where(Booking.mechanic_id == mechanic_id)
+    changed = db.session.execute(
+        guarded.values(status=action, updated_at=datetime.utcnow())
+    ).rowcount
+    if not changed:
+        db.session.rollback()
+        if mechanic_id and booking.mechanic_id != mechanic_id:
+            return jsonify({"error": "Booking is assigned to another mechanic"}), 409
+        return jsonify({"error": f"Booking is {booking.status or 'Pending'} and cannot be {action}"}), 409
+    db.session.commit()
+
     customer = booking.customer
     mechanic = booking.mechanic
 
-    booking.status = action
-    booking.updated_at = datetime.utcnow()
-    db.session.commit()
+    if action == "Completed" and booking.mechanic_id:
+        # jobsCompleted on the mechanic profile changed
+        mechanic_profiles.invalidate(booking.mechanic_id)
     
     send_booking_update_to_client(booking)
 
@@ -795,39 +1201,22 @@ def handle_booking_action(booking_id):
 
 @app.route("/mechanics/<int:mechanic_id>/bookings", methods=["GET"])
 def get_mechanic_bookings(mechanic_id):
+    """A mechanic's bookings, newest first (?include_archived=)"""
     mechanic = Mechanic.query.get(mechanic_id)
     if not mechanic:
         return jsonify({"error": "Mechanic not found"}), 404
 
     # Eager load customer and service relations
-    bookings = Booking.query.filter_by(mechanic_id=mechanic.id).options(joinedload(Booking.customer), joinedload(Booking.service)).order_by(Booking.created_at.desc()).all()
-    
-    result = []
-    for b in bookings:
-        # NOTE: Ensure you are returning latitude/longitude for the customer pickup
-        result.append({
-            "id": b.id,
-            "type": b.type,
-            "location": b.location,
-            "latitude": b.latitude, # Customer request lat
-            "longitude": b.longitude, # Customer request lng
-            "status": b.status,
-            "created_at": b.created_at.isoformat() if b.created_at else None,
-            "updated_at": b.updated_at.isoformat() if b.updated_at else None,
-            "customer": {
-                "id": b.customer.id,
-                "name": b.customer.name,
-                "phone": b.customer.phone
-            },
-            "service": {
-                "id": b.service.id,
-                "name": b.service.name
-            } if b.service else None
-        })
-    return jsonify(result)
+    # NOTE: latitude/longitude on each booking are the customer pickup coordinates
+    bookings = Booking.query.filter_by(mechanic_id=mechanic.id).options(joinedload(Booking.customer), joinedload(Booking.service)).order_by(Booking.created_at.desc())
+    archived = ArchivedBooking.query.filter_by(mechanic_id=mechanic.id).options(
+        joinedload(ArchivedBooking.customer), joinedload(ArchivedBooking.service)
+    ).order_by(ArchivedBooking.created_at.desc())
+    return stream_json_list(booking_history(bookings, archived), MECHANIC_BOOKING)
 
 @app.route("/users/<int:user_id>/bookings", methods=["GET"])
 def get_user_bookings(user_id):
+    """A user's bookings, newest first (?include_archived=)"""
     user = User.query.get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -835,43 +1224,28 @@ def get_user_bookings(user_id):
     bookings = Booking.query.filter_by(customer_id=user.id).options(
         joinedload(Booking.mechanic), 
         joinedload(Booking.service)
-    ).order_by(Booking.created_at.desc()).all()
-    
-    result = []
-    for b in bookings:
-        result.append({
-            "id": b.id,
-            "type": b.type,
-            "location": b.location,
-            "latitude": b.latitude,
-            "longitude": b.longitude,
-            "status": b.status,
-            "created_at": b.created_at.isoformat() if b.created_at else None,
-            "updated_at": b.updated_at.isoformat() if b.updated_at else None,
-            "mechanic": {
-                "id": b.mechanic.id,
-                "name": b.mechanic.name,
-                "phone": b.mechanic.phone,
-                "garage_name": b.mechanic.garage_name
-            } if b.mechanic else None,
-            "service": {
-                "id": b.service.id,
-                "name": b.service.name
-            } if b.service else None
-        })
-    return jsonify(result)
+    ).order_by(Booking.created_at.desc())
+    archived = ArchivedBooking.query.filter_by(customer_id=user.id).options(
+        joinedload(ArchivedBooking.mechanic),
+        joinedload(ArchivedBooking.service)
+    ).order_by(ArchivedBooking.created_at.desc())
+    return stream_json_list(booking_history(bookings, archived), USER_BOOKING)
 
 # -------- Socket.IO Events --------
 @socketio.on("join")
 def on_join(data):
     mechanic_id = data.get("mechanic_id")
     user_id = data.get("user_id") 
+    admin_id = data.get("admin_id")
     if mechanic_id:
         join_room(f"mechanic_{mechanic_id}")
         emit("message", {"info": f"Mechanic {mechanic_id} joined room"}, room=f"mechanic_{mechanic_id}")
     elif user_id:
         join_room(f"user_{user_id}")
         emit("message", {"info": f"User {user_id} joined room"}, room=f"user_{user_id}")
+    elif admin_id:
+        join_room(f"admin_{admin_id}")
+        emit("message", {"info": f"Admin {admin_id} joined room"}, room=f"admin_{admin_id}")
 
 
 def create_default_admin():
@@ -887,7 +1261,208 @@ def create_default_admin():
             )
             db.session.add(super_admin)
             db.session.commit()
-            print("✅ Default super admin created: admin@mechapp.com / admin123")
+            logger.warning("Default super admin created: admin@mechapp.com (change the default password)")
+
+
+def init_database():
+    """Create tables, migrate legacy availability rows and ensure the default admin exists"""
+    with app.app_context():
+        db.create_all()
+        backfill_schedules_from_legacy()
+        refresh_utc_masks()
+        db.session.commit()
+    create_default_admin()
+
+
+# ------------------------
+# Background jobs
+# ------------------------
+@scheduler.register("wal_checkpoint", interval=app.config["SQLITE_CHECKPOINT_INTERVAL"] or 300)
+def wal_checkpoint_job():
+    """Passive WAL checkpoint for SQLite deployments"""
+    return {"checkpoint": wal_checkpoint(db.engine)}
+
+@scheduler.register("refresh_schedules", interval=app.config["SCHEDULE_REFRESH_INTERVAL"])
+def refresh_schedules_job():
+    """Keep UTC availability masks aligned with DST changes"""
+    refreshed = refresh_utc_masks()
+    db.session.commit()
+    return {"refreshed": refreshed}
+
+@scheduler.register("purge_idempotency_keys", interval=app.config["IDEMPOTENCY_PURGE_INTERVAL"])
+def purge_idempotency_keys_job():
+    """Evict expired Idempotency-Key responses"""
+    return {"purged": purge_expired_keys()}
+
+@scheduler.register("purge_fraud_report_dedup", interval=app.config["FRAUD_DEDUP_PURGE_INTERVAL"])
+def purge_fraud_report_dedup_job():
+    """Evict fraud report dedup keys idle for longer than the dedup window"""
+    return {"purged": report_dedup.purge_expired()}
+
+@scheduler.register("stale_bookings", interval=app.config["STALE_BOOKING_CHECK_INTERVAL"])
+def stale_bookings_job():
+    """Reassign Pending bookings a mechanic has ignored; expire ones nobody took in time"""
+    now = datetime.utcnow()
+    reassign_before = now - timedelta(seconds=app.config["BOOKING_REASSIGN_AFTER"])
+    expire_before = now - timedelta(seconds=app.config["BOOKING_EXPIRE_AFTER"])
+
+    stale = db.session.query(
+        Booking.id, Booking.mechanic_id, Booking.service_id, Booking.latitude, Booking.longitude,
+        Booking.created_at
+    ).filter(
+        Booking.status == "Pending",
+        Booking.updated_at < reassign_before
+    ).order_by(Booking.updated_at).limit(app.config["STALE_BOOKING_BATCH_SIZE"]).all()
+
+    # Every mechanic a booking was already taken from, so it never bounces back
+    tried = {}
+    if stale:
+        for booking_id, mechanic_id in db.session.query(
+            BookingDispatchAttempt.booking_id, BookingDispatchAttempt.mechanic_id
+        ).filter(BookingDispatchAttempt.booking_id.in_([b.id for b in stale])):
+            tried.setdefault(booking_id, set()).add(mechanic_id)
+
+    reassigned_ids, expired_ids = [], []
+    previous_mechanics = {}
+    for booking in stale:
+        exclude = tried.get(booking.id, set())
+        if booking.mechanic_id:
+            exclude = exclude | {booking.mechanic_id}
+        replacement = None
+        if booking.created_at >= expire_before and booking.service_id and booking.latitude is not None:
+            replacement = find_nearest_available_mechanic(
+                booking.service_id, booking.latitude, booking.longitude, exclude_ids=exclude
+            )
+        changes = {"mechanic_id": replacement.id} if replacement else {"status": "Expired"}
+        # Only if it is still the same stale Pending booking: a mechanic may
+        # have accepted it since it was read
+        changed = db.session.execute(
+            update(Booking).where(
+                Booking.id == booking.id,
+                Booking.status == "Pending",
+                Booking.updated_at < reassign_before
+            ).values(updated_at=now, **changes)
+        ).rowcount
+        if not changed:
+            continue
+        if replacement:
+            if booking.mechanic_id:
+                db.session.execute(
+                    dialect_insert()(BookingDispatchAttempt.__table__)
+                    .values(booking_id=booking.id, mechanic_id=booking.mechanic_id, created_at=now)
+                    .on_conflict_do_nothing()
+                )
+            reassigned_ids.append(booking.id)
+            previous_mechanics[booking.id] = booking.mechanic_id
+        else:
+            expired_ids.append(booking.id)
+    db.session.commit()
+
+    touched = {}
+    if reassigned_ids or expired_ids:
+        touched = {booking.id: booking for booking in Booking.query.options(
+            joinedload(Booking.customer), joinedload(Booking.mechanic), joinedload(Booking.service)
+        ).filter(Booking.id.in_(reassigned_ids + expired_ids))}
+    reassigned = [touched[booking_id] for booking_id in reassigned_ids]
+    expired = [touched[booking_id] for booking_id in expired_ids]
+
+    for booking in reassigned:
+        send_new_booking_to_mechanic(booking)
+        send_booking_update_to_client(booking, previous_mechanic_id=previous_mechanics[booking.id])
+    for booking in expired:
+        send_booking_update_to_client(booking)
+    return {"reassigned": len(reassigned), "expired": len(expired)}
+
+@scheduler.register("fraud_rescore", interval=app.config["FRAUD_RESCORE_INTERVAL"])
+def fraud_rescore_job():
+    """Let fraud risk scores decay as reports age out of the recent window"""
+    return {"rescored": fraud_scoring.rescore_decayed()}
+
+@scheduler.register("booking_rollups", interval=app.config["ROLLUP_INTERVAL"])
+def booking_rollups_job():
+    """Fold changed bookings into the analytics rollups"""
+    return refresh_rollups(
+        batch_size=app.config["ROLLUP_BATCH_SIZE"], settle=app.config["ROLLUP_SETTLE"]
+    )
+
+@scheduler.register("archive_bookings", interval=app.config["ARCHIVE_INTERVAL"])
+def archive_bookings_job():
+    """Move long-finished bookings and their ratings to the archive tables"""
+    return archive.archive_bookings(
+        timedelta(days=app.config["ARCHIVE_AFTER_DAYS"]), batch_size=app.config["ARCHIVE_BATCH_SIZE"]
+    )
+
+@scheduler.register("flush_audit_log", interval=app.config["AUDIT_FLUSH_INTERVAL"], leader_only=False)
+def flush_audit_log_job():
+    """Write this worker's buffered audit entries"""
+    return {"written": audit_log.flush()}
+
+@scheduler.register("purge_notifications", interval=app.config["NOTIFICATION_PURGE_INTERVAL"])
+def purge_notifications_job():
+    """Delete read notifications past retention, and any notification past the hard limit"""
+    now = datetime.utcnow()
+    read_cutoff = now - timedelta(days=app.config["NOTIFICATION_READ_RETENTION_DAYS"])
+    hard_cutoff = now - timedelta(days=app.config["NOTIFICATION_RETENTION_DAYS"])
+    deleted = notification_service.purge(read_cutoff, hard_cutoff)
+    db.session.commit()
+    return {"deleted": deleted}
+
+_TEMP_UPLOAD_ID = re.compile(r"^temp_uploads/([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})_")
+
+def temp_upload_referenced(blob_name):
+    """True if a user, mechanic or fraud report still points at the upload ``blob_name``"""
+    # Records store the public URL, which percent-quotes the name. Uploads are
+    # named temp_uploads/<uuid4>_<filename>, and the uuid is URL-safe and unique
+    match = _TEMP_UPLOAD_ID.match(blob_name)
+    needle = match.group(1) if match else quote(blob_name, safe="/~")
+    pattern = "%" + needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    like = lambda column: column.like(pattern, escape="\\")
+    return bool(
+        db.session.query(User.id).filter(like(User.profile_picture)).first()
+        or db.session.query(Mechanic.id).filter(db.or_(
+            like(Mechanic.profile_picture), like(Mechanic.document_path)
+        )).first()
+        or db.session.query(FraudReport.id).filter(like(FraudReport.evidence_images)).first()
+    )
+
+@scheduler.register("gc_temp_uploads", interval=app.config["TEMP_UPLOAD_GC_INTERVAL"])
+def gc_temp_uploads_job():
+    """Delete old Firebase temp_uploads/ objects that no record references"""
+    try:
+        import firebase_admin
+        from firebase_admin import storage
+        firebase_admin.get_app()
+    except (ImportError, ValueError):
+        # Firebase is not configured in this process (upload_routes not loaded)
+        return {"skipped": "firebase not initialized"}
+
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config["TEMP_UPLOAD_MAX_AGE"])
+    bucket = storage.bucket()
+    checked = deleted = 0
+    for blob in bucket.list_blobs(prefix="temp_uploads/"):
+        if checked >= app.config["TEMP_UPLOAD_GC_BATCH_SIZE"]:
+            break
+        if blob.time_created is None or blob.time_created.replace(tzinfo=None) >= cutoff:
+            continue
+        checked += 1
+        if not temp_upload_referenced(blob.name):
+            blob.delete()
+            deleted += 1
+    return {"checked": checked, "deleted": deleted}
+
+
+def start_background_tasks():
+    """Start the job scheduler on the Socket.IO async backend (green or OS threads)"""
+    if not app.config["SCHEDULER_ENABLED"]:
+        return
+    with app.app_context():
+        on_sqlite = db.engine.dialect.name == "sqlite"
+    enabled = set(scheduler.jobs)
+    if not (on_sqlite and app.config.get("SQLITE_TUNING") and app.config.get("SQLITE_CHECKPOINT_INTERVAL")):
+        enabled.discard("wal_checkpoint")
+    # Until a flush job is running, audit entries are written at commit
+    audit_log.buffered = "flush_audit_log" in enabled
+    scheduler.start(app, socketio.start_background_task, socketio.sleep, enabled_jobs=enabled)
 
 
 # ------------------------
@@ -900,18 +1475,30 @@ def get_admin_reports_stats():  # ⭐ CHANGED NAME
     try:
         total_users = User.query.count()
         total_mechanics = Mechanic.query.count()
-        total_bookings = Booking.query.count()
-        pending_bookings = Booking.query.filter_by(status='Pending').count()
-        active_bookings = Booking.query.filter(Booking.status.in_(['Pending', 'Accepted'])).count()
-        completed_bookings = Booking.query.filter_by(status='Completed').count()
-        cancelled_bookings = Booking.query.filter_by(status='Rejected').count()
-        
+
         # Recent activity (last 7 days)
-        from datetime import timedelta
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
         recent_users = User.query.filter(User.created_at >= seven_days_ago).count()
         recent_mechanics = Mechanic.query.filter(Mechanic.created_at >= seven_days_ago).count()
-        recent_bookings = Booking.query.filter(Booking.created_at >= seven_days_ago).count()
+
+        # Every booking figure comes from one snapshot, so they always add up: the
+        # rollups (as of their cursor, bucketed by the hour) instead of scanning live
+        # and archived bookings; the raw rows until the first rollup run
+        rollups_as_of = rollup_cursor()
+        if rollups_as_of:
+            totals = status_totals()
+            recent_bookings = sum(status_totals(since=seven_days_ago).values())
+        else:
+            totals = archive.status_counts()
+            for status, count in db.session.query(Booking.status, func.count()).group_by(Booking.status):
+                status = status or 'Pending'
+                totals[status] = totals.get(status, 0) + count
+            recent_bookings = Booking.query.filter(Booking.created_at >= seven_days_ago).count()
+        total_bookings = sum(totals.values())
+        completed_bookings = totals.get('Completed', 0)
+        cancelled_bookings = totals.get('Rejected', 0)
+        pending_bookings = totals.get('Pending', 0)
+        active_bookings = pending_bookings + totals.get('Accepted', 0)
         
         # Fraud reports stats (with safe check)
         try:
@@ -935,22 +1522,67 @@ def get_admin_reports_stats():  # ⭐ CHANGED NAME
                 "recent_bookings": recent_bookings,
                 "pending_fraud_reports": pending_fraud_reports,
                 "total_fraud_reports": total_fraud_reports,
-            }
+            },
+            # Booking totals reflect changes up to this moment
+            "bookings_as_of": rollups_as_of[0].isoformat() if rollups_as_of else None
         }), 200
-    except Exception as e:
-        print(f"Error getting admin stats: {e}")
+    except Exception:
+        logger.exception("Error getting admin stats")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/admin/reports/trends", methods=["GET"])
+def get_admin_reports_trends():
+    """Booking trends from the rollups (?since=&until=&period=day|hour&service_id=&mechanic_id=)"""
+    try:
+        try:
+            until = request.args.get('until')
+            until = datetime.fromisoformat(until) if until else datetime.utcnow()
+            since = request.args.get('since')
+            since = datetime.fromisoformat(since) if since else until - timedelta(days=30)
+        except ValueError:
+            return jsonify({"error": "Invalid since or until"}), 400
+        period = request.args.get('period', 'day')
+        if period not in ('day', 'hour'):
+            return jsonify({"error": "period must be day or hour"}), 400
+
+        try:
+            series = trends(
+                since, until, period=period,
+                service_id=request.args.get('service_id', type=int),
+                mechanic_id=request.args.get('mechanic_id', type=int)
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        cursor = rollup_cursor()
+        return jsonify({
+            "period": period,
+            "series": series,
+            # Bookings changed after this moment are not in the rollups yet
+            "as_of": cursor[0].isoformat() if cursor else None
+        }), 200
+    except Exception:
+        logger.exception("Error getting admin trends")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/reports/fraud-reports", methods=["GET"])
 def get_fraud_reports():
-    """Get all fraud reports with detailed information"""
+    """Get all fraud reports with detailed information (?sort=risk ranks by the mechanic's risk score)"""
     try:
         fraud_reports = FraudReport.query.options(
             joinedload(FraudReport.user),
             joinedload(FraudReport.mechanic),
             joinedload(FraudReport.booking),
             joinedload(FraudReport.resolver)
-        ).order_by(FraudReport.created_at.desc()).all()
+        )
+        if request.args.get('sort') == 'risk':
+            fraud_reports = fraud_reports.outerjoin(
+                MechanicRiskProfile, MechanicRiskProfile.mechanic_id == FraudReport.mechanic_id
+            ).order_by(func.coalesce(MechanicRiskProfile.risk_score, 0).desc(), FraudReport.created_at.desc())
+        else:
+            fraud_reports = fraud_reports.order_by(FraudReport.created_at.desc())
+        fraud_reports = fraud_reports.all()
+        repeats = report_dedup.repeat_counts([report.id for report in fraud_reports])
         
         result = []
         for report in fraud_reports:
@@ -982,12 +1614,42 @@ def get_fraud_reports():
                 "updated_at": report.updated_at.isoformat() if report.updated_at else None,
                 "resolved_at": report.resolved_at.isoformat() if report.resolved_at else None,
                 "resolver": report.resolver.name if report.resolver else None,
-                "resolution_notes": report.resolution_notes
+                "resolution_notes": report.resolution_notes,
+                "repeat_count": repeats.get(report.id, 0)
             })
         
         return jsonify(result), 200
-    except Exception as e:
-        print(f"Error getting fraud reports: {e}")
+    except Exception:
+        logger.exception("Error getting fraud reports")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/admin/reports/fraud-queue", methods=["GET"])
+def get_fraud_review_queue():
+    """Mechanics with open fraud reports, highest risk first (?page=&per_page=)"""
+    try:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+        profiles = fraud_scoring.review_queue(limit=per_page, offset=(page - 1) * per_page)
+        now = datetime.utcnow()
+        return jsonify({
+            "queue": [{
+                "mechanic": {
+                    "id": p.mechanic.id,
+                    "name": p.mechanic.name,
+                    "garage_name": p.mechanic.garage_name,
+                    "status": p.mechanic.status
+                },
+                "risk_score": p.risk_score,
+                "severity": p.severity,
+                "open_reports": p.open_reports,
+                "last_report_at": p.last_report_at.isoformat() if p.last_report_at else None,
+                "signals": fraud_scoring.signals(p, now)
+            } for p in profiles],
+            "page": page,
+            "per_page": per_page
+        }), 200
+    except Exception:
+        logger.exception("Error getting fraud review queue")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/reports/fraud-reports/<int:report_id>", methods=["GET"])
@@ -1038,10 +1700,11 @@ def get_fraud_report_detail(report_id):
             "updated_at": report.updated_at.isoformat() if report.updated_at else None,
             "resolved_at": report.resolved_at.isoformat() if report.resolved_at else None,
             "resolver": report.resolver.name if report.resolver else None,
-            "resolution_notes": report.resolution_notes
+            "resolution_notes": report.resolution_notes,
+            "repeat_count": report_dedup.repeat_counts([report.id]).get(report.id, 0)
         }), 200
-    except Exception as e:
-        print(f"Error getting fraud report detail: {e}")
+    except Exception:
+        logger.exception("Error getting fraud report detail")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/reports/fraud-reports/<int:report_id>/resolve", methods=["PUT"])
@@ -1060,6 +1723,11 @@ def resolve_fraud_report(report_id):
         admin = Admin.query.get(admin_id)
         if not admin:
             return jsonify({"error": "Admin not found"}), 404
+
+        if action not in ("block_mechanic", "dismiss", "warn"):
+            return jsonify({"error": "Invalid action"}), 400
+        if report.status in fraud_scoring.OPEN_STATUSES:
+            fraud_scoring.record_resolution(report.mechanic_id)
             
         if action == "block_mechanic":
             # Block the mechanic
@@ -1079,24 +1747,21 @@ def resolve_fraud_report(report_id):
             report.resolution_notes = f"Warning issued. {resolution_notes}"
             # Here you could add logic to send a warning to the mechanic
             
-        else:
-            return jsonify({"error": "Invalid action"}), 400
-            
         report.resolved_at = datetime.utcnow()
         report.resolved_by = admin_id
         report.updated_at = datetime.utcnow()
         
-        # Create audit log
-        audit = SystemAudit(
+        audit_log.record(
             admin_id=admin_id,
             action=f"fraud_report_{action}",
             target_type="fraud_report",
             target_id=report_id,
             description=f"Resolved fraud report #{report_id} with action: {action}"
         )
-        db.session.add(audit)
         
         db.session.commit()
+        if action == "block_mechanic":
+            mechanic_profiles.invalidate(report.mechanic_id)
         
         return jsonify({
             "message": f"Fraud report {action} successfully",
@@ -1106,9 +1771,9 @@ def resolve_fraud_report(report_id):
                 "resolved_at": report.resolved_at.isoformat()
             }
         }), 200
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error resolving fraud report: {e}")
+        logger.exception("Error resolving fraud report")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/reports/user-reports", methods=["GET"])
@@ -1141,47 +1806,90 @@ def get_user_reports():
             })
         
         return jsonify(result), 200
-    except Exception as e:
-        print(f"Error getting user reports: {e}")
+    except Exception:
+        logger.exception("Error getting user reports")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/audit-logs", methods=["GET"])
 def get_audit_logs():
-    """Get system audit logs for admin activity tracking"""
+    """Get system audit logs, newest first (?since=&until=&admin_id=&target_type=&target_id=&action=&cursor=&per_page=)"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        
-        audit_logs = SystemAudit.query.options(
-            joinedload(SystemAudit.admin)
-        ).order_by(SystemAudit.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        try:
+            since = request.args.get('since')
+            until = request.args.get('until')
+            since = datetime.fromisoformat(since) if since else None
+            until = datetime.fromisoformat(until) if until else None
+            cursor = request.args.get('cursor')
+            cursor = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({"error": "Invalid since, until or cursor"}), 400
+
+        logs, next_cursor = audit_log.query(
+            since=since,
+            until=until,
+            admin_id=request.args.get('admin_id', type=int),
+            target_type=request.args.get('target_type'),
+            target_id=request.args.get('target_id', type=int),
+            action=request.args.get('action'),
+            cursor=cursor,
+            limit=request.args.get('per_page', 50, type=int)
         )
-        
+
         result = []
-        for log in audit_logs.items:
+        for log in logs:
             result.append({
-                "id": log.id,
-                "admin": log.admin.name if log.admin else "System",
-                "action": log.action,
-                "target_type": log.target_type,
-                "target_id": log.target_id,
-                "description": log.description,
-                "ip_address": log.ip_address,
-                "user_agent": log.user_agent,
-                "created_at": log.created_at.isoformat()
+                "id": log["id"],
+                "admin": log["admin"],
+                "action": log["action"],
+                "target_type": log["target_type"],
+                "target_id": log["target_id"],
+                "description": log["description"],
+                "ip_address": log["ip_address"],
+                "user_agent": log["user_agent"],
+                "created_at": log["created_at"].isoformat()
             })
         
         return jsonify({
             "logs": result,
-            "total": audit_logs.total,
-            "pages": audit_logs.pages,
-            "current_page": page
+            "next_cursor": encode_cursor(next_cursor)
         }), 200
-    except Exception as e:
-        print(f"Error getting audit logs: {e}")
+    except Exception:
+        logger.exception("Error getting audit logs")
         return jsonify({"error": "Internal server error"}), 500
 
+# Reports keep a foreign key to the live booking, which investigations join
+ARCHIVED_REPORT_ERROR = "Booking is archived and can no longer be reported"
+
+def fraud_report_intake(user_id, mechanic_id, booking_id, reason):
+    """Dedup and rate-limit a fraud report: (dedup_key, duplicate_row, retry_after_seconds).
+
+    Create the report only when both duplicate_row and retry_after are falsy.
+    """
+    key, duplicate = report_dedup.claim(user_id, mechanic_id, booking_id, reason)
+    if duplicate:
+        return key, duplicate, 0
+    for name, window in (("hour", 3600), ("day", 86400)):
+        limit = app.config[f"FRAUD_REPORTS_PER_{name.upper()}"]
+        retry_after = ratelimit.hit(f"fraud_report:{name}:{user_id}", limit, window)
+        if retry_after:
+            return key, None, retry_after
+    return key, None, 0
+
+def fraud_report_rejected(duplicate, retry_after, id_field):
+    """Response for a collapsed repeat (200) or a rate-limited report (429); commits or rolls back."""
+    if duplicate:
+        db.session.commit()
+        return jsonify({
+            "message": "This report was already received",
+            id_field: duplicate.report_id,
+            "duplicate": True,
+            "repeat_count": duplicate.repeat_count
+        }), 200
+    db.session.rollback()
+    response = jsonify({"error": "Too many reports, try again later", "retry_after": retry_after})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
 @app.route("/reports/fraud", methods=["POST"])
 def create_fraud_report():
     """Endpoint for users to report fraud"""
@@ -1202,30 +1910,46 @@ def create_fraud_report():
         mechanic = Mechanic.query.get(mechanic_id)
         if not user or not mechanic:
             return jsonify({"error": "User or mechanic not found"}), 404
+        if booking_id and not Booking.query.get(booking_id):
+            return missing_booking_response(booking_id, ARCHIVED_REPORT_ERROR)
             
-        # Create fraud report
+        dedup_key, duplicate, retry_after = fraud_report_intake(user_id, mechanic_id, booking_id, reason)
+        if duplicate or retry_after:
+            return fraud_report_rejected(duplicate, retry_after, "report_id")
+
+        # Update the mechanic's risk profile; the report inherits its severity
+        risk = fraud_scoring.record_report(mechanic_id, user_id)
         fraud_report = FraudReport(
             user_id=user_id,
             mechanic_id=mechanic_id,
             booking_id=booking_id,
             reason=reason,
             description=description,
-            status='pending'
+            status='pending',
+            severity=risk.severity
         )
         
         db.session.add(fraud_report)
-        db.session.commit()
+        db.session.flush()
+        report_dedup.attach(dedup_key, fraud_report)
         
-        # Create notification for admins (you can implement this later)
-        # notify_admins_about_fraud_report(fraud_report)
+        notification_service.send(
+            admin_recipients(),
+            title="New Fraud Report",
+            message=f"Fraud report submitted by {user.name} against {mechanic.name}: {reason}",
+            type="alert",
+            related_entity="fraud_report",
+            related_entity_id=fraud_report.id
+        )
+        db.session.commit()
         
         return jsonify({
             "message": "Fraud report submitted successfully",
             "report_id": fraud_report.id
         }), 201
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error creating fraud report: {e}")
+        logger.exception("Error creating fraud report")
         return jsonify({"error": "Internal server error"}), 500
 
 # ------------------------
@@ -1234,29 +1958,89 @@ def create_fraud_report():
 
 @app.route("/admin/notifications", methods=["GET"])
 def get_admin_notifications():
-    """Get notifications for admin"""
+    """Get notifications for admin (pass ?admin_id= for that admin's inbox; without it, the shared admin feed)"""
     try:
-        notifications = Notification.query.filter_by(admin_id=None).order_by(Notification.created_at.desc()).limit(50).all()
-        
-        result = []
-        for notification in notifications:
-            result.append({
-                "id": notification.id,
-                "title": notification.title,
-                "message": notification.message,
-                "type": notification.type,
-                "is_read": notification.is_read,
-                "related_entity": notification.related_entity,
-                "related_entity_id": notification.related_entity_id,
-                "created_at": notification.created_at.isoformat()
-            })
-        
-        return jsonify(result), 200
-    except Exception as e:
-        print(f"Error getting notifications: {e}")
+        admin_id = request.args.get('admin_id', type=int)
+        if admin_id:
+            return jsonify(notification_service.inbox("admin", admin_id)), 200
+        return jsonify(notification_service.admin_feed()), 200
+    except Exception:
+        logger.exception("Error getting notifications")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/notifications/<recipient_type>/<int:recipient_id>", methods=["GET"])
+def get_notification_inbox(recipient_type, recipient_id):
+    """Page through a recipient's notifications, newest first (?before_id=&limit=&unread_only=1)"""
+    if recipient_type not in RECIPIENT_COLUMNS:
+        return jsonify({"error": "Unknown recipient type"}), 404
+    try:
+        notifications = notification_service.inbox(
+            recipient_type,
+            recipient_id,
+            before_id=request.args.get('before_id', type=int),
+            limit=request.args.get('limit', INBOX_PAGE_SIZE, type=int),
+            unread_only=request.args.get('unread_only') in ('1', 'true')
+        )
+        return jsonify({
+            "notifications": notifications,
+            "unread_count": notification_service.unread_count(recipient_type, recipient_id),
+            "next_before_id": notifications[-1]["id"] if notifications else None
+        }), 200
+    except Exception:
+        logger.exception("Error getting notification inbox")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/notifications/<recipient_type>/<int:recipient_id>/unread-count", methods=["GET"])
+def get_unread_notification_count(recipient_type, recipient_id):
+    """Badge count for a recipient"""
+    if recipient_type not in RECIPIENT_COLUMNS:
+        return jsonify({"error": "Unknown recipient type"}), 404
+    try:
+        return jsonify({"unread_count": notification_service.unread_count(recipient_type, recipient_id)}), 200
+    except Exception:
+        logger.exception("Error getting unread count")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/notifications/<recipient_type>/<int:recipient_id>/read", methods=["POST"])
+def mark_notifications_read(recipient_type, recipient_id):
+    """Bulk mark-as-read: {"ids": [...]}, {"up_to_id": n}, {"up_to": iso timestamp} or {"all": true}"""
+    if recipient_type not in RECIPIENT_COLUMNS:
+        return jsonify({"error": "Unknown recipient type"}), 404
+    try:
+        data = request.json or {}
+        if data.get('ids') is not None:
+            ids = data['ids']
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return jsonify({"error": "ids must be a list of integers"}), 400
+            marked = notification_service.mark_read_ids(recipient_type, recipient_id, ids)
+        elif data.get('up_to_id') is not None or data.get('up_to') or data.get('all'):
+            up_to_time = None
+            if data.get('up_to'):
+                try:
+                    up_to_time = datetime.fromisoformat(data['up_to'])
+                except (TypeError, ValueError):
+                    return jsonify({"error": "up_to must be an ISO 8601 timestamp"}), 400
+                if up_to_time.tzinfo is not None:
+                    # created_at is naive UTC
+                    up_to_time = up_to_time.astimezone(timezone.utc).replace(tzinfo=None)
+            marked = notification_service.mark_all_read(
+                recipient_type, recipient_id, up_to_id=data.get('up_to_id'), up_to_time=up_to_time
+            )
+        else:
+            return jsonify({"error": "Provide ids, up_to_id, up_to or all"}), 400
+
+        db.session.commit()
+        return jsonify({
+            "marked_read": marked,
+            "unread_count": notification_service.unread_count(recipient_type, recipient_id)
+        }), 200
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error marking notifications as read")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/admin/notifications/<int:notification_id>/read", methods=["PUT"])
+@app.route("/notifications/<int:notification_id>/read", methods=["PUT"])
 def mark_notification_read(notification_id):
     """Mark a notification as read"""
     try:
@@ -1264,19 +2048,24 @@ def mark_notification_read(notification_id):
         if not notification:
             return jsonify({"error": "Notification not found"}), 404
             
-        notification.is_read = True
+        notification_service.mark_read(notification)
         db.session.commit()
         
-        return jsonify({"message": "Notification marked as read"}), 200
-    except Exception as e:
+        recipient = recipient_of(notification)
+        return jsonify({
+            "message": "Notification marked as read",
+            "unread_count": notification_service.unread_count(*recipient) if recipient else 0
+        }), 200
+    except Exception:
         db.session.rollback()
-        print(f"Error marking notification as read: {e}")
+        logger.exception("Error marking notification as read")
         return jsonify({"error": "Internal server error"}), 500
     
     
 # Add these routes to your app.py (using your existing FraudReport table)
 
 @app.route("/ratings", methods=["POST"])
+@idempotent("create_rating", caller_field="user_id")
 def create_rating():
     """Create a rating for a completed booking"""
     try:
@@ -1293,7 +2082,7 @@ def create_rating():
         # Check if booking exists and is completed
         booking = Booking.query.get(booking_id)
         if not booking:
-            return jsonify({"error": "Booking not found"}), 404
+            return missing_booking_response(booking_id, "Booking is archived and can no longer be rated")
         
         if booking.status != 'Completed':
             return jsonify({"error": "Can only rate completed bookings"}), 400
@@ -1307,6 +2096,9 @@ def create_rating():
         if rating_value < 1 or rating_value > 5:
             return jsonify({"error": "Rating must be between 1 and 5"}), 400
 
+        if booking.mechanic_id:
+            fraud_scoring.record_rating(booking.mechanic_id, rating_value)
+
         # Create rating
         rating = Rating(
             booking_id=booking_id,
@@ -1317,17 +2109,16 @@ def create_rating():
         )
         
         db.session.add(rating)
+        db.session.flush()
         
-        # Create notification for mechanic
-        notification = Notification(
-            mechanic_id=booking.mechanic_id,
+        notification_service.send(
+            [("mechanic", booking.mechanic_id)],
             title="New Rating Received",
             message=f"You received a {rating_value}-star rating from {booking.customer.name}",
             type="info",
             related_entity="rating",
             related_entity_id=rating.id
         )
-        db.session.add(notification)
         
         db.session.commit()
 
@@ -1341,12 +2132,13 @@ def create_rating():
             }
         }), 201
 
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error creating rating: {e}")
+        logger.exception("Error creating rating")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/complaints/fraud", methods=["POST"])
+@idempotent("create_fraud_complaint", caller_field="user_id")
 def create_fraud_complaint():
     """Create a fraud complaint using existing FraudReport table"""
     try:
@@ -1361,7 +2153,19 @@ def create_fraud_complaint():
         if not all([user_id, mechanic_id, booking_id, complaint_type, description]):
             return jsonify({"error": "Missing required fields"}), 400
 
-        # Create complaint using existing FraudReport table
+        user = User.query.get(user_id)
+        mechanic = Mechanic.query.get(mechanic_id)
+        if not user or not mechanic:
+            return jsonify({"error": "User or mechanic not found"}), 404
+        if not Booking.query.get(booking_id):
+            return missing_booking_response(booking_id, ARCHIVED_REPORT_ERROR)
+
+        dedup_key, duplicate, retry_after = fraud_report_intake(user_id, mechanic_id, booking_id, complaint_type)
+        if duplicate or retry_after:
+            return fraud_report_rejected(duplicate, retry_after, "complaint_id")
+
+        # Create complaint using existing FraudReport table, at the mechanic's current risk severity
+        risk = fraud_scoring.record_report(mechanic_id, user_id)
         complaint = FraudReport(
             user_id=user_id,
             mechanic_id=mechanic_id,
@@ -1369,34 +2173,29 @@ def create_fraud_complaint():
             reason=complaint_type,  # Using 'reason' field for complaint_type
             description=description,
             status='pending',
-            severity='medium'
+            severity=risk.severity
         )
-        
+
         db.session.add(complaint)
+        db.session.flush()
+        report_dedup.attach(dedup_key, complaint)
         
-        # Create notification for admin
-        user = User.query.get(user_id)
-        mechanic = Mechanic.query.get(mechanic_id)
-        
-        notification = Notification(
-            admin_id=1,  # Notify first admin or you can query for active admins
+        notification_service.send(
+            admin_recipients(),
             title="New Fraud Report",
             message=f"Fraud report submitted by {user.name} against {mechanic.name}",
             type="alert",
             related_entity="fraud_report",
             related_entity_id=complaint.id
         )
-        db.session.add(notification)
         
-        # Create audit log
-        audit = SystemAudit(
+        audit_log.record(
             admin_id=None,  # System-generated
             action="fraud_report_submitted",
             target_type="fraud_report",
             target_id=complaint.id,
             description=f"User {user_id} submitted fraud report against mechanic {mechanic_id}"
         )
-        db.session.add(audit)
         
         db.session.commit()
 
@@ -1405,16 +2204,16 @@ def create_fraud_complaint():
             "complaint_id": complaint.id
         }), 201
 
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error creating complaint: {e}")
+        logger.exception("Error creating complaint")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/bookings/<int:booking_id>/rating", methods=["GET"])
 def get_booking_rating(booking_id):
     """Get rating for a specific booking"""
     try:
-        rating = Rating.query.filter_by(booking_id=booking_id).first()
+        rating = archive.booking_rating(booking_id)
         
         if not rating:
             return jsonify({"rating": None}), 200
@@ -1428,30 +2227,27 @@ def get_booking_rating(booking_id):
             }
         }), 200
 
-    except Exception as e:
-        print(f"Error getting rating: {e}")
+    except Exception:
+        logger.exception("Error getting rating")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/mechanics/<int:mechanic_id>/average-rating", methods=["GET"])
 def get_mechanic_average_rating(mechanic_id):
     """Get average rating for a mechanic"""
     try:
-        ratings = Rating.query.filter_by(mechanic_id=mechanic_id).all()
+        # Counted per star value, over live and archived ratings
+        breakdown = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+        breakdown.update(archive.rating_breakdown(mechanic_id))
+        total_ratings = sum(breakdown.values())
         
-        if not ratings:
+        if not total_ratings:
             return jsonify({
                 "average_rating": 0,
                 "total_ratings": 0,
-                "rating_breakdown": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+                "rating_breakdown": breakdown
             }), 200
         
-        total_ratings = len(ratings)
-        average_rating = sum(r.rating for r in ratings) / total_ratings
-        
-        # Calculate rating breakdown
-        breakdown = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        for rating in ratings:
-            breakdown[rating.rating] += 1
+        average_rating = sum(stars * count for stars, count in breakdown.items()) / total_ratings
         
         return jsonify({
             "average_rating": round(average_rating, 1),
@@ -1459,8 +2255,8 @@ def get_mechanic_average_rating(mechanic_id):
             "rating_breakdown": breakdown
         }), 200
 
-    except Exception as e:
-        print(f"Error getting mechanic rating: {e}")
+    except Exception:
+        logger.exception("Error getting mechanic rating")
         return jsonify({"error": "Internal server error"}), 500
     
     
@@ -1468,7 +2264,7 @@ def get_mechanic_average_rating(mechanic_id):
 # Initialize database
 # ------------------------
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
-        create_default_admin()  # Add this line
-    socketio.run(app, host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    init_database()
+    start_background_tasks()
+    # Development server; use serve.py for production
+    socketio.run(app, host=app.config["HOST"], port=app.config["PORT"], debug=app.config["DEBUG"])
\ No newline at end of file
@@ -0,0 +1,144 @@
+# File: archive.py
+
+"""Move finished bookings, with their ratings, out of the hot tables.
+
+``archive_bookings`` moves Completed and Rejected bookings that have not
+changed for ``older_than`` into ``bookings_archive``, and their ratings into
+``ratings_archive``. Each batch is an INSERT ... SELECT followed by a DELETE,
+committed together, so a row is always in exactly one of the two tables.
+Rows keep their ids, so a booking id stays valid after archiving.
+
+Some bookings are left in place:
+- bookings a fraud report points at, because investigations join them;
+- the newest booking and the booking of the newest rating. SQLite hands out
+  ``max(id) + 1`` as the next id, so deleting the newest row would let a new
+  booking or rating reuse an archived id.
+
+The read helpers below answer booking and rating questions across both
+tables. History endpoints merge the archive in only when asked to.
+"""
+
+import heapq
+from datetime import datetime
+from operator import attrgetter
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+
+from models import (
+    db, ArchivedBooking, ArchivedRating, Booking, BookingDispatchAttempt, FraudReport, Rating
+)
+from scheduler import heartbeat
+
+FINISHED_STATUSES = ("Completed", "Rejected")
+
+_BOOKING_COLUMNS = [column.name for column in Booking.__table__.columns]
+_RATING_COLUMNS = [column.name for column in Rating.__table__.columns]
+
+
+def _archivable(cutoff, limit):
+    """Ids of up to ``limit`` bookings that may be archived, oldest id first."""
+    newest_booking = select(func.max(Booking.id)).scalar_subquery()
+    newest_rating = select(func.max(Rating.id)).scalar_subquery()
+    return db.session.execute(
+        select(Booking.id).where(
+            Booking.status.in_(FINISHED_STATUSES),
+            Booking.updated_at < cutoff,
+            Booking.id < newest_booking,
+            ~select(FraudReport.id).where(FraudReport.booking_id == Booking.id).exists(),
+            ~select(Rating.id).where(Rating.booking_id == Booking.id, Rating.id == newest_rating).exists()
+        ).order_by(Booking.id).limit(limit)
+    ).scalars().all()
+
+
+def archive_bookings(older_than, batch_size=1000, max_batches=None):
+    """Archive bookings finished before ``now - older_than``; returns bookings and ratings moved.
+
+    The scheduler lease is renewed after every committed batch.
+    """
+    now = datetime.utcnow()
+    cutoff = now - older_than
+    bookings_table, ratings_table = Booking.__table__, Rating.__table__
+    moved = {"bookings": 0, "ratings": 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = _archivable(cutoff, batch_size)
+        if not ids:
+            break
+
+        db.session.execute(insert(ArchivedBooking).from_select(
+            _BOOKING_COLUMNS + ["archived_at"],
+            select(*bookings_table.columns, literal(now)).where(bookings_table.c.id.in_(ids))
+        ))
+        ratings = db.session.execute(insert(ArchivedRating).from_select(
+            _RATING_COLUMNS,
+            select(*ratings_table.columns).where(ratings_table.c.booking_id.in_(ids))
+        )).rowcount
+        db.session.execute(delete(Rating).where(Rating.booking_id.in_(ids)))
+        db.session.execute(delete(BookingDispatchAttempt).where(BookingDispatchAttempt.booking_id.in_(ids)))
+        db.session.execute(delete(Booking).where(Booking.id.in_(ids)))
+        db.session.commit()
+        heartbeat()
+
+        moved["bookings"] += len(ids)
+        moved["ratings"] += ratings
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return moved
+
+
+# ------------------------
+# Reads across hot and archived rows
+# ------------------------
+def get_booking(booking_id):
+    """The booking with ``booking_id``, live or archived, or None."""
+    return db.session.get(Booking, booking_id) or db.session.get(ArchivedBooking, booking_id)
+
+
+def booking_rating(booking_id):
+    return (Rating.query.filter_by(booking_id=booking_id).first()
+            or ArchivedRating.query.filter_by(booking_id=booking_id).first())
+
+
+def newest_first(*queries):
+    """Merge queries that are each ordered by ``created_at`` descending into one stream."""
+    return heapq.merge(*queries, key=attrgetter("created_at"), reverse=True)
+
+
+def in_id_order(*queries):
+    """Merge queries that are each ordered by ``id`` ascending into one stream."""
+    return heapq.merge(*queries, key=attrgetter("id"))
+
+
+def rating_totals(mechanic_ids):
+    """``{mechanic_id: (sum of ratings, number of ratings)}`` over live and archived ratings."""
+    ratings = union_all(
+        select(Rating.mechanic_id, Rating.rating).where(Rating.mechanic_id.in_(mechanic_ids)),
+        select(ArchivedRating.mechanic_id, ArchivedRating.rating)
+        .where(ArchivedRating.mechanic_id.in_(mechanic_ids))
+    ).subquery()
+    rows = db.session.execute(
+        select(ratings.c.mechanic_id, func.sum(ratings.c.rating), func.count())
+        .group_by(ratings.c.mechanic_id)
+    )
+    return {mechanic_id: (int(total), count) for mechanic_id, total, count in rows}
+
+
+def rating_breakdown(mechanic_id):
+    """``{stars: count}`` of a mechanic's live and archived ratings."""
+    breakdown = {}
+    for model in (Rating, ArchivedRating):
+        rows = db.session.query(model.rating, func.count()).filter(
+            model.mechanic_id == mechanic_id
+        ).group_by(model.rating)
+        for stars, count in rows:
+            breakdown[stars] = breakdown.get(stars, 0) + count
+    return breakdown
+
+
+def status_counts(**filters):
+    """``{status: count}`` of archived bookings, optionally filtered by column values."""
+    return dict(
+        db.session.query(ArchivedBooking.status, func.count())
+        .filter_by(**filters).group_by(ArchivedBooking.status).all()
+    )
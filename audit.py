@@ -0,0 +1,295 @@
+# File: audit.py
+
+"""Append-only audit log: buffered writes into monthly partition tables.
+
+``audit_log.record(...)`` captures the client IP and user agent from the
+current request and queues the entry in the session. Once that transaction
+commits, the entry moves to an in-process buffer. A rollback discards it, so
+the log only holds actions that actually happened. The buffer is written in
+batched INSERTs by the ``flush_audit_log`` background job, off the request
+path. When no flush job is running (scheduler disabled, tests), or the buffer
+is full, entries are written straight after the commit.
+
+Rows go to one table per calendar month (``system_audits_YYYYMM``), created
+on demand. Old months can be archived or dropped as whole tables. Reads walk
+the partitions newest first with keyset pagination on
+``(created_at, table, id)``. Every table has its own id sequence, so the
+table name is part of the cursor. Rows written before partitioning stay in
+``system_audits`` and are merged into the results. The list of partitions is
+cached for ``AUDIT_PARTITION_CACHE_TTL`` seconds. A month created by another
+worker shows up in reads once that cache expires.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text, event, inspect, tuple_
+
+from models import db, Admin, SystemAudit
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "system_audits_"
+_PARTITION_NAME = re.compile(r"^system_audits_(\d{6})$")
+_PENDING_KEY = "pending_audit_entries"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_partition_metadata = MetaData()
+
+
+def partition_name(moment):
+    return f"{PARTITION_PREFIX}{moment:%Y%m}"
+
+
+def partition_table(name):
+    """The Table for partition ``name`` (same columns as SystemAudit, no foreign keys)."""
+    table = _partition_metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name, _partition_metadata,
+            Column("id", Integer, primary_key=True),
+            Column("admin_id", Integer),
+            Column("action", String(100), nullable=False),
+            Column("target_type", String(50)),
+            Column("target_id", Integer),
+            Column("description", Text),
+            Column("ip_address", String(45)),
+            Column("user_agent", Text),
+            Column("created_at", DateTime, nullable=False),
+            Index(f"ix_{name}_created", "created_at", "id"),
+            Index(f"ix_{name}_admin", "admin_id", "created_at", "id"),
+            Index(f"ix_{name}_target", "target_type", "target_id", "created_at", "id"),
+        )
+    return table
+
+
+def existing_partitions():
+    """Partition table names, newest month first."""
+    names = [name for name in inspect(db.engine).get_table_names() if _PARTITION_NAME.match(name)]
+    return sorted(names, reverse=True)
+
+
+def _request_context():
+    if not has_request_context():
+        return None, None
+    # Behind a reverse proxy, wrap app.wsgi_app in werkzeug's ProxyFix so this is the client
+    return request.remote_addr, request.headers.get("User-Agent")
+
+
+class AuditWriter:
+    def __init__(self):
+        self.app = None
+        self.buffer = deque()
+        self.buffered = False
+        self.batch_size = 500
+        self.max_buffer = 50000
+        self.written = 0
+        self.flushes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._created = set()
+        self.partition_cache_ttl = 60
+        self._partitions = None
+        self._partitions_expire = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get("AUDIT_BATCH_SIZE", self.batch_size)
+        self.max_buffer = app.config.get("AUDIT_BUFFER_SIZE", self.max_buffer)
+        self.partition_cache_ttl = app.config.get("AUDIT_PARTITION_CACHE_TTL", self.partition_cache_ttl)
+        event.listen(db.session, "after_commit", self._on_commit)
+        event.listen(db.session, "after_soft_rollback", self._on_rollback)
+
+    # ------------------------
+    # Writes
+    # ------------------------
+    def record(self, action, target_type=None, target_id=None, description=None, admin_id=None):
+        """Queue an audit entry in the current transaction; it is kept only if that commits."""
+        ip_address, user_agent = _request_context()
+        db.session.info.setdefault(_PENDING_KEY, []).append({
+            "admin_id": admin_id,
+            "action": action,
+            "target_type": target_type,
+            "target_id": target_id,
+            "description": description,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "created_at": datetime.utcnow(),
+        })
+
+    def _on_commit(self, session):
+        entries = session.info.pop(_PENDING_KEY, None)
+        if not entries:
+            return
+        with self._lock:
+            self.buffer.extend(entries)
+            full = len(self.buffer) >= self.max_buffer
+        if not self.buffered or full:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error writing audit entries")
+
+    def _on_rollback(self, session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
+
+    def flush(self):
+        """Write everything buffered so far in batched INSERTs; returns the number written.
+
+        Uses its own connection, so it is safe to call from a session hook.
+        On failure the entries go back to the front of the buffer.
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self.buffer)
+                self.buffer.clear()
+            if not entries:
+                return 0
+
+            by_partition = {}
+            for entry in entries:
+                by_partition.setdefault(partition_name(entry["created_at"]), []).append(entry)
+
+            try:
+                with db.engine.begin() as conn:
+                    for name, rows in by_partition.items():
+                        table = partition_table(name)
+                        if name not in self._created:
+                            table.create(conn, checkfirst=True)
+                        for start in range(0, len(rows), self.batch_size):
+                            conn.execute(table.insert(), rows[start:start + self.batch_size])
+            except Exception:
+                with self._lock:
+                    self.buffer.extendleft(reversed(entries))
+                raise
+
+            self._created.update(by_partition)
+            with self._lock:
+                if self._partitions is not None and not set(by_partition).issubset(self._partitions):
+                    self._partitions = None
+            self.written += len(entries)
+            self.flushes += 1
+            return len(entries)
+
+    def flush_on_exit(self):
+        if self.app is None or not self.buffer:
+            return
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error flushing audit log at exit")
+
+    def stats(self):
+        return {
+            "buffered": self.buffered,
+            "pending": len(self.buffer),
+            "written": self.written,
+            "flushes": self.flushes
+        }
+
+    # ------------------------
+    # Reads
+    # ------------------------
+    def partitions(self):
+        """``existing_partitions()``, cached for ``partition_cache_ttl`` seconds."""
+        with self._lock:
+            if self._partitions is not None and time.monotonic() < self._partitions_expire:
+                return self._partitions
+        names = existing_partitions()
+        with self._lock:
+            self._partitions = names
+            self._partitions_expire = time.monotonic() + self.partition_cache_ttl
+        return names
+
+    def query(self, since=None, until=None, admin_id=None, target_type=None, target_id=None,
+              action=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """A page of entries newest first, and the cursor for the next page (or None).
+
+        ``cursor`` is the ``(created_at, table, id)`` of the last entry already seen.
+        Entries still sitting in a worker's buffer show up once flushed.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        upper = until
+        if cursor is not None and (upper is None or cursor[0] < upper):
+            upper = cursor[0]
+
+        rows = []
+        for name in self.partitions():
+            month = _PARTITION_NAME.match(name).group(1)
+            if upper is not None and month > f"{upper:%Y%m}":
+                continue
+            if since is not None and month < f"{since:%Y%m}":
+                break
+            rows.extend(self._select(partition_table(name), since, until, admin_id, target_type,
+                                     target_id, action, cursor, limit - len(rows)))
+            if len(rows) >= limit:
+                break
+
+        # Pre-partitioning rows overlap every month, so merge them in
+        rows.extend(self._select(SystemAudit.__table__, since, until, admin_id, target_type,
+                                 target_id, action, cursor, limit))
+        rows.sort(key=_sort_key, reverse=True)
+        rows = rows[:limit]
+
+        admin_ids = {row["admin_id"] for row in rows if row["admin_id"] is not None}
+        names = dict(db.session.query(Admin.id, Admin.name).filter(Admin.id.in_(admin_ids))) if admin_ids else {}
+        for row in rows:
+            row["admin"] = names.get(row["admin_id"], "System")
+
+        next_cursor = _sort_key(rows[-1]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    def _select(self, table, since, until, admin_id, target_type, target_id, action, cursor, limit):
+        if limit <= 0:
+            return []
+        query = table.select()
+        if since is not None:
+            query = query.where(table.c.created_at >= since)
+        if until is not None:
+            query = query.where(table.c.created_at < until)
+        if admin_id is not None:
+            query = query.where(table.c.admin_id == admin_id)
+        if target_type is not None:
+            query = query.where(table.c.target_type == target_type)
+        if target_id is not None:
+            query = query.where(table.c.target_id == target_id)
+        if action is not None:
+            query = query.where(table.c.action == action)
+        if cursor is not None:
+            created_at, source, row_id = cursor
+            # Rows at the cursor's timestamp sort by table name, then id
+            if table.name < source:
+                query = query.where(table.c.created_at <= created_at)
+            elif table.name == source:
+                query = query.where(tuple_(table.c.created_at, table.c.id) < (created_at, row_id))
+            else:
+                query = query.where(table.c.created_at < created_at)
+        query = query.order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit)
+        return [dict(row, source=table.name) for row in db.session.execute(query).mappings()]
+
+
+def _sort_key(row):
+    return row["created_at"], row["source"], row["id"]
+
+
+def encode_cursor(cursor):
+    return f"{cursor[0].isoformat()}|{cursor[1]}|{cursor[2]}" if cursor else None
+
+
+def decode_cursor(value):
+    """Parse an ``encode_cursor`` string; raises ValueError if malformed."""
+    created_at, source, row_id = value.split("|")
+    if source != SystemAudit.__tablename__ and not _PARTITION_NAME.match(source):
+        raise ValueError(f"Unknown audit table {source!r}")
+    return datetime.fromisoformat(created_at), source, int(row_id)
+
+
+audit_log = AuditWriter()
@@ -0,0 +1,379 @@
+# File: availability.py
+
+"""Mechanic availability: compact slot bitmasks and their persistence.
+
+A mechanic's week is 7 x 96 quarter-hour slots packed into one integer
+(Monday 00:00 is bit 0) and stored as 84 bytes in ``MechanicSchedule``.
+Date-specific ``MechanicAvailabilityOverride`` rows replace the weekly
+pattern for a single day. A mechanic without a schedule row is available
+at all times, which matches the old per-day default.
+
+The day-level ``[{"day": "Monday", "is_available": true}, ...]`` format is
+kept as a compatibility view. A day counts as available if any of its slots
+is set, and setting a day turns all of its slots on or off.
+
+Masks and override dates are in the mechanic's local time. Each write also
+stores a UTC index: the weekly mask rotated by the zone's current UTC offset,
+and each override date as a ``[starts_at_utc, ends_at_utc)`` window. Dispatch
+then checks a UTC instant with bit tests and range comparisons, with no
+timezone conversion per candidate. ``refresh_utc_masks`` re-rotates masks
+whose zone has changed offset (DST).
+"""
+
+import calendar
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app
+
+from db_helpers import upsert
+from models import db, MechanicAvailability, MechanicSchedule, MechanicAvailabilityOverride
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+FULL_WEEK = (1 << SLOTS_PER_WEEK) - 1
+WEEK_BYTES = SLOTS_PER_WEEK // 8
+DAY_BYTES = SLOTS_PER_DAY // 8
+
+
+# ------------------------
+# Bitmask helpers
+# ------------------------
+def mask_to_bytes(mask, length=WEEK_BYTES):
+    return mask.to_bytes(length, "little")
+
+
+def bytes_to_mask(raw):
+    return int.from_bytes(raw, "little") if raw else 0
+
+
+def day_mask(week_mask, weekday):
+    """The 96-slot mask for ``weekday`` (0=Monday) of a weekly mask."""
+    return (week_mask >> (weekday * SLOTS_PER_DAY)) & FULL_DAY
+
+
+def with_day(week_mask, weekday, slots):
+    shift = weekday * SLOTS_PER_DAY
+    return (week_mask & ~(FULL_DAY << shift)) | ((slots & FULL_DAY) << shift)
+
+
+def slot_of_day(moment):
+    return (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+
+
+def slot_of_week(moment):
+    return moment.weekday() * SLOTS_PER_DAY + slot_of_day(moment)
+
+
+def _parse_time(value):
+    hours, minutes = (int(part) for part in value.split(":"))
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        raise ValueError(f"Invalid time: {value}")
+    return (hours * 60 + minutes) // SLOT_MINUTES
+
+
+def intervals_to_day_mask(intervals):
+    """[{"start": "08:00", "end": "17:30"}, ...] -> 96-slot mask (end exclusive)."""
+    mask = 0
+    for interval in intervals:
+        start, end = _parse_time(interval["start"]), _parse_time(interval["end"])
+        if end <= start:
+            raise ValueError(f"Interval end must be after start: {interval}")
+        mask |= ((1 << (end - start)) - 1) << start
+    return mask
+
+
+def _format_slot(slot):
+    minutes = slot * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def day_mask_to_intervals(mask):
+    intervals = []
+    slot = 0
+    while slot < SLOTS_PER_DAY:
+        if mask >> slot & 1:
+            start = slot
+            while slot < SLOTS_PER_DAY and mask >> slot & 1:
+                slot += 1
+            intervals.append({"start": _format_slot(start), "end": _format_slot(slot)})
+        else:
+            slot += 1
+    return intervals
+
+
+def rotate(week_mask, slots):
+    """Rotate a weekly mask ``slots`` later in the week (negative for earlier)."""
+    slots %= SLOTS_PER_WEEK
+    return ((week_mask << slots) | (week_mask >> (SLOTS_PER_WEEK - slots))) & FULL_WEEK
+
+
+def is_available_utc(utc_week_mask, now_utc, override=None):
+    """Bit test for the UTC instant ``now_utc``.
+
+    ``override`` is ``(day_slots, starts_at_utc)`` when an override window
+    covers ``now_utc``; it replaces the weekly pattern.
+    """
+    if override is not None:
+        day_slots, starts_at_utc = override
+        slot = min(int((now_utc - starts_at_utc).total_seconds() // 60) // SLOT_MINUTES, SLOTS_PER_DAY - 1)
+        return bool(day_slots >> slot & 1)
+    return bool(utc_week_mask >> slot_of_week(now_utc) & 1)
+
+
+# ------------------------
+# Timezones
+# ------------------------
+def default_timezone():
+    return current_app.config.get("DEFAULT_TIMEZONE", "UTC")
+
+
+def validate_timezone(name):
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        raise ValueError(f"Unknown timezone: {name}")
+    return name
+
+
+def utc_offset_minutes(tz_name, at_utc=None):
+    at_utc = (at_utc or datetime.utcnow()).replace(tzinfo=timezone.utc)
+    return int(at_utc.astimezone(ZoneInfo(tz_name)).utcoffset().total_seconds() // 60)
+
+
+def to_utc_mask(week_mask, offset_minutes):
+    # Local = UTC + offset, so a local slot maps offset/15 slots earlier in UTC
+    return rotate(week_mask, -(offset_minutes // SLOT_MINUTES))
+
+
+def local_today(tz_name, now_utc=None):
+    """The current date in ``tz_name``."""
+    now_utc = (now_utc or datetime.utcnow()).replace(tzinfo=timezone.utc)
+    return now_utc.astimezone(ZoneInfo(tz_name)).date()
+
+
+def local_day_window_utc(local_date, tz_name):
+    """The UTC [start, end) covering ``local_date`` in ``tz_name`` (naive UTC datetimes)."""
+    zone = ZoneInfo(tz_name)
+    start = datetime.combine(local_date, datetime.min.time(), zone)
+    end = datetime.combine(local_date + timedelta(days=1), datetime.min.time(), zone)
+    to_naive_utc = lambda dt: dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return to_naive_utc(start), to_naive_utc(end)
+
+
+# ------------------------
+# Compatibility (day-level) view
+# ------------------------
+def parse_day_payload(data):
+    """Validate a list of {"day": "Monday", "is_available": bool} into {day: bool}.
+
+    Invalid entries are skipped; a repeated day keeps its last value.
+    """
+    days = {}
+    for day_data in data:
+        if not isinstance(day_data, dict):
+            continue
+        day_name = day_data.get('day')
+        is_available = day_data.get('is_available')
+        if day_name not in calendar.day_name or is_available is None:
+            continue
+        days[day_name] = bool(is_available)
+    return days
+
+
+def week_mask_to_days(week_mask):
+    return [
+        {"day": day, "is_available": day_mask(week_mask, weekday) != 0}
+        for weekday, day in enumerate(calendar.day_name)
+    ]
+
+
+def apply_days(week_mask, days):
+    for weekday, day in enumerate(calendar.day_name):
+        if day in days:
+            week_mask = with_day(week_mask, weekday, FULL_DAY if days[day] else 0)
+    return week_mask
+
+
+# ------------------------
+# Persistence
+# ------------------------
+def load_schedules(mechanic_ids):
+    """{mechanic_id: (local weekly mask, timezone)}; missing schedules are always available."""
+    schedules = {mechanic_id: (FULL_WEEK, default_timezone()) for mechanic_id in mechanic_ids}
+    if mechanic_ids:
+        rows = db.session.query(
+            MechanicSchedule.mechanic_id, MechanicSchedule.weekly_slots, MechanicSchedule.timezone
+        ).filter(MechanicSchedule.mechanic_id.in_(mechanic_ids))
+        for mechanic_id, weekly_slots, tz_name in rows:
+            schedules[mechanic_id] = (bytes_to_mask(weekly_slots), tz_name)
+    return schedules
+
+
+def load_week_masks(mechanic_ids):
+    """{mechanic_id: local weekly mask}."""
+    return {mechanic_id: mask for mechanic_id, (mask, _) in load_schedules(mechanic_ids).items()}
+
+
+def save_schedules(schedules):
+    """Upsert {mechanic_id: (local weekly mask, timezone)} with their UTC index; the caller commits."""
+    now = datetime.utcnow()
+    offsets = {}
+    rows = []
+    for mechanic_id, (mask, tz_name) in schedules.items():
+        if tz_name not in offsets:
+            offsets[tz_name] = utc_offset_minutes(tz_name, now)
+        rows.append({
+            "mechanic_id": mechanic_id,
+            "weekly_slots": mask_to_bytes(mask),
+            "timezone": tz_name,
+            "utc_weekly_slots": mask_to_bytes(to_utc_mask(mask, offsets[tz_name])),
+            "utc_offset_minutes": offsets[tz_name],
+            "updated_at": now
+        })
+    if rows:
+        table = MechanicSchedule.__table__
+        upsert(table, rows, [table.c.mechanic_id], [
+            "weekly_slots", "timezone", "utc_weekly_slots", "utc_offset_minutes", "updated_at"
+        ])
+    return len(rows)
+
+
+def upsert_availability(mechanic_ids, days):
+    """Set whole days ({day_name: is_available}) for every mechanic in ``mechanic_ids``.
+
+    One SELECT for the current masks and one upsert per chunk, regardless
+    of how many mechanics or days are involved.
+    """
+    if not days:
+        return 0
+    schedules = load_schedules(list(mechanic_ids))
+    return save_schedules({
+        mechanic_id: (apply_days(mask, days), tz_name)
+        for mechanic_id, (mask, tz_name) in schedules.items()
+    })
+
+
+def upsert_overrides(mechanic_ids, dates, day_slots, reason=None):
+    """Replace availability on specific local ``dates`` with ``day_slots`` for each mechanic."""
+    raw = mask_to_bytes(day_slots, DAY_BYTES)
+    schedules = load_schedules(list(mechanic_ids))
+    windows = {}
+    rows = []
+    for mechanic_id, (_, tz_name) in schedules.items():
+        for date in dates:
+            if (tz_name, date) not in windows:
+                windows[(tz_name, date)] = local_day_window_utc(date, tz_name)
+            starts_at_utc, ends_at_utc = windows[(tz_name, date)]
+            rows.append({
+                "mechanic_id": mechanic_id, "date": date, "day_slots": raw,
+                "starts_at_utc": starts_at_utc, "ends_at_utc": ends_at_utc,
+                "reason": reason, "created_at": datetime.utcnow()
+            })
+    if rows:
+        table = MechanicAvailabilityOverride.__table__
+        upsert(table, rows, [table.c.mechanic_id, table.c.date], [
+            "day_slots", "starts_at_utc", "ends_at_utc", "reason"
+        ])
+    return len(rows)
+
+
+def rewindow_overrides(mechanic_id, tz_name, now_utc=None):
+    """Recompute the UTC windows of current and future overrides for a new ``tz_name``.
+
+    Call after changing a mechanic's timezone, in the same transaction.
+    """
+    # Yesterday too: its window may still be open somewhere on the old zone's clock
+    since = local_today(tz_name, now_utc) - timedelta(days=1)
+    overrides = MechanicAvailabilityOverride.query.filter(
+        MechanicAvailabilityOverride.mechanic_id == mechanic_id,
+        MechanicAvailabilityOverride.date >= since
+    ).all()
+    for override in overrides:
+        override.starts_at_utc, override.ends_at_utc = local_day_window_utc(override.date, tz_name)
+    return len(overrides)
+
+
+def load_utc_masks(mechanic_ids):
+    masks = {mechanic_id: FULL_WEEK for mechanic_id in mechanic_ids}
+    if mechanic_ids:
+        rows = db.session.query(MechanicSchedule.mechanic_id, MechanicSchedule.utc_weekly_slots).filter(
+            MechanicSchedule.mechanic_id.in_(mechanic_ids)
+        )
+        for mechanic_id, utc_weekly_slots in rows:
+            masks[mechanic_id] = bytes_to_mask(utc_weekly_slots)
+    return masks
+
+
+def load_active_overrides(mechanic_ids, now_utc):
+    """{mechanic_id: (day mask, starts_at_utc)} for override windows covering ``now_utc``."""
+    if not mechanic_ids:
+        return {}
+    rows = db.session.query(
+        MechanicAvailabilityOverride.mechanic_id,
+        MechanicAvailabilityOverride.day_slots,
+        MechanicAvailabilityOverride.starts_at_utc
+    ).filter(
+        MechanicAvailabilityOverride.mechanic_id.in_(mechanic_ids),
+        MechanicAvailabilityOverride.starts_at_utc <= now_utc,
+        MechanicAvailabilityOverride.ends_at_utc > now_utc
+    )
+    return {mechanic_id: (bytes_to_mask(day_slots), starts_at) for mechanic_id, day_slots, starts_at in rows}
+
+
+def available_at(mechanic_ids, now_utc):
+    """The subset of ``mechanic_ids`` available at the naive-UTC instant ``now_utc``.
+
+    Two indexed queries and one bit test per candidate.
+    """
+    masks = load_utc_masks(mechanic_ids)
+    overrides = load_active_overrides(mechanic_ids, now_utc)
+    return {
+        mechanic_id for mechanic_id in mechanic_ids
+        if is_available_utc(masks[mechanic_id], now_utc, overrides.get(mechanic_id))
+    }
+
+
+def refresh_utc_masks(now_utc=None):
+    """Re-rotate UTC masks for zones whose offset changed (DST transitions).
+
+    Computes one offset per distinct timezone and rewrites only stale rows.
+    """
+    now_utc = now_utc or datetime.utcnow()
+    zones = [row.timezone for row in db.session.query(MechanicSchedule.timezone).distinct()]
+    refreshed = 0
+    for tz_name in zones:
+        offset = utc_offset_minutes(tz_name, now_utc)
+        stale = db.session.query(MechanicSchedule.mechanic_id, MechanicSchedule.weekly_slots).filter(
+            MechanicSchedule.timezone == tz_name,
+            MechanicSchedule.utc_offset_minutes != offset
+        ).all()
+        if stale:
+            refreshed += save_schedules({
+                mechanic_id: (bytes_to_mask(weekly_slots), tz_name) for mechanic_id, weekly_slots in stale
+            })
+    return refreshed
+
+
+def backfill_schedules_from_legacy():
+    """Build schedules for mechanics that only have legacy per-day rows."""
+    missing = db.session.query(MechanicAvailability.mechanic_id).outerjoin(
+        MechanicSchedule, MechanicSchedule.mechanic_id == MechanicAvailability.mechanic_id
+    ).filter(MechanicSchedule.mechanic_id.is_(None)).distinct()
+    mechanic_ids = [row.mechanic_id for row in missing]
+    if not mechanic_ids:
+        return 0
+
+    days_by_mechanic = {}
+    rows = db.session.query(
+        MechanicAvailability.mechanic_id, MechanicAvailability.day_of_week, MechanicAvailability.is_available
+    ).filter(MechanicAvailability.mechanic_id.in_(mechanic_ids))
+    for mechanic_id, day, is_available in rows:
+        days_by_mechanic.setdefault(mechanic_id, {})[day] = is_available
+
+    tz_name = default_timezone()
+    return save_schedules({
+        mechanic_id: (apply_days(FULL_WEEK, days), tz_name) for mechanic_id, days in days_by_mechanic.items()
+    })
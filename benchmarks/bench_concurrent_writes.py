@@ -0,0 +1,114 @@
+# File: benchmarks/bench_concurrent_writes.py
+
+"""Concurrent writers against the booking endpoints on a file-backed SQLite database.
+
+Each worker thread repeatedly creates a booking and then accepts and
+completes it, the same write mix Socket.IO-driven mechanics and HTTP clients
+produce. Run once per profile to compare:
+
+    python -m benchmarks.bench_concurrent_writes --profile default
+    python -m benchmarks.bench_concurrent_writes --profile tuned
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", choices=["default", "tuned"], default="tuned")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--bookings", type=int, default=50, help="bookings per thread")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="mechapp-bench-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    if args.profile == "default":
+        # Rollback journal, synchronous=FULL and pysqlite's short lock wait
+        os.environ["SQLITE_TUNING"] = "0"
+        os.environ["SQLITE_BUSY_TIMEOUT"] = "5"
+
+    from app import app, db
+    from models import Mechanic, Service, User
+
+    with app.app_context():
+        db.create_all()
+        service = Service(name="Oil Change")
+        db.session.add(service)
+        db.session.flush()
+        for i in range(20):
+            mechanic = Mechanic(
+                name=f"Mechanic {i}", email=f"m{i}@bench", password="x",
+                latitude=-1.28 + i * 0.01, longitude=36.81 + i * 0.01
+            )
+            mechanic.services.append(service)
+            db.session.add(mechanic)
+        users = [User(name=f"User {i}", email=f"u{i}@bench", password="x") for i in range(args.threads)]
+        db.session.add_all(users)
+        db.session.commit()
+        service_id = service.id
+        user_ids = [u.id for u in users]
+
+    latencies = {"create_booking": [], "handle_booking_action": []}
+    errors = []
+    lock = threading.Lock()
+
+    def timed(kind, fn):
+        start = time.perf_counter()
+        response = fn()
+        elapsed = time.perf_counter() - start
+        with lock:
+            if response.status_code >= 400:
+                errors.append((kind, response.status_code, response.get_data(as_text=True)[:120]))
+            else:
+                latencies[kind].append(elapsed)
+        return response
+
+    def worker(user_id):
+        client = app.test_client()
+        for _ in range(args.bookings):
+            response = timed("create_booking", lambda: client.post("/bookings", json={
+                "customer_id": user_id, "service_id": service_id,
+                "latitude": -1.29, "longitude": 36.82, "location": "Bench Rd"
+            }))
+            if response.status_code != 201:
+                continue
+            booking_id = response.get_json()["booking"]["id"]
+            for action in ("Accepted", "Completed"):
+                timed("handle_booking_action", lambda: client.post(
+                    f"/bookings/{booking_id}/action", json={"action": action}
+                ))
+
+    threads = [threading.Thread(target=worker, args=(uid,)) for uid in user_ids]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"profile={args.profile} threads={args.threads} wall={wall:.2f}s "
+          f"throughput={total / wall:.1f} writes/s errors={len(errors)}")
+    for kind, values in latencies.items():
+        if values:
+            print(f"  {kind:<22} n={len(values):5d} mean={statistics.mean(values) * 1000:7.1f}ms "
+                  f"p95={percentile(values, 95) * 1000:7.1f}ms p99={percentile(values, 99) * 1000:7.1f}ms")
+    for kind, status, body in errors[:5]:
+        print(f"  error {kind} {status}: {body}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# File: benchmarks/bench_serialization.py
+
+"""Per-row serialization cost for booking lists: hand-written dicts + stdlib
+jsonify versus compiled schemas + the fast JSON provider.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import app
+from models import Booking, Mechanic, Service, User
+from serializers import BOOKING, FastJSONProvider
+
+
+def make_bookings(n):
+    services = [Service(id=i, name=f"Service {i}") for i in range(1, 11)]
+    users = [User(id=i, name=f"User {i}", phone=f"+2547000{i:05d}") for i in range(1, 1001)]
+    mechanics = [Mechanic(id=i, name=f"Mechanic {i}", phone=f"+2547100{i:05d}") for i in range(1, 201)]
+    now = datetime.utcnow()
+    bookings = []
+    for i in range(n):
+        bookings.append(Booking(
+            id=i + 1,
+            type=services[i % 10].name,
+            location=f"{i} Some Rd, Nairobi",
+            latitude=-1.28 + i * 1e-5,
+            longitude=36.81 + i * 1e-5,
+            status="Pending",
+            created_at=now - timedelta(minutes=i),
+            updated_at=now,
+            customer=users[i % len(users)],
+            mechanic=mechanics[i % len(mechanics)],
+            service=services[i % 10],
+        ))
+    return bookings
+
+
+def legacy_dump(b):
+    return {
+        "id": b.id,
+        "type": b.type,
+        "location": b.location,
+        "latitude": b.latitude,
+        "longitude": b.longitude,
+        "status": b.status,
+        "created_at": b.created_at.isoformat() if b.created_at else None,
+        "updated_at": b.updated_at.isoformat() if b.updated_at else None,
+        "customer": {"id": b.customer.id, "name": b.customer.name, "phone": b.customer.phone},
+        "mechanic": {"id": b.mechanic.id, "name": b.mechanic.name, "phone": b.mechanic.phone} if b.mechanic else None,
+        "service": {"id": b.service.id, "name": b.service.name} if b.service else None
+    }
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bookings = make_bookings(args.rows)
+    legacy_json = DefaultJSONProvider(app)
+    fast_json = FastJSONProvider(app)
+
+    with app.app_context():
+        before = best_of(lambda: legacy_json.dumps([legacy_dump(b) for b in bookings]), args.repeat)
+        after = best_of(lambda: fast_json.dumps(BOOKING.dump_many(bookings)), args.repeat)
+
+    for label, seconds in (("before", before), ("after", after)):
+        print(f"{label:>6}: {seconds * 1000:8.1f} ms total, {seconds / args.rows * 1e6:6.2f} us/row")
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
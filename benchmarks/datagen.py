@@ -0,0 +1,364 @@
+# File: benchmarks/datagen.py
+
+"""Deterministic, scalable synthetic dataset for benchmarks.
+
+Users and mechanics are scattered around Kenyan towns, weighted by
+population, with a Gaussian spread around each centre. Bookings pair a
+customer with a mechanic in the same town. Their statuses and timestamps
+follow a year of traffic that peaks during working hours, and about half of
+completed bookings are rated.
+
+The same ``seed`` and sizes always give the same rows. Rows are produced in
+independent chunks, each with its own RNG, so chunks can be generated in
+any order or in parallel (``workers``). Load a dataset with seed.py, or:
+
+    python -m benchmarks.datagen --users 200000 --mechanics 20000 --bookings 2000000 --workers 4
+"""
+
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta
+
+# name, latitude, longitude, population weight, spread (km, 1 sigma)
+CITIES = [
+    ("Nairobi", -1.2864, 36.8172, 0.45, 10.0),
+    ("Mombasa", -4.0435, 39.6682, 0.15, 7.0),
+    ("Kisumu", -0.0917, 34.7680, 0.10, 5.0),
+    ("Nakuru", -0.3031, 36.0800, 0.10, 5.0),
+    ("Eldoret", 0.5143, 35.2698, 0.08, 4.0),
+    ("Thika", -1.0333, 37.0693, 0.07, 3.0),
+    ("Machakos", -1.5177, 37.2634, 0.05, 3.0),
+]
+CITY_WEIGHTS = [city[3] for city in CITIES]
+
+SERVICE_NAMES = [
+    "Oil Change",
+    "Brake Repair",
+    "Tire Replacement",
+    "Engine Diagnostics",
+    "Battery Replacement",
+    "Transmission Repair",
+    "Suspension Repair",
+    "Air Conditioning",
+    "Electrical Systems",
+    "Car Wash & Detailing",
+]
+
+# Terminal statuses for bookings older than ACTIVE_WINDOW, with weights
+TERMINAL_STATUSES = (["Completed", "Rejected", "Expired"], [84, 10, 6])
+ACTIVE_STATUSES = (["Pending", "Accepted"], [60, 40])
+ACTIVE_WINDOW = timedelta(hours=2)
+# Relative booking volume per hour of day (local time is close enough to UTC+3)
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 7, 9, 10, 10, 9, 9, 9, 9, 9, 8, 7, 5, 4, 3, 2, 2, 1]
+
+DEFAULT_CHUNK_SIZE = 10000
+PASSWORD = "password123"
+
+
+def _jitter(rng, city):
+    _, lat, lng, _, spread_km = city
+    dlat = rng.gauss(0, spread_km) / 111.0
+    dlng = rng.gauss(0, spread_km) / (111.0 * math.cos(math.radians(lat)))
+    return round(lat + dlat, 6), round(lng + dlng, 6)
+
+
+class Dataset:
+    """Row generators for one (seed, size) combination.
+
+    ``*_offset`` shifts generated ids past rows already in the database.
+    City and service assignments are drawn up front, so every chunk can be
+    generated independently of the others.
+    """
+
+    def __init__(self, users, mechanics, bookings, seed=42, days=365, now=None,
+                 user_offset=0, mechanic_offset=0, booking_offset=0, rating_offset=0,
+                 service_ids=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.users = users
+        self.mechanics = mechanics
+        self.bookings = bookings
+        self.seed = seed
+        self.days = days
+        self.now = (now or datetime.utcnow()).replace(microsecond=0)
+        self.user_offset = user_offset
+        self.mechanic_offset = mechanic_offset
+        self.booking_offset = booking_offset
+        self.rating_offset = rating_offset
+        self.service_ids = list(service_ids or range(1, len(SERVICE_NAMES) + 1))
+        self.chunk_size = chunk_size
+
+        rng = random.Random(f"{seed}:assignments")
+        city_indexes = range(len(CITIES))
+        self.user_city = rng.choices(city_indexes, CITY_WEIGHTS, k=users)
+        self.mechanic_city = rng.choices(city_indexes, CITY_WEIGHTS, k=mechanics)
+        # Each mechanic offers a contiguous (wrapping) window of the service list
+        service_count = len(self.service_ids)
+        self.mechanic_service_start = [rng.randrange(service_count) for _ in range(mechanics)]
+        self.mechanic_service_count = [rng.randint(2, min(6, service_count)) for _ in range(mechanics)]
+
+        self.mechanics_by_city = [[] for _ in CITIES]
+        for index, city in enumerate(self.mechanic_city):
+            self.mechanics_by_city[city].append(index)
+
+    def _rng(self, kind, chunk):
+        return random.Random(f"{self.seed}:{kind}:{chunk}")
+
+    def chunks(self, total):
+        return range((total + self.chunk_size - 1) // self.chunk_size)
+
+    def _chunk_range(self, total, chunk):
+        start = chunk * self.chunk_size
+        return range(start, min(total, start + self.chunk_size))
+
+    def _timestamp(self, rng):
+        day = rng.randrange(self.days)
+        hour = rng.choices(range(24), HOURLY_WEIGHTS)[0]
+        moment = (self.now - timedelta(days=day)).replace(
+            hour=hour, minute=rng.randrange(60), second=rng.randrange(60)
+        )
+        return moment if moment <= self.now else moment - timedelta(days=1)
+
+    # ------------------------
+    # Row generators
+    # ------------------------
+    def user_rows(self, chunk):
+        rng = self._rng("users", chunk)
+        rows = []
+        for index in self._chunk_range(self.users, chunk):
+            user_id = self.user_offset + index + 1
+            rows.append({
+                "id": user_id,
+                "name": f"User {user_id}",
+                "email": f"user{user_id}@bench.mechapp",
+                "phone": f"+2549{user_id:08d}",  # outside the demo accounts' +2547 range
+                "password": PASSWORD,
+                "status": "active" if rng.random() > 0.01 else "inactive",
+                "created_at": self._timestamp(rng),
+            })
+        return rows
+
+    def mechanic_rows(self, chunk):
+        rng = self._rng("mechanics", chunk)
+        rows = []
+        for index in self._chunk_range(self.mechanics, chunk):
+            mechanic_id = self.mechanic_offset + index + 1
+            city = CITIES[self.mechanic_city[index]]
+            latitude, longitude = _jitter(rng, city)
+            rows.append({
+                "id": mechanic_id,
+                "name": f"Mechanic {mechanic_id}",
+                "email": f"mechanic{mechanic_id}@bench.mechapp",
+                "phone": f"+2541{mechanic_id:08d}",
+                "password": PASSWORD,
+                "garage_name": f"Garage {mechanic_id}",
+                "garage_location": f"{city[0]} workshop {mechanic_id}",
+                "latitude": latitude,
+                "longitude": longitude,
+                "status": "active" if rng.random() > 0.02 else "inactive",
+                "created_at": self._timestamp(rng),
+            })
+        return rows
+
+    def mechanic_service_ids(self, index):
+        start = self.mechanic_service_start[index]
+        count = self.mechanic_service_count[index]
+        return [self.service_ids[(start + k) % len(self.service_ids)] for k in range(count)]
+
+    def mechanic_service_rows(self, chunk):
+        rows = []
+        for index in self._chunk_range(self.mechanics, chunk):
+            mechanic_id = self.mechanic_offset + index + 1
+            rows.extend({"mechanic_id": mechanic_id, "service_id": service_id}
+                        for service_id in self.mechanic_service_ids(index))
+        return rows
+
+    def booking_rows(self, chunk):
+        """(bookings, ratings) for one chunk; rating ids follow booking order."""
+        rng = self._rng("bookings", chunk)
+        services_by_id = dict(zip(self.service_ids, SERVICE_NAMES))
+        bookings, ratings = [], []
+        rating_id = self.rating_offset + chunk * self.chunk_size
+        for index in self._chunk_range(self.bookings, chunk):
+            booking_id = self.booking_offset + index + 1
+            # A small share of customers make most of the bookings
+            user_index = min(int(rng.paretovariate(1.2)) - 1, self.users - 1) if rng.random() < 0.3 \
+                else rng.randrange(self.users)
+            city_index = self.user_city[user_index]
+            city_mechanics = self.mechanics_by_city[city_index] or range(self.mechanics)
+            mechanic_index = city_mechanics[rng.randrange(len(city_mechanics))]
+            service_id = rng.choice(self.mechanic_service_ids(mechanic_index))
+            latitude, longitude = _jitter(rng, CITIES[city_index])
+
+            created_at = self._timestamp(rng)
+            statuses = ACTIVE_STATUSES if self.now - created_at < ACTIVE_WINDOW else TERMINAL_STATUSES
+            status = rng.choices(*statuses)[0]
+            updated_at = created_at if status == "Pending" else created_at + timedelta(minutes=rng.randint(5, 240))
+            mechanic_id = self.mechanic_offset + mechanic_index + 1
+            customer_id = self.user_offset + user_index + 1
+            bookings.append({
+                "id": booking_id,
+                "type": services_by_id.get(service_id, "Service"),
+                "location": f"{CITIES[city_index][0]} pickup {booking_id}",
+                "latitude": latitude,
+                "longitude": longitude,
+                "status": status,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "customer_id": customer_id,
+                "mechanic_id": mechanic_id,
+                "service_id": service_id,
+            })
+            if status == "Completed" and rng.random() < 0.5:
+                rating_id += 1
+                ratings.append({
+                    "id": rating_id,
+                    "booking_id": booking_id,
+                    "user_id": customer_id,
+                    "mechanic_id": mechanic_id,
+                    "rating": rng.choices([1, 2, 3, 4, 5], [3, 4, 10, 33, 50])[0],
+                    "comment": None,
+                    "created_at": updated_at + timedelta(minutes=rng.randint(1, 600)),
+                })
+        return bookings, ratings
+
+
+# ------------------------
+# Loading
+# ------------------------
+def ensure_services(conn):
+    """Service ids for SERVICE_NAMES, inserting any that are missing."""
+    from models import Service
+
+    table = Service.__table__
+    existing = dict(conn.execute(table.select().with_only_columns(table.c.name, table.c.id)).all())
+    missing = [{"name": name, "status": "active"} for name in SERVICE_NAMES if name not in existing]
+    if missing:
+        conn.execute(table.insert(), missing)
+        existing = dict(conn.execute(table.select().with_only_columns(table.c.name, table.c.id)).all())
+    return [existing[name] for name in SERVICE_NAMES]
+
+
+def next_ids(conn):
+    """Current max id of each generated table, so new rows never collide."""
+    from sqlalchemy import func, select
+    from models import Booking, Mechanic, Rating, User
+
+    return {
+        model.__tablename__: conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar()
+        for model in (User, Mechanic, Booking, Rating)
+    }
+
+
+def sync_sequences(conn):
+    """Move PostgreSQL id sequences past explicitly inserted ids."""
+    if conn.dialect.name != "postgresql":
+        return
+    from sqlalchemy import text
+
+    for table in ("users", "mechanics", "bookings", "ratings"):
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+        ))
+
+
+# Generation worker state: the Dataset is sent once per process, not per chunk
+_worker_dataset = None
+
+
+def _init_worker(dataset):
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def _generate(task, dataset=None):
+    kind, chunk = task
+    dataset = dataset or _worker_dataset
+    if kind == "users":
+        return dataset.user_rows(chunk)
+    if kind == "mechanics":
+        return dataset.mechanic_rows(chunk), dataset.mechanic_service_rows(chunk)
+    return dataset.booking_rows(chunk)
+
+
+def _generated(dataset, kind, total, pool):
+    """Chunks of ``kind`` in order, generated in ``pool`` when there is one."""
+    tasks = [(kind, chunk) for chunk in dataset.chunks(total)]
+    if pool is None:
+        return (_generate(task, dataset) for task in tasks)
+    return pool.imap(_generate, tasks)
+
+
+def load(engine, users, mechanics, bookings, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, log=print):
+    """Append a generated dataset to the database behind ``engine``; returns row counts.
+
+    With ``workers`` > 1, chunks are generated in that many processes while
+    this one inserts them, in a single transaction, in chunk order.
+    """
+    from models import Booking, Mechanic, Rating, User, mechanic_services
+
+    if bookings and not (users and mechanics):
+        raise ValueError("Bookings need at least one user and one mechanic")
+
+    with engine.begin() as conn:
+        service_ids = ensure_services(conn)
+        offsets = next_ids(conn)
+    dataset = Dataset(
+        users, mechanics, bookings, seed=seed, chunk_size=chunk_size, service_ids=service_ids,
+        user_offset=offsets["users"], mechanic_offset=offsets["mechanics"],
+        booking_offset=offsets["bookings"], rating_offset=offsets["ratings"]
+    )
+
+    counts = {"users": 0, "mechanics": 0, "mechanic_services": 0, "bookings": 0, "ratings": 0}
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(workers, _init_worker, (dataset,)) if workers > 1 else None
+    try:
+        with engine.begin() as conn:
+            for rows in _generated(dataset, "users", users, pool):
+                conn.execute(User.__table__.insert(), rows)
+                counts["users"] += len(rows)
+            for rows, links in _generated(dataset, "mechanics", mechanics, pool):
+                conn.execute(Mechanic.__table__.insert(), rows)
+                conn.execute(mechanic_services.insert(), links)
+                counts["mechanics"] += len(rows)
+                counts["mechanic_services"] += len(links)
+            for chunk, (rows, ratings) in enumerate(_generated(dataset, "bookings", bookings, pool)):
+                conn.execute(Booking.__table__.insert(), rows)
+                if ratings:
+                    conn.execute(Rating.__table__.insert(), ratings)
+                counts["bookings"] += len(rows)
+                counts["ratings"] += len(ratings)
+                if log and (chunk + 1) % 10 == 0:
+                    log(f"  {counts['bookings']:,} bookings ({time.perf_counter() - start:.1f}s)")
+            sync_sequences(conn)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    counts["seconds"] = round(time.perf_counter() - start, 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--mechanics", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="processes generating rows")
+    args = parser.parse_args()
+
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        counts = load(db.engine, args.users, args.mechanics, args.bookings,
+                      seed=args.seed, chunk_size=args.chunk_size, workers=args.workers)
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
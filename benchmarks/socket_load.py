@@ -0,0 +1,145 @@
+# File: benchmarks/socket_load.py
+
+"""Socket.IO load harness: concurrent mechanic connections and NEW_BOOKING emit latency.
+
+Start the server separately (see serve.py), seed it with at least one user,
+one service and some mechanics offering that service, then run e.g.:
+
+    python -m benchmarks.socket_load --url http://localhost:5000 \
+        --clients 1000 --bookings 200 --customer-id 1 --service-id 1
+    python -m benchmarks.socket_load --clients 10000 ...
+
+Every client joins a mechanic room, cycling through the mechanics returned by
+GET /mechanics. Emit latency runs from just before POST /bookings is sent to
+the moment a client in the dispatched mechanic's room receives NEW_BOOKING.
+Requires ``python-socketio[asyncio_client]`` (aiohttp).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+import socketio
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+        "max_ms": round(max(values) * 1000, 2) if values else None,
+    }
+
+
+async def connect_client(url, mechanic_id, received, connect_times, semaphore):
+    client = socketio.AsyncClient(reconnection=False)
+
+    @client.on("NEW_BOOKING")
+    async def on_new_booking(data):
+        # The first client in the room to see a booking records its arrival
+        received.setdefault(data["id"], time.perf_counter())
+
+    async with semaphore:
+        start = time.perf_counter()
+        await client.connect(url, transports=["websocket"], wait_timeout=30)
+        await client.emit("join", {"mechanic_id": mechanic_id})
+        connect_times.append(time.perf_counter() - start)
+    return client
+
+
+async def run(args):
+    async with aiohttp.ClientSession() as http:
+        async with http.get(f"{args.url}/mechanics") as response:
+            mechanics = await response.json()
+        mechanic_ids = [m["id"] for m in mechanics if m.get("status", "active") == "active"]
+        if not mechanic_ids:
+            raise SystemExit("No active mechanics; seed the server first")
+
+        received = {}
+        connect_times = []
+        semaphore = asyncio.Semaphore(args.connect_concurrency)
+        results = await asyncio.gather(*(
+            connect_client(args.url, mechanic_ids[i % len(mechanic_ids)], received, connect_times, semaphore)
+            for i in range(args.clients)
+        ), return_exceptions=True)
+        clients = [c for c in results if not isinstance(c, BaseException)]
+        connect_failures = len(results) - len(clients)
+
+        sent_at = {}
+        http_errors = 0
+        rng = random.Random(args.seed)
+        for _ in range(args.bookings):
+            payload = {
+                "customer_id": args.customer_id,
+                "service_id": args.service_id,
+                "latitude": args.lat + rng.uniform(-0.05, 0.05),
+                "longitude": args.lng + rng.uniform(-0.05, 0.05),
+                "location": "Load test",
+            }
+            start = time.perf_counter()
+            async with http.post(f"{args.url}/bookings", json=payload) as response:
+                body = await response.json()
+            if response.status != 201:
+                http_errors += 1
+                continue
+            sent_at[body["booking"]["id"]] = start
+            if args.interval:
+                await asyncio.sleep(args.interval)
+
+        # Give in-flight emits a moment to land
+        await asyncio.sleep(args.drain)
+
+        emit_latencies = [received[bid] - t for bid, t in sent_at.items() if bid in received]
+        report = {
+            "clients_requested": args.clients,
+            "clients_connected": len(clients),
+            "connect_failures": connect_failures,
+            "connect": summarize(connect_times),
+            "bookings_sent": len(sent_at),
+            "booking_http_errors": http_errors,
+            "emits_received": len(emit_latencies),
+            "emit_latency": summarize(emit_latencies),
+        }
+
+        await asyncio.gather(*(c.disconnect() for c in clients), return_exceptions=True)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=100)
+    parser.add_argument("--customer-id", type=int, required=True)
+    parser.add_argument("--service-id", type=int, required=True)
+    parser.add_argument("--lat", type=float, default=-1.2833)
+    parser.add_argument("--lng", type=float, default=36.8167)
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between bookings")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--drain", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# File: benchmarks/workload.py
+
+"""Booking lifecycle workload with per-endpoint latency percentiles.
+
+Loads a synthetic dataset (benchmarks/datagen.py) into a fresh database, then
+runs this scripted flow, in process, through the Flask test client:
+
+    register -> create booking -> accept -> complete -> rate
+
+A Socket.IO test client joins every mechanic's room up front, and each new
+customer's room as it registers, and counts the events it receives. p50/p95/p99 per step go to a JSON
+report tagged with the current git commit. Pass ``--compare`` with an older
+report to flag regressions:
+
+    python -m benchmarks.workload --users 20000 --mechanics 2000 --bookings 200000 \\
+        --iterations 500 --output results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.workload ... --compare results/<baseline>.json
+
+By default the database is a temporary SQLite file; --database-url points it
+at an empty PostgreSQL database instead.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.datagen import CITIES, _jitter
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values):
+    ms = [v * 1000 for v in values]
+    return {
+        "n": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50_ms": round(percentile(ms, 50), 3) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 3) if ms else None,
+        "max_ms": round(max(ms), 3) if ms else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def call(self, name, func, *args, expect=(200, 201), **kwargs):
+        start = time.perf_counter()
+        response = func(*args, **kwargs)
+        body = response.get_json(silent=True)
+        response.close()
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+        if response.status_code not in expect:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        return body
+
+
+def run_workload(app, socketio, iterations, seed):
+    from models import Mechanic, Service
+
+    rng = random.Random(f"{seed}:workload")
+    client = app.test_client()
+    observer = socketio.test_client(app, flask_test_client=client)
+    recorder = Recorder()
+    events = {}
+
+    with app.app_context():
+        service_ids = [service_id for service_id, in Service.query.with_entities(Service.id)]
+        mechanic_ids = [mechanic_id for mechanic_id, in Mechanic.query.with_entities(Mechanic.id)]
+    for mechanic_id in mechanic_ids:
+        observer.emit("join", {"mechanic_id": mechanic_id})
+    observer.get_received()
+    run_tag = f"{seed}-{int(time.time())}"
+
+    for i in range(iterations):
+        # register
+        user = recorder.call("POST /register", client.post, "/register", json={
+            "name": f"Workload {i}",
+            "email": f"workload-{run_tag}-{i}@bench.mechapp",
+            "phone": f"+2549{run_tag[-6:]}{i:06d}",
+            "password": "password123",
+        })
+        if not user:
+            continue
+        user_id = user["user"]["id"]
+        start = time.perf_counter()
+        observer.emit("join", {"user_id": user_id})
+        recorder.latencies.setdefault("socket join", []).append(time.perf_counter() - start)
+
+        # create booking near a town centre, weighted like the dataset
+        city = rng.choices(CITIES, [c[3] for c in CITIES])[0]
+        latitude, longitude = _jitter(rng, city)
+        booking = recorder.call("POST /bookings", client.post, "/bookings", json={
+            "customer_id": user_id,
+            "service_id": rng.choice(service_ids),
+            "latitude": latitude,
+            "longitude": longitude,
+            "location": f"{city[0]} workload {i}",
+        })
+        if not booking:
+            continue
+        booking_id = booking["booking"]["id"]
+
+        # accept -> complete -> rate
+        for action in ("Accepted", "Completed"):
+            recorder.call(f"POST /bookings/<id>/action {action}", client.post,
+                          f"/bookings/{booking_id}/action", json={"action": action})
+        recorder.call("POST /ratings", client.post, "/ratings", json={
+            "booking_id": booking_id,
+            "user_id": user_id,
+            "rating": rng.choices([1, 2, 3, 4, 5], [3, 4, 10, 33, 50])[0],
+            "comment": "workload",
+        })
+
+        for packet in observer.get_received():
+            events[packet["name"]] = events.get(packet["name"], 0) + 1
+
+    observer.disconnect()
+    return recorder, events
+
+
+def compare(report, baseline_path, threshold):
+    """Endpoints whose p95 rose more than ``threshold`` (a fraction) over the baseline."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = {}
+    for name, stats in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before or not before.get("p95_ms") or stats.get("p95_ms") is None:
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"]
+        if change > threshold:
+            regressions[name] = {
+                "baseline_p95_ms": before["p95_ms"],
+                "p95_ms": stats["p95_ms"],
+                "change_pct": round(change * 100, 1),
+            }
+    return {"baseline_commit": baseline.get("commit"), "threshold_pct": threshold * 100,
+            "regressions": regressions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--mechanics", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="empty database to load into (default: temporary SQLite file)")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare p95 against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p95 regression threshold (fraction)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("APP_ENV", "testing")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    database_url = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="mechapp-workload-"), "workload.db")
+    os.environ["TEST_DATABASE_URL"] = database_url
+    os.environ["DATABASE_URL"] = database_url
+
+    from app import app, db, socketio
+    from benchmarks.datagen import load
+
+    with app.app_context():
+        db.create_all()
+        print(f"Loading {args.users:,} users, {args.mechanics:,} mechanics, {args.bookings:,} bookings...",
+              file=sys.stderr)
+        loaded = load(db.engine, args.users, args.mechanics, args.bookings, seed=args.seed,
+                      log=lambda line: print(line, file=sys.stderr))
+
+    start = time.perf_counter()
+    recorder, events = run_workload(app, socketio, args.iterations, args.seed)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "database": database_url.split(":", 1)[0],
+        "dataset": {"users": args.users, "mechanics": args.mechanics, "bookings": args.bookings,
+                    "seed": args.seed, "load_seconds": loaded["seconds"]},
+        "iterations": args.iterations,
+        "elapsed_seconds": round(elapsed, 3),
+        "endpoints": {name: summarize(values) for name, values in recorder.latencies.items()},
+        "errors": recorder.errors,
+        "socket_events": events,
+    }
+    if args.compare:
+        report["comparison"] = compare(report, args.compare, args.threshold)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text)
+    if args.compare and report["comparison"]["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
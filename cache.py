@@ -0,0 +1,154 @@
+# File: cache.py
+
+"""Read-through caches for hot, rarely-changing reads.
+
+Each ``TTLCache`` keeps entries in an in-process LRU with a time-to-live, or in
+a shared Redis backend when one is configured (so invalidations made by one
+worker are seen by all of them). Writers call ``invalidate``/``clear``
+explicitly after committing.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from serializers import dumps, loads
+
+_MISSING = object()
+
+
+class LocalBackend:
+    """Thread-safe in-process LRU store with per-entry expiry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """Shared store for multi-worker deployments. Values must be JSON-serializable."""
+
+    def __init__(self, client, namespace):
+        self.client = client
+        self.prefix = f"mechapp:cache:{namespace}:"
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + str(key))
+        return _MISSING if raw is None else loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + str(key), dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + str(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class TTLCache:
+    def __init__(self, name, maxsize=1024, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = LocalBackend(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` on a miss.
+
+        A loader result of ``None`` is returned but not cached (e.g. not found).
+        """
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, key):
+        self.invalidations += 1
+        self.backend.delete(key)
+
+    def clear(self):
+        self.invalidations += 1
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+# ------------------------
+# Cache registry
+# ------------------------
+service_catalog = TTLCache("service_catalog", maxsize=8, ttl=3600)
+mechanic_profiles = TTLCache("mechanic_profiles", maxsize=4096, ttl=300)
+
+caches = {cache.name: cache for cache in (service_catalog, mechanic_profiles)}
+
+
+def configure_caches(redis_url=None):
+    """Switch every cache to a shared Redis backend when ``redis_url`` is set."""
+    if not redis_url:
+        return
+    import redis  # optional dependency, only needed for shared caching
+
+    client = redis.Redis.from_url(redis_url)
+    for cache in caches.values():
+        cache.backend = RedisBackend(client, cache.name)
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,192 @@
+# File: config.py
+
+"""Environment-driven application configuration.
+
+Select a profile with APP_ENV (development, production, testing) and point
+DATABASE_URL at the database. PostgreSQL is the production target; SQLite
+remains supported for development and single-node deployments.
+"""
+
+import os
+
+
+def _int_env(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _float_env(name, default):
+    return float(os.environ.get(name, default))
+
+
+def normalize_database_url(url):
+    # Some hosting providers still hand out the pre-SQLAlchemy-1.4 scheme
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+class Config:
+    DEBUG = False
+    TESTING = False
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+    # IANA zone for mechanics that have not set their own
+    DEFAULT_TIMEZONE = os.environ.get("DEFAULT_TIMEZONE", "Africa/Nairobi")
+    # Seconds between re-rotations of UTC availability masks (DST changes)
+    SCHEDULE_REFRESH_INTERVAL = _int_env("SCHEDULE_REFRESH_INTERVAL", 3600)
+    # Seconds a stored Idempotency-Key response is replayed before eviction
+    IDEMPOTENCY_TTL = _int_env("IDEMPOTENCY_TTL", 24 * 3600)
+    IDEMPOTENCY_PURGE_INTERVAL = _int_env("IDEMPOTENCY_PURGE_INTERVAL", 900)
+    # Lease on a key whose first request is still running; the request renews
+    # it every third of this, so a key whose lease lapsed was left by a dead worker
+    IDEMPOTENCY_IN_FLIGHT_LEASE = _int_env("IDEMPOTENCY_IN_FLIGHT_LEASE", 30)
+
+    # Background job scheduler (scheduler.py); intervals are in seconds
+    SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") != "0"
+    # Seconds a running job's lease outlives its last heartbeat if the worker dies
+    SCHEDULER_LEASE_TTL = _int_env("SCHEDULER_LEASE_TTL", 120)
+    STALE_BOOKING_CHECK_INTERVAL = _int_env("STALE_BOOKING_CHECK_INTERVAL", 60)
+    STALE_BOOKING_BATCH_SIZE = _int_env("STALE_BOOKING_BATCH_SIZE", 200)
+    # Pending this long without a response -> offer to the next nearest mechanic
+    BOOKING_REASSIGN_AFTER = _int_env("BOOKING_REASSIGN_AFTER", 15 * 60)
+    # Pending this long since creation -> status "Expired"
+    BOOKING_EXPIRE_AFTER = _int_env("BOOKING_EXPIRE_AFTER", 60 * 60)
+    NOTIFICATION_PURGE_INTERVAL = _int_env("NOTIFICATION_PURGE_INTERVAL", 3600)
+    NOTIFICATION_READ_RETENTION_DAYS = _int_env("NOTIFICATION_READ_RETENTION_DAYS", 30)
+    NOTIFICATION_RETENTION_DAYS = _int_env("NOTIFICATION_RETENTION_DAYS", 90)
+    # Booking analytics rollups (analytics.py); ROLLUP_SETTLE leaves bookings
+    # changed in the last N seconds for the next run
+    ROLLUP_INTERVAL = _int_env("ROLLUP_INTERVAL", 60)
+    ROLLUP_BATCH_SIZE = _int_env("ROLLUP_BATCH_SIZE", 5000)
+    ROLLUP_SETTLE = _int_env("ROLLUP_SETTLE", 30)
+    # Booking archive (archive.py): Completed/Rejected bookings unchanged for
+    # ARCHIVE_AFTER_DAYS move, with their ratings, to the archive tables
+    ARCHIVE_INTERVAL = _int_env("ARCHIVE_INTERVAL", 3600)
+    ARCHIVE_AFTER_DAYS = _int_env("ARCHIVE_AFTER_DAYS", 90)
+    ARCHIVE_BATCH_SIZE = _int_env("ARCHIVE_BATCH_SIZE", 1000)
+    TEMP_UPLOAD_GC_INTERVAL = _int_env("TEMP_UPLOAD_GC_INTERVAL", 6 * 3600)
+    TEMP_UPLOAD_MAX_AGE = _int_env("TEMP_UPLOAD_MAX_AGE", 24 * 3600)
+    TEMP_UPLOAD_GC_BATCH_SIZE = _int_env("TEMP_UPLOAD_GC_BATCH_SIZE", 500)
+
+    # Fraud risk scoring (fraud_scoring.py): length of the "recent reports" window,
+    # and how often scores are recomputed as old reports age out of it
+    FRAUD_WINDOW_DAYS = _int_env("FRAUD_WINDOW_DAYS", 30)
+    FRAUD_RESCORE_INTERVAL = _int_env("FRAUD_RESCORE_INTERVAL", 3600)
+    # Identical fraud reports within this many seconds of the last one collapse
+    # into it; keys idle for longer are purged every FRAUD_DEDUP_PURGE_INTERVAL
+    FRAUD_DEDUP_WINDOW = _int_env("FRAUD_DEDUP_WINDOW", 24 * 3600)
+    FRAUD_DEDUP_PURGE_INTERVAL = _int_env("FRAUD_DEDUP_PURGE_INTERVAL", 3600)
+    # New fraud reports a user may file per hour and per day
+    FRAUD_REPORTS_PER_HOUR = _int_env("FRAUD_REPORTS_PER_HOUR", 5)
+    FRAUD_REPORTS_PER_DAY = _int_env("FRAUD_REPORTS_PER_DAY", 20)
+
+    # Audit log writer (audit.py): seconds between buffer flushes, rows per
+    # INSERT, the buffer size at which a commit flushes inline instead, and
+    # how long reads reuse the list of monthly partition tables
+    AUDIT_FLUSH_INTERVAL = _int_env("AUDIT_FLUSH_INTERVAL", 2)
+    AUDIT_BATCH_SIZE = _int_env("AUDIT_BATCH_SIZE", 500)
+    AUDIT_BUFFER_SIZE = _int_env("AUDIT_BUFFER_SIZE", 50000)
+    AUDIT_PARTITION_CACHE_TTL = _int_env("AUDIT_PARTITION_CACHE_TTL", 60)
+
+    # Logging (logging_setup.py): LOG_FORMAT is text or json; LOG_SAMPLE_RATE
+    # keeps that share of DEBUG/INFO records, WARNING and above are always kept
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+    LOG_SAMPLE_RATE = _float_env("LOG_SAMPLE_RATE", 1.0)
+
+    # Development/test SQL profiler (query_profiler.py): off unless QUERY_PROFILER=1
+    QUERY_PROFILER = os.environ.get("QUERY_PROFILER", "0") == "1"
+    QUERY_PROFILER_REPEAT_THRESHOLD = _int_env("QUERY_PROFILER_REPEAT_THRESHOLD", 5)
+    QUERY_PROFILER_SLOW_MS = _int_env("QUERY_PROFILER_SLOW_MS", 100)
+
+    DEFAULT_DATABASE_URL = "sqlite:///mech_app.db"
+
+    # Connection pool (server databases only)
+    DB_POOL_SIZE = _int_env("DB_POOL_SIZE", 10)
+    DB_MAX_OVERFLOW = _int_env("DB_MAX_OVERFLOW", 20)
+    DB_POOL_TIMEOUT = _int_env("DB_POOL_TIMEOUT", 30)
+    DB_POOL_RECYCLE = _int_env("DB_POOL_RECYCLE", 1800)
+
+    # SQLite single-node profile: seconds a writer waits on a locked database
+    SQLITE_BUSY_TIMEOUT = _int_env("SQLITE_BUSY_TIMEOUT", 15)
+    # Per-connection pragmas (see sqlite_tuning.py); SQLITE_TUNING=0 disables them
+    SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "1") != "0"
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = _int_env("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE_KB = _int_env("SQLITE_CACHE_SIZE_KB", 64 * 1024)
+    # Seconds between passive WAL checkpoints; 0 leaves it to SQLite's autocheckpoint
+    SQLITE_CHECKPOINT_INTERVAL = _int_env("SQLITE_CHECKPOINT_INTERVAL", 300)
+
+    # Serving. SOCKETIO_ASYNC_MODE is eventlet, gevent or threading; unset picks
+    # the best one installed. SOCKETIO_MESSAGE_QUEUE (e.g. a Redis URL) lets
+    # several worker processes emit to each other's clients.
+    HOST = os.environ.get("HOST", "0.0.0.0")
+    PORT = _int_env("PORT", 5000)
+    SOCKETIO_ASYNC_MODE = os.environ.get("SOCKETIO_ASYNC_MODE") or None
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE")
+
+    @property
+    def SQLALCHEMY_DATABASE_URI(self):
+        return normalize_database_url(os.environ.get("DATABASE_URL", self.DEFAULT_DATABASE_URL))
+
+    @property
+    def SQLALCHEMY_ENGINE_OPTIONS(self):
+        return engine_options(self.SQLALCHEMY_DATABASE_URI, self)
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    DEFAULT_DATABASE_URL = "postgresql://mechapp@localhost/mechapp"
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+
+
+class TestingConfig(Config):
+    TESTING = True
+    DEFAULT_DATABASE_URL = "sqlite://"
+    SOCKETIO_ASYNC_MODE = "threading"
+    SCHEDULER_ENABLED = False
+
+    @property
+    def SQLALCHEMY_DATABASE_URI(self):
+        # TEST_DATABASE_URL lets the same suite run against PostgreSQL
+        return normalize_database_url(os.environ.get("TEST_DATABASE_URL", self.DEFAULT_DATABASE_URL))
+
+
+def engine_options(url, config):
+    """SQLAlchemy create_engine() options appropriate for the database backend."""
+    if url.startswith("sqlite"):
+        options = {
+            "connect_args": {
+                "timeout": config.SQLITE_BUSY_TIMEOUT,
+                # Socket.IO handlers and request threads share the pool
+                "check_same_thread": False,
+            }
+        }
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            # Every connection must see the same in-memory database
+            from sqlalchemy.pool import StaticPool
+            options["poolclass"] = StaticPool
+        return options
+
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+config_by_name = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+    "testing": TestingConfig,
+}
+
+
+def get_config(name=None):
+    name = name or os.environ.get("APP_ENV", "development")
+    return config_by_name[name]()
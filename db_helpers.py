@@ -0,0 +1,32 @@
+# File: db_helpers.py
+
+"""Small database helpers shared by the persistence modules."""
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db
+
+# Rows per INSERT statement; keeps SQLite under its bound-parameter limit
+UPSERT_CHUNK_SIZE = 2000
+
+
+def dialect_insert():
+    """The INSERT construct with ON CONFLICT support for the session's database."""
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
+
+
+def upsert(table, rows, index_elements, update_columns):
+    """INSERT ... ON CONFLICT (index_elements) DO UPDATE, chunked; the caller commits."""
+    insert = dialect_insert()
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(table).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+        db.session.execute(stmt)
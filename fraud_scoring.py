@@ -0,0 +1,262 @@
+# File: fraud_scoring.py
+
+"""Incremental fraud risk scoring for mechanics.
+
+Each mechanic has one ``MechanicRiskProfile`` row of running counters:
+- reports, total and within the recent window;
+- reports per completed booking;
+- the current streak of low ratings;
+- how many distinct users have reported them.
+
+Routes call ``record_report``, ``record_completion``, ``record_rating`` and
+``record_resolution`` in the same transaction as the change itself. Each one
+updates the counters and rescores the mechanic with a constant number of
+statements. The first event for a mechanic builds the profile from history
+once. When the score crosses a severity band, the mechanic's open reports
+are given the new severity.
+
+"Recent reports" is a sliding-window estimate kept in two fixed windows:
+the current window's count plus the previous window's count, scaled by how
+much of it still overlaps the sliding window. The estimate shrinks as time
+passes, so ``rescore_decayed`` recomputes the stored scores of mechanics in
+the review queue periodically.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import joinedload
+
+from db_helpers import dialect_insert
+from models import db, ArchivedBooking, Booking, FraudReport, FraudReporter, MechanicRiskProfile, Rating
+from scheduler import heartbeat
+
+OPEN_STATUSES = ("pending", "under_review")
+# Ratings at or below this extend a low-rating streak
+LOW_RATING = 2
+# Ratings read when building a profile's streak from history
+STREAK_LOOKBACK = 50
+
+# signal: (value at which it saturates, points at saturation); scores run 0-100
+SIGNAL_WEIGHTS = {
+    "recent_reports": (5, 35),
+    "report_ratio": (0.2, 25),
+    "low_rating_streak": (5, 20),
+    "distinct_reporters": (5, 20),
+}
+# Lowest score of each severity band, highest first
+SEVERITY_BANDS = ((75, "critical"), (50, "high"), (25, "medium"), (0, "low"))
+
+
+def _window():
+    return timedelta(days=current_app.config.get("FRAUD_WINDOW_DAYS", 30))
+
+
+def recent_reports(profile, now=None):
+    """Estimated reports in the last window, without modifying ``profile``."""
+    window = _window()
+    elapsed = (now or datetime.utcnow()) - profile.window_start
+    current, previous = profile.window_reports, profile.previous_window_reports
+    if elapsed >= 2 * window:
+        return 0.0
+    if elapsed >= window:
+        current, previous, elapsed = 0, current, elapsed - window
+    return current + previous * max(1 - elapsed / window, 0)
+
+
+def signals(profile, now=None):
+    return {
+        "recent_reports": round(recent_reports(profile, now), 2),
+        "total_reports": profile.total_reports,
+        "completed_bookings": profile.completed_bookings,
+        "report_ratio": round(profile.total_reports / max(profile.completed_bookings, 1), 4),
+        "low_rating_streak": profile.low_rating_streak,
+        "distinct_reporters": profile.distinct_reporters,
+    }
+
+
+def score(profile, now=None):
+    """Risk score (0-100) and severity of ``profile``'s current signals."""
+    values = signals(profile, now)
+    total = sum(
+        points * min(values[name] / saturation, 1)
+        for name, (saturation, points) in SIGNAL_WEIGHTS.items()
+    )
+    severity = next(name for floor, name in SEVERITY_BANDS if total >= floor)
+    return round(total, 2), severity
+
+
+def _roll(profile, now):
+    """Advance the fixed windows so the current one contains ``now``."""
+    window = _window()
+    periods = int((now - profile.window_start) / window)
+    if periods <= 0:
+        return
+    profile.previous_window_reports = profile.window_reports if periods == 1 else 0
+    profile.window_reports = 0
+    profile.window_start += window * periods
+
+
+def _history(mechanic_id, now):
+    """Initial profile values for ``mechanic_id``, read from existing rows once."""
+    total, open_reports, recent, last_report_at = db.session.query(
+        func.count(FraudReport.id),
+        func.count(case((FraudReport.status.in_(OPEN_STATUSES), 1))),
+        func.count(case((FraudReport.created_at >= now - _window(), 1))),
+        func.max(FraudReport.created_at)
+    ).filter(FraudReport.mechanic_id == mechanic_id).one()
+    completed = sum(
+        db.session.query(func.count(model.id)).filter(
+            model.mechanic_id == mechanic_id, model.status == 'Completed'
+        ).scalar()
+        for model in (Booking, ArchivedBooking)
+    )
+
+    streak = 0
+    ratings = db.session.query(Rating.rating).filter(Rating.mechanic_id == mechanic_id).order_by(
+        Rating.created_at.desc(), Rating.id.desc()
+    ).limit(STREAK_LOOKBACK)
+    for value, in ratings:
+        if value > LOW_RATING:
+            break
+        streak += 1
+
+    reporters = FraudReporter.__table__
+    db.session.execute(
+        dialect_insert()(reporters).from_select(
+            ["mechanic_id", "user_id"],
+            select(FraudReport.mechanic_id, FraudReport.user_id)
+            .where(FraudReport.mechanic_id == mechanic_id).distinct()
+        ).on_conflict_do_nothing()
+    )
+    distinct_reporters = db.session.query(func.count()).select_from(reporters).filter(
+        reporters.c.mechanic_id == mechanic_id
+    ).scalar()
+
+    # Reports from the last window count as the previous window, fully overlapping now
+    return {
+        "mechanic_id": mechanic_id,
+        "total_reports": total,
+        "open_reports": open_reports,
+        "window_start": now,
+        "window_reports": 0,
+        "previous_window_reports": recent,
+        "completed_bookings": completed,
+        "low_rating_streak": streak,
+        "distinct_reporters": distinct_reporters,
+        "last_report_at": last_report_at,
+    }
+
+
+def _profile(mechanic_id, now):
+    """The mechanic's profile, locked for this transaction and created from history if missing."""
+    profile = db.session.query(MechanicRiskProfile).filter_by(
+        mechanic_id=mechanic_id
+    ).with_for_update().populate_existing().first()
+    if profile is None:
+        values = _history(mechanic_id, now)
+        db.session.execute(
+            dialect_insert()(MechanicRiskProfile.__table__).values(**values).on_conflict_do_nothing()
+        )
+        profile = db.session.query(MechanicRiskProfile).filter_by(
+            mechanic_id=mechanic_id
+        ).with_for_update().populate_existing().one()
+        profile.risk_score, profile.severity = score(profile, now)
+    _roll(profile, now)
+    return profile
+
+
+def _rescore(profile, now):
+    previous = profile.severity
+    profile.risk_score, profile.severity = score(profile, now)
+    if profile.severity != previous and profile.open_reports:
+        db.session.execute(
+            update(FraudReport)
+            .where(FraudReport.mechanic_id == profile.mechanic_id, FraudReport.status.in_(OPEN_STATUSES))
+            .values(severity=profile.severity)
+        )
+    return profile
+
+
+# ------------------------
+# Events; call before the change itself is added to the session
+# ------------------------
+def record_report(mechanic_id, user_id, now=None):
+    """Count a new report by ``user_id``; returns the profile (use its severity for the report)."""
+    now = now or datetime.utcnow()
+    profile = _profile(mechanic_id, now)
+    profile.total_reports += 1
+    profile.open_reports += 1
+    profile.window_reports += 1
+    profile.last_report_at = now
+    inserted = db.session.execute(
+        dialect_insert()(FraudReporter.__table__)
+        .values(mechanic_id=mechanic_id, user_id=user_id)
+        .on_conflict_do_nothing()
+    ).rowcount
+    if inserted:
+        profile.distinct_reporters += 1
+    return _rescore(profile, now)
+
+
+def record_completion(mechanic_id, now=None):
+    now = now or datetime.utcnow()
+    profile = _profile(mechanic_id, now)
+    profile.completed_bookings += 1
+    return _rescore(profile, now)
+
+
+def record_rating(mechanic_id, rating, now=None):
+    now = now or datetime.utcnow()
+    profile = _profile(mechanic_id, now)
+    profile.low_rating_streak = profile.low_rating_streak + 1 if rating <= LOW_RATING else 0
+    return _rescore(profile, now)
+
+
+def record_resolution(mechanic_id, now=None):
+    """An open report was resolved or dismissed."""
+    now = now or datetime.utcnow()
+    profile = _profile(mechanic_id, now)
+    profile.open_reports = max(profile.open_reports - 1, 0)
+    return _rescore(profile, now)
+
+
+def rescore_decayed(now=None, batch_size=500):
+    """Recompute the scores of queued mechanics whose recent reports are decaying; returns how many.
+
+    Commits after every batch and renews the scheduler lease.
+    """
+    now = now or datetime.utcnow()
+    rescored, after = 0, 0
+    while True:
+        profiles = db.session.query(MechanicRiskProfile).filter(
+            MechanicRiskProfile.mechanic_id > after,
+            MechanicRiskProfile.open_reports > 0,
+            (MechanicRiskProfile.window_reports > 0) | (MechanicRiskProfile.previous_window_reports > 0)
+        ).order_by(MechanicRiskProfile.mechanic_id).limit(batch_size).with_for_update().all()
+        if not profiles:
+            break
+        for profile in profiles:
+            _roll(profile, now)
+            _rescore(profile, now)
+        db.session.commit()
+        heartbeat()
+
+        rescored += len(profiles)
+        after = profiles[-1].mechanic_id
+        if len(profiles) < batch_size:
+            break
+    return rescored
+
+
+# ------------------------
+# Reads
+# ------------------------
+def review_queue(limit=50, offset=0):
+    """Profiles of mechanics with open reports, highest risk first."""
+    return MechanicRiskProfile.query.options(joinedload(MechanicRiskProfile.mechanic)).filter(
+        MechanicRiskProfile.open_reports > 0
+    ).order_by(
+        MechanicRiskProfile.risk_score.desc(), MechanicRiskProfile.mechanic_id
+    ).limit(limit).offset(offset).all()
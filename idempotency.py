@@ -0,0 +1,197 @@
+# File: idempotency.py
+
+"""Idempotency-Key support for POST endpoints that must not run twice.
+
+The first request with a given key claims it by inserting an
+``IdempotencyKey`` row. The unique (scope, key) constraint settles concurrent
+duplicates, so no lock is taken. Once the view finishes, its response is
+stored on that row. Retries with the same key and body get the stored
+response back without running the view again. A key that is still in flight
+gets 409, and a key reused with a different body gets 422. Server errors,
+rate limits (429) and conflicts (409) are not final answers, so they
+release the key and the client can retry. Rows expire after IDEMPOTENCY_TTL
+seconds and are removed by ``purge_expired_keys``.
+
+While the first request runs, its row holds a lease of
+IDEMPOTENCY_IN_FLIGHT_LEASE seconds in ``expires_at``. A background thread
+renews the lease until the view returns, however long it takes. A row whose
+lease lapsed belongs to a worker that died mid-request, and the next retry
+reclaims it. Under eventlet/gevent the renewal needs a cooperative database
+driver (psycopg2 with psycogreen), like everything else on that worker. Keys are
+scoped per caller, taken from a field of the JSON body, so two clients that
+happen to pick the same key do not collide.
+"""
+
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# Answers that may change on retry; everything below 500 but these is stored
+RETRYABLE_STATUSES = (409, 429)
+
+
+def _reclaimable(existing, now):
+    """True if ``existing`` expired, or its in-flight lease lapsed because its worker died."""
+    return existing.expires_at <= now
+
+
+def _lease_seconds():
+    return current_app.config.get("IDEMPOTENCY_IN_FLIGHT_LEASE", 30)
+
+
+class _LeaseKeeper:
+    """Renews an in-flight key's lease from a background thread until stopped."""
+
+    def __init__(self, engine, record_id, lease_seconds):
+        self.engine = engine
+        self.record_id = record_id
+        self.lease = timedelta(seconds=lease_seconds)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"idempotency-lease-{record_id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.lease.total_seconds() / 3):
+            try:
+                # Own connection: the request's session is busy running the view
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        update(IdempotencyKey)
+                        .where(IdempotencyKey.id == self.record_id, IdempotencyKey.status_code.is_(None))
+                        .values(expires_at=datetime.utcnow() + self.lease)
+                    )
+            except Exception:
+                logger.exception("Error renewing Idempotency-Key lease")
+
+
+def _caller_scope(scope, caller_field):
+    """``scope`` narrowed to the caller named by ``caller_field`` of the JSON body, if any."""
+    if caller_field is None:
+        return scope
+    body = request.get_json(silent=True)
+    caller = body.get(caller_field) if isinstance(body, dict) else None
+    # Caller ids are integer primary keys; anything else keeps the shared scope
+    if not isinstance(caller, int) or isinstance(caller, bool):
+        return scope
+    return f"{scope}:{caller}"
+
+
+def _claim(scope, key, request_hash, now):
+    """Insert the in-flight row; returns its id, or None if the key already exists."""
+    record = IdempotencyKey(
+        scope=scope,
+        key=key,
+        request_hash=request_hash,
+        created_at=now,
+        expires_at=now + timedelta(seconds=_lease_seconds())
+    )
+    db.session.add(record)
+    try:
+        db.session.commit()
+        return record.id
+    except IntegrityError:
+        db.session.rollback()
+        return None
+
+
+def _replay(existing, request_hash):
+    if existing.request_hash != request_hash:
+        return jsonify({"error": f"{HEADER} was already used with a different request body"}), 422
+    if existing.status_code is None:
+        response = make_response(jsonify({"error": f"A request with this {HEADER} is still being processed"}), 409)
+        response.headers["Retry-After"] = "1"
+        return response
+    response = current_app.response_class(
+        existing.response_body, status=existing.status_code, mimetype="application/json"
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope, caller_field=None):
+    """Honour an optional Idempotency-Key header on the decorated view.
+
+    ``caller_field`` names the JSON body field identifying the caller (e.g.
+    ``user_id``); keys are then unique per caller rather than per endpoint.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+            now = datetime.utcnow()
+            key_scope = _caller_scope(scope, caller_field)
+            record_id = _claim(key_scope, key, request_hash, now)
+
+            if record_id is None:
+                existing = IdempotencyKey.query.filter_by(scope=key_scope, key=key).first()
+                if existing is not None and _reclaimable(existing, now):
+                    # Expired or abandoned: drop that row (by id, so a concurrent
+                    # retry's fresh claim survives) and claim afresh
+                    IdempotencyKey.query.filter_by(id=existing.id).delete()
+                    db.session.commit()
+                    record_id = _claim(key_scope, key, request_hash, now)
+                    existing = None if record_id else IdempotencyKey.query.filter_by(scope=key_scope, key=key).first()
+                if record_id is None:
+                    if existing is None:
+                        return jsonify({"error": f"A request with this {HEADER} is still being processed"}), 409
+                    return _replay(existing, request_hash)
+
+            try:
+                with _LeaseKeeper(db.engine, record_id, _lease_seconds()):
+                    response = make_response(view(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                IdempotencyKey.query.filter_by(id=record_id).delete()
+                db.session.commit()
+                raise
+
+            if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+                # Not a final answer; let the client retry with the same key
+                IdempotencyKey.query.filter_by(id=record_id).delete()
+            else:
+                IdempotencyKey.query.filter_by(id=record_id).update({
+                    "status_code": response.status_code,
+                    "response_body": response.get_data(as_text=True),
+                    "expires_at": datetime.utcnow() + timedelta(
+                        seconds=current_app.config.get("IDEMPOTENCY_TTL", 86400)
+                    )
+                })
+            db.session.commit()
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys(now=None):
+    """Delete expired keys in one statement; returns the number removed."""
+    deleted = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at <= (now or datetime.utcnow())
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
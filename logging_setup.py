@@ -0,0 +1,86 @@
+# File: logging_setup.py
+
+"""Leveled, structured logging with sampling of low-severity records.
+
+LOG_FORMAT=json emits one JSON object per line, with any ``extra={...}``
+fields included. ``text`` is for local development. LOG_SAMPLE_RATE
+(0.0 to 1.0) keeps that share of DEBUG/INFO records so chatty paths can stay
+on under load. WARNING and above are always kept.
+"""
+
+import logging
+import random
+import sys
+from datetime import datetime, timezone
+
+from serializers import dumps
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _extra_fields(record):
+    return {
+        key: value for key, value in record.__dict__.items()
+        if key not in _RESERVED and not key.startswith("_")
+    }
+
+
+class TextFormatter(logging.Formatter):
+    """Classic one-line format with ``extra`` fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            first, _, rest = line.partition("\n")
+            first += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+            line = first + ("\n" + rest if rest else "")
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+_handler = None
+
+
+def configure_logging(config):
+    """Install the app's log handler on the root logger (replacing a previous one)."""
+    global _handler
+    handler = logging.StreamHandler(sys.stderr)
+    if config.get("LOG_FORMAT") == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(TextFormatter())
+    handler.addFilter(SamplingFilter(config.get("LOG_SAMPLE_RATE", 1.0)))
+
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    _handler = handler
+    root.addHandler(handler)
+    root.setLevel(config.get("LOG_LEVEL", "INFO"))
@@ -0,0 +1,247 @@
+# File: metrics.py
+
+"""Request, SQL, Socket.IO and connection-pool metrics in Prometheus text format.
+
+``init_metrics`` hooks a Flask app, its SQLAlchemy engine and its SocketIO
+server. It records:
+
+- per-route request counts and latency histograms;
+- per-request SQL statement counts and time (SQLAlchemy cursor events);
+- Socket.IO emit counts and latency per event name;
+- connection pool gauges, read at scrape time.
+
+Values are per process. With several workers, scrape each one, or sum by
+instance in Prometheus. Latency is measured to the end of the view, so the
+time spent streaming a response body is not included.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Seconds; suits both HTTP handlers and individual SQL statements
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            yield self.name, _labels(self.labelnames, labelvalues), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (+Inf last), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labelvalues, list(counts), total) for labelvalues, (counts, total) in self._values.items()]
+        for labelvalues, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       _labels(self.labelnames, labelvalues, [("le", _number(bound))]), cumulative)
+            yield f"{self.name}_sum", _labels(self.labelnames, labelvalues), total
+            yield f"{self.name}_count", _labels(self.labelnames, labelvalues), cumulative
+
+
+class Gauge:
+    """A gauge read from ``callback()`` at scrape time; None skips it."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def samples(self):
+        value = self.callback()
+        if value is not None:
+            yield self.name, "", value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+request_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request", ("route",), COUNT_BUCKETS))
+request_query_time = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request", ("route",)))
+db_queries = registry.register(Counter(
+    "db_queries_total", "SQL statements executed"))
+db_query_latency = registry.register(Histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements"))
+socketio_emits = registry.register(Counter(
+    "socketio_emits_total", "Socket.IO server emits by event", ("event",)))
+socketio_emit_latency = registry.register(Histogram(
+    "socketio_emit_duration_seconds", "Time to hand a Socket.IO emit to the transport", ("event",)))
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+
+
+def _pool_gauges(engine):
+    pool = engine.pool
+
+    def reading(method):
+        # StaticPool / NullPool have no size accounting
+        return lambda: getattr(pool, method)() if hasattr(pool, method) else None
+
+    return [
+        Gauge("db_pool_size", "Configured connection pool size", reading("size")),
+        Gauge("db_pool_checked_out", "Connections currently checked out", reading("checkedout")),
+        Gauge("db_pool_checked_in", "Idle connections in the pool", reading("checkedin")),
+        Gauge("db_pool_overflow", "Connections open beyond pool_size", reading("overflow")),
+    ]
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        db_queries.inc()
+        db_query_latency.observe(elapsed)
+        if has_request_context() and "metrics_sql_count" in g:
+            g.metrics_sql_count += 1
+            g.metrics_sql_seconds += elapsed
+
+    for gauge in _pool_gauges(engine):
+        registry.register(gauge)
+
+
+def instrument_socketio(socketio):
+    """Wrap ``socketio.emit`` so every server-side emit is counted and timed."""
+    original_emit = socketio.emit
+
+    def emit(event_name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_emit(event_name, *args, **kwargs)
+        finally:
+            socketio_emits.inc(event_name)
+            socketio_emit_latency.observe(time.perf_counter() - start, event_name)
+
+    socketio.emit = emit
+
+
+def init_metrics(app, engine, socketio=None):
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_seconds = 0.0
+
+    @app.after_request
+    def _remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    # Teardown runs even when the view raised, so unhandled errors count as 500s
+    @app.teardown_request
+    def _record_request_metrics(exc):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = _route()
+            status = 500 if exc is not None else g.get("metrics_status", 500)
+            http_requests.inc(request.method, route, str(status))
+            http_latency.observe(time.perf_counter() - start, request.method, route)
+            request_queries.observe(g.metrics_sql_count, route)
+            request_query_time.observe(g.metrics_sql_seconds, route)
+
+    instrument_engine(engine)
+    if socketio is not None:
+        instrument_socketio(socketio)
+
+
+def render_metrics():
+    return registry.render()
@@ -31,7 +31,7 @@ class User(db.Model):
             "status": self.status,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "membership": "Premium Member",  # You can make this dynamic later
-            "bookings_count": len(self.bookings) if self.bookings else 0
+            "bookings_count": self.bookings_count or 0
         }
 
     def __repr__(self):
@@ -58,9 +58,12 @@ class Mechanic(db.Model):
     bookings = db.relationship("Booking", back_populates="mechanic", foreign_keys="Booking.mechanic_id")
     services = db.relationship("Service", secondary="mechanic_services", back_populates="mechanics")
     
-    # NEW: Relationship to availability schedule
+    # Legacy per-day rows; MechanicSchedule is the source of truth for dispatch
     availability = db.relationship("MechanicAvailability", back_populates="mechanic", cascade="all, delete-orphan")
+    schedule = db.relationship("MechanicSchedule", back_populates="mechanic", uselist=False, cascade="all, delete-orphan")
 
+    # Bounding-box prefilter for nearby searches and dispatch
+    __table_args__ = (db.Index('ix_mechanics_location', 'latitude', 'longitude'),)
 
     def __repr__(self):
         return f"<Mechanic {self.name}>"
@@ -107,6 +110,51 @@ class MechanicAvailability(db.Model):
         return f"<Availability Mechanic:{self.mechanic_id} Day:{self.day_of_week} Available:{self.is_available}>"
 
 
+class MechanicSchedule(db.Model):
+    """Weekly availability as a bitmask of 15-minute slots (see availability.py)."""
+    __tablename__ = "mechanic_schedules"
+
+    mechanic_id = db.Column(db.Integer, db.ForeignKey("mechanics.id"), primary_key=True)
+    # 7 days x 96 slots = 672 bits, Monday 00:00 local time is bit 0; a set bit means available
+    weekly_slots = db.Column(db.LargeBinary(84), nullable=False)
+    timezone = db.Column(db.String(64), nullable=False, default="UTC")
+    # weekly_slots rotated into UTC for the current offset, so dispatch needs no timezone math
+    utc_weekly_slots = db.Column(db.LargeBinary(84), nullable=False)
+    utc_offset_minutes = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    mechanic = db.relationship("Mechanic", back_populates="schedule")
+
+    def __repr__(self):
+        return f"<MechanicSchedule Mechanic:{self.mechanic_id}>"
+
+
+class MechanicAvailabilityOverride(db.Model):
+    """Date-specific availability replacing the weekly pattern for that day (holidays, time off)."""
+    __tablename__ = "mechanic_availability_overrides"
+
+    id = db.Column(db.Integer, primary_key=True)
+    mechanic_id = db.Column(db.Integer, db.ForeignKey("mechanics.id"), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    # 96 bits for the day, local 00:00 is bit 0
+    day_slots = db.Column(db.LargeBinary(12), nullable=False)
+    # The local date as a UTC window [starts_at_utc, ends_at_utc), precomputed on write
+    starts_at_utc = db.Column(db.DateTime, nullable=False)
+    ends_at_utc = db.Column(db.DateTime, nullable=False)
+    reason = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('mechanic_id', 'date', name='_mechanic_date_uc'),
+        db.Index('ix_override_mechanic_window', 'mechanic_id', 'starts_at_utc', 'ends_at_utc'),
+    )
+
+    mechanic = db.relationship("Mechanic", backref=db.backref("availability_overrides", cascade="all, delete-orphan"))
+
+    def __repr__(self):
+        return f"<AvailabilityOverride Mechanic:{self.mechanic_id} Date:{self.date}>"
+
+
 class Service(db.Model):
     __tablename__ = "services"
 
@@ -141,8 +189,68 @@ class Booking(db.Model):
     mechanic = db.relationship("Mechanic", back_populates="bookings", foreign_keys=[mechanic_id])
     service = db.relationship("Service")
 
+    # The analytics rollup job walks bookings in (updated_at, id) order
+    __table_args__ = (db.Index('ix_bookings_updated', 'updated_at', 'id'),)
+
     def __repr__(self):
         return f"<Booking {self.type} - {self.status}>"
+
+
+class ArchivedBooking(db.Model):
+    """A finished booking moved out of ``bookings`` by the archive job (see archive.py); ids are kept."""
+    __tablename__ = "bookings_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    type = db.Column(db.String(100), nullable=False)
+    location = db.Column(db.String(200), nullable=False)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    customer_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    mechanic_id = db.Column(db.Integer, db.ForeignKey("mechanics.id"), nullable=True)
+    service_id = db.Column(db.Integer, db.ForeignKey("services.id"), nullable=True)
+
+    customer = db.relationship("User", foreign_keys=[customer_id])
+    mechanic = db.relationship("Mechanic", foreign_keys=[mechanic_id])
+    service = db.relationship("Service")
+
+    # History endpoints list a user's or mechanic's bookings newest first
+    __table_args__ = (
+        db.Index('ix_bookings_archive_customer', 'customer_id', 'created_at'),
+        db.Index('ix_bookings_archive_mechanic', 'mechanic_id', 'created_at'),
+        db.Index('ix_bookings_archive_created', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<ArchivedBooking {self.type} - {self.status}>"
+
+
+class BookingDispatchAttempt(db.Model):
+    """A mechanic a Pending booking was offered to and taken away from as stale (see stale_bookings_job)."""
+    __tablename__ = "booking_dispatch_attempts"
+    booking_id = db.Column(db.Integer, db.ForeignKey("bookings.id"), primary_key=True)
+    mechanic_id = db.Column(db.Integer, db.ForeignKey("mechanics.id"), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Correlated COUNT so callers never load User.bookings just to count it.
+# Deferred: only emitted when accessed or selected explicitly. Archived
+# bookings still count towards a user's total.
+User.bookings_count = db.column_property(
+    db.select(db.func.count(Booking.id))
+    .where(Booking.customer_id == User.id)
+    .correlate_except(Booking)
+    .scalar_subquery()
+    + db.select(db.func.count(ArchivedBooking.id))
+    .where(ArchivedBooking.customer_id == User.id)
+    .correlate_except(ArchivedBooking)
+    .scalar_subquery(),
+    deferred=True
+)
     
     
 # Add these new models to your existing models.py
@@ -170,6 +278,59 @@ class FraudReport(db.Model):
     booking = db.relationship('Booking', backref='fraud_reports')
     resolver = db.relationship('Admin', foreign_keys=[resolved_by])
 
+    __table_args__ = (db.Index('ix_fraud_reports_mechanic', 'mechanic_id', 'status'),)
+
+class MechanicRiskProfile(db.Model):
+    """Running fraud signals and risk score per mechanic, updated per event (see fraud_scoring.py)."""
+    __tablename__ = 'mechanic_risk_profiles'
+    mechanic_id = db.Column(db.Integer, db.ForeignKey('mechanics.id'), primary_key=True)
+    total_reports = db.Column(db.Integer, nullable=False, default=0)
+    open_reports = db.Column(db.Integer, nullable=False, default=0)  # pending or under_review
+    # Two fixed windows give a sliding-window estimate of recent reports
+    window_start = db.Column(db.DateTime, nullable=False)
+    window_reports = db.Column(db.Integer, nullable=False, default=0)
+    previous_window_reports = db.Column(db.Integer, nullable=False, default=0)
+    completed_bookings = db.Column(db.Integer, nullable=False, default=0)
+    low_rating_streak = db.Column(db.Integer, nullable=False, default=0)
+    distinct_reporters = db.Column(db.Integer, nullable=False, default=0)
+    risk_score = db.Column(db.Float, nullable=False, default=0)
+    severity = db.Column(db.String(20), nullable=False, default='low')
+    last_report_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    mechanic = db.relationship('Mechanic')
+
+    __table_args__ = (db.Index('ix_mechanic_risk_queue', 'risk_score'),)
+
+    def __repr__(self):
+        return f"<MechanicRiskProfile {self.mechanic_id} {self.severity} {self.risk_score:.1f}>"
+
+
+class FraudReporter(db.Model):
+    """One row per (mechanic, reporting user), so distinct reporters are counted on insert."""
+    __tablename__ = 'fraud_reporters'
+    mechanic_id = db.Column(db.Integer, db.ForeignKey('mechanics.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
+
+class FraudReportDedup(db.Model):
+    """Repeats of one fraud report within the dedup window, collapsed into a counter (see report_dedup.py)."""
+    __tablename__ = 'fraud_report_dedup'
+    # sha256 of user, mechanic, booking and normalized reason
+    key = db.Column(db.String(64), primary_key=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('fraud_reports.id'), nullable=True, index=True)
+    repeat_count = db.Column(db.Integer, nullable=False, default=0)
+    last_seen = db.Column(db.DateTime, nullable=False)
+
+
+class RateLimitCounter(db.Model):
+    """Fixed-window event count per key (see ratelimit.py)."""
+    __tablename__ = 'rate_limit_counters'
+    key = db.Column(db.String(100), primary_key=True)
+    window_start = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
 class UserReport(db.Model):
     __tablename__ = 'user_reports'
     id = db.Column(db.Integer, primary_key=True)
@@ -217,6 +378,36 @@ class Notification(db.Model):
     user = db.relationship('User', backref='notifications')
     mechanic = db.relationship('Mechanic', backref='notifications')
     admin = db.relationship('Admin', backref='notifications')
+
+    # Per-recipient inbox scans, newest first (keyset pagination on id)
+    __table_args__ = (
+        db.Index('ix_notifications_user_inbox', 'user_id', 'id'),
+        db.Index('ix_notifications_mechanic_inbox', 'mechanic_id', 'id'),
+        db.Index('ix_notifications_admin_inbox', 'admin_id', 'id'),
+    )
+
+
+class NotificationCounter(db.Model):
+    """Per-recipient read state: unread count and the id up to which everything is read."""
+    __tablename__ = 'notification_counters'
+    recipient_type = db.Column(db.String(20), primary_key=True)  # user, mechanic, admin
+    recipient_id = db.Column(db.Integer, primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+    read_watermark = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<NotificationCounter {self.recipient_type}:{self.recipient_id} unread={self.unread}>"
+
+
+class AdminFeedEntry(db.Model):
+    """One admin copy of a notification and the fan-out (``send`` call) it belongs to."""
+    __tablename__ = 'admin_feed_entries'
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id'), primary_key=True)
+    # Id of the fan-out's first copy; legacy unaddressed notifications are their own fan-out
+    fanout_id = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('ix_admin_feed_entries_fanout', 'fanout_id'),)
+
     
 # Add this ONE table to your existing models.py
 
@@ -235,5 +426,85 @@ class Rating(db.Model):
     user = db.relationship('User', backref='ratings_given')
     mechanic = db.relationship('Mechanic', backref='ratings_received')
 
+    __table_args__ = (db.Index('ix_ratings_mechanic', 'mechanic_id'),)
+
+    def __repr__(self):
+        return f"<Rating {self.rating} stars for Booking {self.booking_id}>"
+
+
+class ArchivedRating(db.Model):
+    """The rating of an archived booking, moved together with it (see archive.py)."""
+    __tablename__ = 'ratings_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings_archive.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    mechanic_id = db.Column(db.Integer, db.ForeignKey('mechanics.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False)
+    comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_ratings_archive_mechanic', 'mechanic_id'),)
+
+    def __repr__(self):
+        return f"<ArchivedRating {self.rating} stars for Booking {self.booking_id}>"
+
+
+class IdempotencyKey(db.Model):
+    """First response for an Idempotency-Key, replayed to client retries (see idempotency.py)."""
+    __tablename__ = 'idempotency_keys'
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(50), nullable=False)  # endpoint name, e.g. create_booking
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of the request body
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the first request is in flight
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    # Concurrent duplicates race on this constraint instead of a lock
+    __table_args__ = (db.UniqueConstraint('scope', 'key', name='_idempotency_scope_key_uc'),)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.scope}:{self.key} {self.status_code}>"
+
+
+class BookingRollup(db.Model):
+    """Booking counts per time bucket and status, for one service or mechanic (see analytics.py)."""
+    __tablename__ = 'booking_rollups'
+    period = db.Column(db.String(4), primary_key=True)  # hour, day
+    dimension = db.Column(db.String(10), primary_key=True)  # service, mechanic
+    bucket = db.Column(db.DateTime, primary_key=True)  # UTC start of the hour/day
+    key = db.Column(db.Integer, primary_key=True)  # service or mechanic id, 0 when unset
+    status = db.Column(db.String(20), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    # Sum of updated_at - created_at over the bucket's Completed bookings
+    completion_seconds = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_booking_rollups_key', 'period', 'dimension', 'key', 'bucket'),
+    )
+
+    def __repr__(self):
+        return f"<BookingRollup {self.period} {self.bucket} {self.dimension}={self.key} {self.status}>"
+
+
+class RollupCursor(db.Model):
+    """How far a rollup job has read its source table, as an (updated_at, id) position."""
+    __tablename__ = 'rollup_cursors'
+    name = db.Column(db.String(50), primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<RollupCursor {self.name} {self.updated_at} #{self.row_id}>"
+
+
+class SchedulerLease(db.Model):
+    """Time-bounded ownership of a background job, so only one worker runs it per interval."""
+    __tablename__ = 'scheduler_leases'
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
     def __repr__(self):
-        return f"<Rating {self.rating} stars for Booking {self.booking_id}>"
\ No newline at end of file
+        return f"<SchedulerLease {self.name} owner={self.owner}>"
@@ -0,0 +1,414 @@
+# File: notifications.py
+
+"""Notification fan-out, per-recipient inboxes and unread counters.
+
+``send`` writes one ``Notification`` row per recipient in a single batched
+INSERT and bumps each recipient's ``NotificationCounter`` in the same
+transaction, so badge counts are a primary-key lookup instead of a COUNT.
+
+Read state is a per-recipient watermark on the counter row: every
+notification with ``id <= read_watermark`` is read. ``is_read`` on the row
+only records exceptions above the watermark, so "mark all read" (or all up
+to a time) is one UPDATE of the counter row however many notifications it
+covers.
+Once the caller commits, every recipient gets a ``NOTIFICATION`` event in
+its Socket.IO room (``admin_<id>``, ``mechanic_<id>``, ``user_<id>``); a
+rollback drops the pending pushes.
+
+Recipients are ``(recipient_type, recipient_id)`` pairs with a type of
+``admin``, ``mechanic`` or ``user``.
+
+The admin copies written by one ``send`` are tied together in
+``AdminFeedEntry`` under a fan-out id. The shared admin feed pages on that
+indexed id, showing each fan-out once, however much history there is.
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, select, union_all
+
+from db_helpers import UPSERT_CHUNK_SIZE, dialect_insert
+from models import db, Admin, AdminFeedEntry, Notification, NotificationCounter
+from serializers import NOTIFICATION
+
+RECIPIENT_COLUMNS = {
+    "admin": Notification.admin_id,
+    "mechanic": Notification.mechanic_id,
+    "user": Notification.user_id,
+}
+
+INBOX_PAGE_SIZE = 50
+MAX_INBOX_PAGE_SIZE = 200
+# Most ids accepted by one mark_read_ids call
+MAX_MARK_READ_IDS = 1000
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "pending_notifications"
+
+
+def room_for(recipient_type, recipient_id):
+    return f"{recipient_type}_{recipient_id}"
+
+
+def admin_recipients(roles=None):
+    """Active admins, optionally limited to ``roles`` (e.g. ``["super_admin"]``)."""
+    query = db.session.query(Admin.id).filter(Admin.status == 'active')
+    if roles:
+        query = query.filter(Admin.role.in_(roles))
+    return [("admin", admin_id) for admin_id, in query]
+
+
+def recipient_of(notification):
+    for recipient_type, column in RECIPIENT_COLUMNS.items():
+        recipient_id = getattr(notification, column.key)
+        if recipient_id is not None:
+            return recipient_type, recipient_id
+    return None
+
+
+def _counter_row(recipient_type, recipient_id):
+    table = NotificationCounter.__table__
+    return db.and_(table.c.recipient_type == recipient_type, table.c.recipient_id == recipient_id)
+
+
+def _watermark(recipient_type, column):
+    """Correlated read watermark for the recipient named by ``column`` (0 without a counter row)."""
+    table = NotificationCounter.__table__
+    return func.coalesce(
+        select(table.c.read_watermark)
+        .where(table.c.recipient_type == recipient_type, table.c.recipient_id == column)
+        .scalar_subquery(),
+        0
+    )
+
+
+def _adjust_counters(deltas):
+    """Add ``{(recipient_type, recipient_id): delta}`` to the unread counters (never below 0)."""
+    table = NotificationCounter.__table__
+    increments = [
+        {"recipient_type": t, "recipient_id": i, "unread": delta}
+        for (t, i), delta in deltas.items() if delta > 0
+    ]
+    insert_counters = dialect_insert()
+    for start in range(0, len(increments), UPSERT_CHUNK_SIZE):
+        stmt = insert_counters(table).values(increments[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.recipient_type, table.c.recipient_id],
+            set_={"unread": table.c.unread + stmt.excluded.unread}
+        )
+        db.session.execute(stmt)
+
+    for (recipient_type, recipient_id), delta in deltas.items():
+        if delta < 0:
+            db.session.execute(
+                table.update()
+                .where(_counter_row(recipient_type, recipient_id))
+                .values(unread=case((table.c.unread > -delta, table.c.unread + delta), else_=0))
+            )
+
+
+@event.listens_for(NotificationCounter.__table__, "after_create")
+def _backfill_counters(target, connection, **kw):
+    """Count the unread notifications that already exist when the counter table is first created."""
+    if not inspect(connection).has_table(Notification.__tablename__):
+        return
+    for recipient_type, column in RECIPIENT_COLUMNS.items():
+        connection.execute(insert(target).from_select(
+            ["recipient_type", "recipient_id", "unread", "read_watermark"],
+            select(literal(recipient_type), column, func.count(), literal(0))
+            .where(column.isnot(None), Notification.is_read.is_(False))
+            .group_by(column)
+        ))
+
+
+@event.listens_for(AdminFeedEntry.__table__, "after_create")
+def _backfill_admin_feed(target, connection, **kw):
+    """Group the admin notifications that already exist into fan-outs, once.
+
+    Copies written by one ``send`` share their content and created_at.
+    """
+    if not inspect(connection).has_table(Notification.__tablename__):
+        return
+    admin = RECIPIENT_COLUMNS["admin"]
+    first_copy = func.min(Notification.id).over(partition_by=(
+        Notification.title, Notification.message, Notification.type,
+        Notification.related_entity, Notification.related_entity_id, Notification.created_at
+    ))
+    connection.execute(insert(target).from_select(
+        ["notification_id", "fanout_id"],
+        union_all(
+            select(Notification.id, first_copy).where(admin.isnot(None)),
+            select(Notification.id, Notification.id)
+            .where(*(column.is_(None) for column in RECIPIENT_COLUMNS.values()))
+        )
+    ))
+
+
+def _drop_feed_entries(*criteria):
+    """Delete the admin feed entries of the notifications matching ``criteria``."""
+    table = AdminFeedEntry.__table__
+    db.session.execute(delete(table).where(
+        table.c.notification_id.in_(select(Notification.id).where(*criteria))
+    ))
+
+
+class NotificationService:
+    def __init__(self):
+        self.socketio = None
+
+    def init_app(self, socketio):
+        """Push committed notifications through ``socketio``."""
+        self.socketio = socketio
+        event.listen(db.session, "after_commit", self._flush_pushes)
+        event.listen(db.session, "after_soft_rollback", self._drop_pushes)
+
+    # ------------------------
+    # Writes
+    # ------------------------
+    def send(self, recipients, title, message, type="info", related_entity=None, related_entity_id=None):
+        """Queue one notification per recipient in the current transaction; the caller commits.
+
+        Returns the number of notifications written.
+        """
+        recipients = list(dict.fromkeys(
+            (recipient_type, recipient_id) for recipient_type, recipient_id in recipients
+            if recipient_id is not None
+        ))
+        if not recipients:
+            return 0
+
+        now = datetime.utcnow()
+        rows = []
+        for recipient_type, recipient_id in recipients:
+            row = {
+                "user_id": None,
+                "mechanic_id": None,
+                "admin_id": None,
+                "title": title,
+                "message": message,
+                "type": type,
+                "is_read": False,
+                "related_entity": related_entity,
+                "related_entity_id": related_entity_id,
+                "created_at": now,
+            }
+            row[RECIPIENT_COLUMNS[recipient_type].key] = recipient_id
+            rows.append(row)
+
+        ids = db.session.scalars(
+            insert(Notification).returning(Notification.id, sort_by_parameter_order=True),
+            rows
+        ).all()
+        _adjust_counters({recipient: 1 for recipient in recipients})
+        admin_copies = [
+            notification_id for (recipient_type, _), notification_id in zip(recipients, ids)
+            if recipient_type == "admin"
+        ]
+        if admin_copies:
+            fanout_id = min(admin_copies)
+            db.session.execute(insert(AdminFeedEntry), [
+                {"notification_id": notification_id, "fanout_id": fanout_id} for notification_id in admin_copies
+            ])
+
+        pending = db.session.info.setdefault(_PENDING_KEY, [])
+        for recipient, notification_id, row in zip(recipients, ids, rows):
+            row["id"] = notification_id
+            pending.append((recipient, {field: row[field] for field in NOTIFICATION.fields}))
+        return len(rows)
+
+    def mark_read(self, notification):
+        """Mark ``notification`` read; returns False if it already was. The caller commits."""
+        recipient = recipient_of(notification)
+        if recipient is None:
+            updated = db.session.query(Notification).filter(
+                Notification.id == notification.id,
+                Notification.is_read.is_(False)
+            ).update({"is_read": True}, synchronize_session=False)
+            return bool(updated)
+        return self.mark_read_ids(*recipient, [notification.id]) > 0
+
+    def mark_read_ids(self, recipient_type, recipient_id, notification_ids):
+        """Flag the recipient's notifications in ``notification_ids`` read in one UPDATE.
+
+        Ids at or below the watermark are already read and are left alone.
+        Returns how many became read. The caller commits.
+        """
+        notification_ids = list(notification_ids)[:MAX_MARK_READ_IDS]
+        if not notification_ids:
+            return 0
+        column = RECIPIENT_COLUMNS[recipient_type]
+        updated = db.session.query(Notification).filter(
+            column == recipient_id,
+            Notification.id.in_(notification_ids),
+            Notification.is_read.is_(False),
+            Notification.id > _watermark(recipient_type, column)
+        ).update({"is_read": True}, synchronize_session=False)
+        if updated:
+            _adjust_counters({(recipient_type, recipient_id): -updated})
+        return updated
+
+    def mark_all_read(self, recipient_type, recipient_id, up_to_id=None, up_to_time=None):
+        """Advance the recipient's watermark to their newest notification.
+
+        ``up_to_id`` / ``up_to_time`` (created_at) stop it earlier. The counter
+        is recounted from the unread exceptions above the new watermark in the
+        same UPDATE. Returns how many became read. The caller commits.
+        """
+        column = RECIPIENT_COLUMNS[recipient_type]
+        newest = select(func.max(Notification.id)).where(column == recipient_id)
+        if up_to_id is not None:
+            newest = newest.where(Notification.id <= up_to_id)
+        if up_to_time is not None:
+            newest = newest.where(Notification.created_at <= up_to_time)
+        watermark = db.session.scalar(newest)
+        if watermark is None:
+            return 0
+
+        table = NotificationCounter.__table__
+        db.session.execute(
+            dialect_insert()(table)
+            .values(recipient_type=recipient_type, recipient_id=recipient_id, unread=0, read_watermark=0)
+            .on_conflict_do_nothing()
+        )
+        before = self.unread_count(recipient_type, recipient_id)
+        new_watermark = case((table.c.read_watermark < watermark, watermark), else_=table.c.read_watermark)
+        still_unread = (
+            select(func.count())
+            .select_from(Notification)
+            .where(column == recipient_id, Notification.id > new_watermark, Notification.is_read.is_(False))
+            .scalar_subquery()
+        )
+        db.session.execute(
+            table.update()
+            .where(_counter_row(recipient_type, recipient_id))
+            .values(read_watermark=new_watermark, unread=still_unread)
+        )
+        return max(before - self.unread_count(recipient_type, recipient_id), 0)
+
+    def purge(self, read_cutoff, hard_cutoff):
+        """Delete read notifications older than ``read_cutoff`` and all older than ``hard_cutoff``.
+
+        A row counts as read if it is flagged or under its recipient's
+        watermark. Unread rows removed by the hard cutoff are taken off their
+        recipients' counters. The caller commits.
+        """
+        deltas = {}
+        deleted = 0
+        for recipient_type, column in RECIPIENT_COLUMNS.items():
+            is_read = db.or_(Notification.is_read.is_(True), Notification.id <= _watermark(recipient_type, column))
+            expiring = db.session.execute(
+                select(column, func.count())
+                .where(column.isnot(None), Notification.created_at < hard_cutoff, db.not_(is_read))
+                .group_by(column)
+            )
+            for recipient_id, count in expiring:
+                deltas[(recipient_type, recipient_id)] = -count
+
+            doomed = (
+                column.isnot(None),
+                db.or_(
+                    db.and_(is_read, Notification.created_at < read_cutoff),
+                    Notification.created_at < hard_cutoff
+                )
+            )
+            if recipient_type == "admin":
+                _drop_feed_entries(*doomed)
+            deleted += db.session.query(Notification).filter(*doomed).delete(synchronize_session=False)
+
+        # Legacy rows addressed to nobody
+        doomed = (
+            *(column.is_(None) for column in RECIPIENT_COLUMNS.values()),
+            db.or_(
+                db.and_(Notification.is_read.is_(True), Notification.created_at < read_cutoff),
+                Notification.created_at < hard_cutoff
+            )
+        )
+        _drop_feed_entries(*doomed)
+        deleted += db.session.query(Notification).filter(*doomed).delete(synchronize_session=False)
+        _adjust_counters(deltas)
+        return deleted
+
+    # ------------------------
+    # Reads
+    # ------------------------
+    def inbox(self, recipient_type, recipient_id, before_id=None, limit=INBOX_PAGE_SIZE, unread_only=False):
+        """A page of the recipient's notifications as dicts, newest first (keyset on id).
+
+        ``is_read`` reflects the watermark as well as the row flag.
+        """
+        column = RECIPIENT_COLUMNS[recipient_type]
+        watermark = self.read_watermark(recipient_type, recipient_id)
+        query = Notification.query.filter(column == recipient_id)
+        if unread_only:
+            query = query.filter(Notification.id > watermark, Notification.is_read.is_(False))
+        if before_id:
+            query = query.filter(Notification.id < before_id)
+        limit = max(1, min(limit, MAX_INBOX_PAGE_SIZE))
+
+        page = NOTIFICATION.dump_many(query.order_by(Notification.id.desc()).limit(limit))
+        for item in page:
+            item["is_read"] = bool(item["is_read"]) or item["id"] <= watermark
+        return page
+
+    def admin_feed(self, limit=INBOX_PAGE_SIZE):
+        """The admin panel's shared feed as dicts, newest first: one entry per admin fan-out.
+
+        A fan-out counts as read once any admin has read their copy.
+        """
+        entries = AdminFeedEntry.__table__
+        limit = max(1, min(limit, MAX_INBOX_PAGE_SIZE))
+        fanout_ids = db.session.scalars(
+            select(entries.c.fanout_id).distinct().order_by(entries.c.fanout_id.desc()).limit(limit)
+        ).all()
+        if not fanout_ids:
+            return []
+
+        admin = RECIPIENT_COLUMNS["admin"]
+        is_read = db.or_(Notification.is_read.is_(True), Notification.id <= _watermark("admin", admin))
+        # The earliest copy still stored stands for the fan-out
+        shown = {
+            notification_id: bool(read) for notification_id, read in db.session.execute(
+                select(func.min(Notification.id), func.max(case((is_read, 1), else_=0)))
+                .join(entries, entries.c.notification_id == Notification.id)
+                .where(entries.c.fanout_id.in_(fanout_ids))
+                .group_by(entries.c.fanout_id)
+            )
+        }
+        notifications = Notification.query.filter(Notification.id.in_(shown)).order_by(Notification.id.desc())
+        page = NOTIFICATION.dump_many(notifications)
+        for item in page:
+            item["is_read"] = shown[item["id"]]
+        return page
+
+    def unread_count(self, recipient_type, recipient_id):
+        table = NotificationCounter.__table__
+        return db.session.scalar(
+            select(table.c.unread).where(_counter_row(recipient_type, recipient_id))
+        ) or 0
+
+    def read_watermark(self, recipient_type, recipient_id):
+        table = NotificationCounter.__table__
+        return db.session.scalar(
+            select(table.c.read_watermark).where(_counter_row(recipient_type, recipient_id))
+        ) or 0
+
+    # ------------------------
+    # Real-time push
+    # ------------------------
+    def _flush_pushes(self, session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending or self.socketio is None:
+            return
+        for (recipient_type, recipient_id), payload in pending:
+            try:
+                self.socketio.emit("NOTIFICATION", payload, room=room_for(recipient_type, recipient_id))
+            except Exception:
+                logger.exception("Error pushing notification %s", payload["id"])
+
+    def _drop_pushes(self, session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
+
+
+notification_service = NotificationService()
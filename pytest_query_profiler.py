@@ -0,0 +1,97 @@
+# File: pytest_query_profiler.py
+
+"""pytest plugin: fail tests that trigger new N+1 query patterns.
+
+Enable it with ``pytest -p pytest_query_profiler``, on the command line or
+in ``addopts`` (the repo's pytest.ini does this). It has to load before any
+conftest.py that imports the app, because it sets QUERY_PROFILER=1 first. Each test runs in a
+profiler scope, and so does every request it makes through the test
+client. If the test triggers a repeated statement shape that is not in
+the baseline file, the test fails.
+
+    --n-plus-one-baseline=PATH   known findings to tolerate (JSON list of keys),
+                                 relative to the rootdir
+    --n-plus-one-update-baseline write the current findings to that file
+                                 instead of failing
+
+Mark a test with ``@pytest.mark.allow_n_plus_one`` to skip the check.
+"""
+
+import json
+import os
+
+import pytest
+
+DEFAULT_BASELINE = ".n_plus_one_baseline.json"
+
+baseline_key = pytest.StashKey[set]()
+seen_key = pytest.StashKey[set]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("query profiler")
+    group.addoption("--n-plus-one-baseline", default=DEFAULT_BASELINE,
+                    help="JSON file of known N+1 findings to tolerate")
+    group.addoption("--n-plus-one-update-baseline", action="store_true",
+                    help="record current N+1 findings into the baseline instead of failing")
+
+
+def _baseline_path(config):
+    """The baseline option, relative paths resolved against the rootdir."""
+    path = config.getoption("--n-plus-one-baseline")
+    return os.path.join(str(config.rootpath), path) if path else path
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_load_initial_conftests(early_config, parser, args):
+    # Before conftest.py files run, since they usually import the app
+    os.environ.setdefault("QUERY_PROFILER", "1")
+
+
+def pytest_configure(config):
+    os.environ.setdefault("QUERY_PROFILER", "1")
+    config.addinivalue_line("markers", "allow_n_plus_one: do not fail this test on N+1 query findings")
+
+    path = _baseline_path(config)
+    baseline = set()
+    if path and os.path.exists(path):
+        with open(path) as f:
+            baseline = set(json.load(f))
+    config.stash[baseline_key] = baseline
+    config.stash[seen_key] = set()
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    from query_profiler import query_profiler
+
+    query_profiler.drain()
+    with query_profiler.scope(item.nodeid):
+        # A failing test raises here and is reported as is
+        result = yield
+    findings = query_profiler.drain()
+    if not findings:
+        return result
+
+    config = item.config
+    config.stash[seen_key].update(finding["key"] for finding in findings)
+    if config.getoption("--n-plus-one-update-baseline") or item.get_closest_marker("allow_n_plus_one"):
+        return result
+
+    new = [finding for finding in findings if finding["key"] not in config.stash[baseline_key]]
+    if new:
+        lines = [f"{len(new)} new N+1 query pattern(s):"]
+        for finding in new:
+            lines.append(f"  {finding['count']}x at {finding['call_site']} ({finding['scope']})")
+            lines.append(f"    {finding['statement'][:300]}")
+        lines.append("Fix them, mark the test allow_n_plus_one, or update the baseline.")
+        pytest.fail("\n".join(lines), pytrace=False)
+    return result
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if config.getoption("--n-plus-one-update-baseline"):
+        path = _baseline_path(config)
+        with open(path, "w") as f:
+            json.dump(sorted(config.stash[seen_key]), f, indent=2)
@@ -0,0 +1,180 @@
+# File: query_profiler.py
+
+"""Opt-in SQL profiler that flags N+1 query patterns and slow statements.
+
+Enable it with QUERY_PROFILER=1 (development and test use only). It
+captures a Python call site for every statement, which costs time.
+
+For each HTTP request, or each explicit ``query_profiler.scope(...)``, it
+groups statements by shape: whitespace is collapsed, IN lists are folded
+and literals are replaced. A shape run at least
+QUERY_PROFILER_REPEAT_THRESHOLD times in one scope is logged as a likely
+N+1, with the application line that issued it. Statements slower than
+QUERY_PROFILER_SLOW_MS are logged as they finish. Findings are also kept on
+``query_profiler.findings`` for the pytest plugin
+(pytest_query_profiler.py).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+_SKIP_PATHS = (os.sep + "site-packages" + os.sep, os.sep + "venv" + os.sep, os.path.abspath(__file__))
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """Normalize SQL so the same query with different parameters compares equal."""
+    shape = _SPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("(?)", shape)
+
+
+def call_site():
+    """``file:line in function`` of the innermost application frame that ran the query."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith("<"):
+            # Generated code, e.g. SQLAlchemy's deprecation wrappers
+            continue
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(_PROJECT_ROOT) and not any(skip in filename for skip in _SKIP_PATHS):
+            return f"{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+class Scope:
+    def __init__(self, label):
+        self.label = label
+        self.shapes = {}  # shape -> [count, total seconds, first call site]
+
+    def record(self, shape, elapsed, site):
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, elapsed, site]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+class QueryProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.repeat_threshold = 5
+        self.slow_ms = 100
+        self.findings = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        self.repeat_threshold = app.config.get("QUERY_PROFILER_REPEAT_THRESHOLD", self.repeat_threshold)
+        self.slow_ms = app.config.get("QUERY_PROFILER_SLOW_MS", self.slow_ms)
+        if not app.config.get("QUERY_PROFILER"):
+            return
+        self.enabled = True
+
+        @app.before_request
+        def _open_request_scope():
+            g.query_profiler_scope = Scope(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}")
+
+        @app.teardown_request
+        def _close_request_scope(exc):
+            scope = g.pop("query_profiler_scope", None)
+            if scope is not None:
+                self._report(scope)
+
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    # ------------------------
+    # Scopes
+    # ------------------------
+    def _current_scope(self):
+        if has_request_context():
+            scope = g.get("query_profiler_scope")
+            if scope is not None:
+                return scope
+        return getattr(self._local, "scope", None)
+
+    def scope(self, label):
+        """Context manager profiling the queries run outside a request (jobs, tests)."""
+        profiler = self
+
+        class _ScopeContext:
+            def __enter__(self):
+                self.previous = getattr(profiler._local, "scope", None)
+                self.scope = profiler._local.scope = Scope(label)
+                return self.scope
+
+            def __exit__(self, *exc):
+                profiler._local.scope = self.previous
+                profiler._report(self.scope)
+                return False
+
+        return _ScopeContext()
+
+    def drain(self):
+        """Return and clear the findings collected so far."""
+        with self._lock:
+            findings, self.findings = self.findings, []
+        return findings
+
+    # ------------------------
+    # Engine hooks
+    # ------------------------
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_profiler_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        site = call_site()
+        if elapsed * 1000 >= self.slow_ms:
+            logger.warning("Slow query", extra={
+                "duration_ms": round(elapsed * 1000, 2), "call_site": site, "statement": statement
+            })
+        scope = self._current_scope()
+        if scope is not None:
+            scope.record(statement_shape(statement), elapsed, site)
+
+    def _report(self, scope):
+        for shape, (count, seconds, site) in scope.shapes.items():
+            if count < self.repeat_threshold:
+                continue
+            finding = {
+                "scope": scope.label,
+                "count": count,
+                "total_ms": round(seconds * 1000, 2),
+                "call_site": site,
+                "statement": shape,
+                "key": finding_key(scope.label, site, shape),
+            }
+            with self._lock:
+                self.findings.append(finding)
+            logger.warning("Possible N+1 query", extra=finding)
+
+
+def finding_key(label, site, shape):
+    """Stable id for a finding; the line number is left out so edits above it don't change it."""
+    location = site.split(":", 1)[0] + " " + site.rsplit(" in ", 1)[-1]
+    digest = hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+    return f"{label} | {location} | {digest}"
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,47 @@
+# File: ratelimit.py
+
+"""Fixed-window rate limits kept in the database, so every worker shares them.
+
+``hit`` counts one event against a key with a single upsert. The counter
+resets when a new window starts. Nothing needs purging: there is one row per
+key, however many windows pass.
+"""
+
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import case
+
+from db_helpers import dialect_insert
+from models import db, RateLimitCounter
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def window_start(now, window_seconds):
+    """Start of the fixed window containing naive-UTC ``now``."""
+    elapsed = int((now - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % window_seconds)
+
+
+def hit(key, limit, window_seconds, now=None):
+    """Count an event for ``key``; returns 0 when within ``limit``, else seconds until the window resets.
+
+    Runs in the caller's transaction; a rolled-back request does not count.
+    """
+    now = now or datetime.utcnow()
+    start = window_start(now, window_seconds)
+    table = RateLimitCounter.__table__
+    stmt = dialect_insert()(table).values(key=key, window_start=start, count=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.key],
+        set_={
+            "count": case((table.c.window_start == start, table.c.count + 1), else_=1),
+            "window_start": start,
+        }
+    ).returning(table.c.count)
+    count = db.session.execute(stmt).scalar()
+    if count <= limit:
+        return 0
+    return max(math.ceil((start - now).total_seconds()) + window_seconds, 1)
@@ -0,0 +1,92 @@
+# File: report_dedup.py
+
+"""Collapse repeated fraud reports into a counter on the first one.
+
+A report's dedup key hashes the reporting user, mechanic, booking and
+normalized reason. ``claim`` upserts that key in one statement. A
+submission counts as a repeat when the key was last seen within the
+FRAUD_DEDUP_WINDOW seconds before it (a sliding window, so a repeat just
+after a fixed boundary is still caught). A repeat only bumps
+``repeat_count`` and gets the existing row back, so it never reaches the
+fraud tables, admin notifications or the audit log. Otherwise the row is
+reset and the submission goes on to create a new report. Concurrent repeats
+race on the primary key rather than a lock.
+
+Keys idle for longer than the window are deleted by ``purge_expired``, so
+repeat counts are kept while a report's key is live.
+"""
+
+import hashlib
+import re
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, null
+
+from db_helpers import dialect_insert
+from models import db, FraudReportDedup
+
+_SPACES = re.compile(r"\s+")
+
+
+def _window():
+    return timedelta(seconds=current_app.config.get("FRAUD_DEDUP_WINDOW", 86400))
+
+
+def dedup_key(user_id, mechanic_id, booking_id, reason):
+    normalized = _SPACES.sub(" ", (reason or "").strip().lower())
+    parts = (user_id, mechanic_id, booking_id or 0, normalized)
+    return hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+
+def claim(user_id, mechanic_id, booking_id, reason, now=None):
+    """``(key, duplicate)``: duplicate is None for a first submission, else the existing row.
+
+    After a first submission, call ``attach(key, report)`` once the report exists.
+    """
+    now = now or datetime.utcnow()
+    key = dedup_key(user_id, mechanic_id, booking_id, reason)
+    table = FraudReportDedup.__table__
+    # A key idle for longer than the window starts over as a first submission
+    lapsed = table.c.last_seen < now - _window()
+    stmt = dialect_insert()(table).values(key=key, repeat_count=0, last_seen=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.key],
+        set_={
+            "repeat_count": case((lapsed, 0), else_=table.c.repeat_count + 1),
+            "report_id": case((lapsed, null()), else_=table.c.report_id),
+            "last_seen": now,
+        }
+    ).returning(table.c.key, table.c.report_id, table.c.repeat_count)
+    row = db.session.execute(stmt).one()
+    return key, (row if row.repeat_count else None)
+
+
+def attach(key, report):
+    """Point a key claimed in this transaction at the report just created."""
+    db.session.execute(
+        FraudReportDedup.__table__.update()
+        .where(FraudReportDedup.key == key)
+        .values(report_id=report.id)
+    )
+
+
+def purge_expired(now=None):
+    """Delete keys idle for longer than the window; returns the number removed."""
+    deleted = FraudReportDedup.query.filter(
+        FraudReportDedup.last_seen < (now or datetime.utcnow()) - _window()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def repeat_counts(report_ids):
+    """Collapsed repeats per live report id; reports without repeats are omitted."""
+    if not report_ids:
+        return {}
+    rows = db.session.query(
+        FraudReportDedup.report_id, func.sum(FraudReportDedup.repeat_count)
+    ).filter(
+        FraudReportDedup.report_id.in_(report_ids), FraudReportDedup.repeat_count > 0
+    ).group_by(FraudReportDedup.report_id)
+    return {report_id: int(total) for report_id, total in rows}
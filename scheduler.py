@@ -0,0 +1,206 @@
+# File: scheduler.py
+
+"""In-process scheduler for periodic maintenance jobs.
+
+Jobs are registered with an interval and run in background tasks started
+through the Socket.IO async backend, so they are green threads under
+eventlet/gevent and OS threads otherwise. Each run sleeps
+``interval * (1 +/- jitter)`` so workers do not fire in lockstep.
+
+With several worker processes, a job runs only in the worker holding its
+lease. A lease is a ``SchedulerLease`` row taken with a conditional UPDATE
+(or INSERT the first time). While the job runs, the lease lasts
+SCHEDULER_LEASE_TTL seconds, which only has to cover a worker dying
+mid-run. Long jobs call ``heartbeat()`` between batches to extend it. When
+the job finishes, the lease is cut back to most of an interval from its
+start, so each job runs once per interval across the deployment. Every job
+keeps its own run metrics.
+"""
+
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, SchedulerLease
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# The lease of the job running in this thread (green thread under eventlet/gevent)
+_running = threading.local()
+
+
+class LeaseLost(Exception):
+    """Another worker took over the running job's lease; the job must stop."""
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter, leader_only):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.leader_only = leader_only
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_duration = 0.0
+        self.last_started_at = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+
+    def next_delay(self):
+        return max(1.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "leader_only": self.leader_only,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped_not_leader": self.skipped,
+            "total_duration_seconds": round(self.total_duration, 4),
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_seconds": round(self.last_duration, 4) if self.last_duration is not None else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error
+        }
+
+
+def acquire_lease(name, ttl_seconds, owner=WORKER_ID):
+    """Take or renew the lease ``name`` for ``ttl_seconds``; True if this worker holds it."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    updated = SchedulerLease.query.filter(
+        SchedulerLease.name == name,
+        db.or_(SchedulerLease.owner == owner, SchedulerLease.expires_at <= now)
+    ).update({"owner": owner, "expires_at": expires_at}, synchronize_session=False)
+    if updated:
+        db.session.commit()
+        return True
+
+    db.session.add(SchedulerLease(name=name, owner=owner, expires_at=expires_at))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Another worker holds an unexpired lease
+        db.session.rollback()
+        return False
+
+
+def renew_lease(name, ttl_seconds, owner=WORKER_ID, until=None):
+    """Set a held lease to expire at ``until`` (default: ``ttl_seconds`` from now).
+
+    Uses its own connection, so the caller's session is left alone. Returns
+    False if this worker no longer holds the lease.
+    """
+    until = until or datetime.utcnow() + timedelta(seconds=ttl_seconds)
+    table = SchedulerLease.__table__
+    mine = (table.c.name == name) & (table.c.owner == owner)
+    with db.engine.begin() as conn:
+        if conn.execute(select(table.c.name).where(mine)).first() is None:
+            return False
+        conn.execute(update(table).where(mine).values(expires_at=until))
+    return True
+
+
+def heartbeat():
+    """Extend the running job's lease; long jobs call it between committed batches.
+
+    Raises ``LeaseLost`` if another worker took the lease, so the job stops
+    before doing more work. Does nothing outside a leader-only scheduled job.
+    """
+    lease = getattr(_running, "lease", None)
+    if lease is None:
+        return
+    name, ttl_seconds = lease
+    if not renew_lease(name, ttl_seconds):
+        raise LeaseLost(name)
+
+
+class Scheduler:
+    def __init__(self):
+        self.jobs = {}
+        self.started = False
+
+    def register(self, name, interval, jitter=0.1, leader_only=True):
+        """Decorator registering ``func`` to run every ``interval`` seconds."""
+        def decorator(func):
+            self.jobs[name] = Job(name, func, interval, jitter, leader_only)
+            return func
+        return decorator
+
+    def run_job(self, app, job):
+        """Run ``job`` once (if this worker holds its lease) and record metrics."""
+        lease_name = f"job:{job.name}"
+        lease_ttl = app.config.get("SCHEDULER_LEASE_TTL", 120)
+        with app.app_context():
+            try:
+                # Held for the run; only outlives it if this worker dies mid-run
+                if job.leader_only and not acquire_lease(lease_name, lease_ttl):
+                    job.skipped += 1
+                    return None
+            except Exception as e:
+                db.session.rollback()
+                job.failures += 1
+                job.last_error = f"lease: {e}"
+                return None
+
+            job.last_started_at = datetime.utcnow()
+            start = time.perf_counter()
+            if job.leader_only:
+                _running.lease = (lease_name, lease_ttl)
+            try:
+                job.last_result = job.func()
+                job.last_error = None
+                return job.last_result
+            except Exception as e:
+                db.session.rollback()
+                job.failures += 1
+                job.last_error = str(e)
+                app.logger.exception("Background job %s failed", job.name)
+                return None
+            finally:
+                _running.lease = None
+                job.runs += 1
+                job.last_duration = time.perf_counter() - start
+                job.total_duration += job.last_duration
+                if job.leader_only:
+                    # Keep it for most of an interval from the start, so the job
+                    # runs once per interval; whoever wakes first after that renews it
+                    try:
+                        renew_lease(lease_name, lease_ttl,
+                                    until=job.last_started_at + timedelta(seconds=job.interval * 0.9))
+                    except Exception:
+                        app.logger.exception("Could not release lease %s", lease_name)
+
+    def start(self, app, start_background_task, sleep, enabled_jobs=None):
+        """Start one loop per job via the async backend's ``start_background_task``/``sleep``."""
+        if self.started:
+            return
+        self.started = True
+
+        def loop(job):
+            # Random initial offset spreads workers started at the same time
+            sleep(random.uniform(0, job.interval * job.jitter) + 1)
+            while True:
+                self.run_job(app, job)
+                sleep(job.next_delay())
+
+        for job in self.jobs.values():
+            if enabled_jobs is None or job.name in enabled_jobs:
+                start_background_task(loop, job)
+
+    def stats(self):
+        return {"worker": WORKER_ID, "jobs": {name: job.stats() for name, job in self.jobs.items()}}
+
+
+scheduler = Scheduler()
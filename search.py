@@ -0,0 +1,171 @@
+# File: search.py
+
+"""Ranked prefix search over users and mechanics for the admin panel.
+
+SQLite keeps an FTS5 table, ``search_index``, with one row per user and one
+per mechanic. Database triggers maintain it on every INSERT, UPDATE and
+DELETE, including bulk Core inserts. The rowid encodes the entity: a user is
+``id * 2`` and a mechanic is ``id * 2 + 1``, so a trigger touches exactly one
+index row.
+
+PostgreSQL needs no side table. GIN expression indexes over weighted
+``to_tsvector('simple', ...)`` values on ``users`` and ``mechanics`` are
+maintained by the database itself. Its parser keeps emails, hosts and paths
+whole (``alice@example.com`` is one lexeme), so their punctuation is turned
+into spaces first; both backends then index the same words ``search_words``
+finds in a query.
+
+Both are installed when ``db.create_all()`` runs. Every query word is
+matched as a prefix, and all words must match.
+"""
+
+import re
+
+from sqlalchemy import event, text
+
+from models import db
+
+SEARCH_KINDS = ("user", "mechanic")
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Indexed text per kind, most important first
+_COLUMNS = {
+    "user": ("name", "email", "phone"),
+    "mechanic": ("name", "garage_name", "email", "phone", "garage_location"),
+}
+_TABLES = {"user": "users", "mechanic": "mechanics"}
+
+
+# ------------------------
+# SQLite: FTS5 table kept in step by triggers
+# ------------------------
+_FTS_COLUMNS = ("name", "garage_name", "email", "phone", "garage_location")
+# bm25() weights, in _FTS_COLUMNS order
+_FTS_WEIGHTS = "10.0, 8.0, 5.0, 5.0, 2.0"
+_ROWID = {"user": "{row}.id * 2", "mechanic": "{row}.id * 2 + 1"}
+
+
+def _fts_insert(kind, row):
+    columns = _COLUMNS[kind]
+    values = ", ".join(f"{row}.{column}" for column in columns)
+    rowid = _ROWID[kind].format(row=row)
+    return f"INSERT INTO search_index (rowid, {', '.join(columns)}) VALUES ({rowid}, {values});"
+
+
+def _install_sqlite(connection):
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    )).first()
+    if not exists:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE search_index USING fts5({', '.join(_FTS_COLUMNS)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+        for kind, table in _TABLES.items():
+            columns = ", ".join(_COLUMNS[kind])
+            rowid = _ROWID[kind].format(row=table)
+            connection.execute(text(
+                f"INSERT INTO search_index (rowid, {columns}) SELECT {rowid}, {columns} FROM {table}"
+            ))
+
+    for kind, table in _TABLES.items():
+        delete = f"DELETE FROM search_index WHERE rowid = {_ROWID[kind].format(row='old')};"
+        statements = {
+            "insert": f"AFTER INSERT ON {table} BEGIN {_fts_insert(kind, 'new')} END",
+            "update": (f"AFTER UPDATE OF {', '.join(_COLUMNS[kind])} ON {table} "
+                       f"BEGIN {delete} {_fts_insert(kind, 'new')} END"),
+            "delete": f"AFTER DELETE ON {table} BEGIN {delete} END",
+        }
+        for action, body in statements.items():
+            connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {table}_search_{action} {body}"))
+
+
+def _search_sqlite(words, kind, limit, offset):
+    match = " ".join(f'"{word}"*' for word in words)
+    kind_filter = ""
+    if kind:
+        kind_filter = f"AND rowid % 2 = {SEARCH_KINDS.index(kind)}"
+    rows = db.session.execute(text(
+        f"SELECT rowid, -bm25(search_index, {_FTS_WEIGHTS}) AS score FROM search_index "
+        f"WHERE search_index MATCH :match {kind_filter} "
+        "ORDER BY score DESC, rowid LIMIT :limit OFFSET :offset"
+    ), {"match": match, "limit": limit, "offset": offset})
+    return [(SEARCH_KINDS[rowid % 2], rowid // 2, score) for rowid, score in rows]
+
+
+# ------------------------
+# PostgreSQL: GIN expression indexes
+# ------------------------
+_WEIGHTS = "ABCDD"
+# Characters the default parser would glue words together with (emails, hosts,
+# paths, signed numbers), where SQLite and search_words split
+_SEPARATORS = "@./:+-_"
+
+
+def _tsvector(kind):
+    """The weighted tsvector expression; queries must repeat it exactly to use the index."""
+    spaces = " " * len(_SEPARATORS)
+    return " || ".join(
+        f"setweight(to_tsvector('simple', translate(coalesce({column}, ''), '{_SEPARATORS}', '{spaces}')), "
+        f"'{weight}')"
+        for column, weight in zip(_COLUMNS[kind], _WEIGHTS)
+    )
+
+
+def _install_postgresql(connection):
+    for kind, table in _TABLES.items():
+        # Superseded by the index over split words
+        connection.execute(text(f"DROP INDEX IF EXISTS ix_{table}_search"))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search_words ON {table} USING gin (({_tsvector(kind)}))"
+        ))
+
+
+def _search_postgresql(words, kind, limit, offset):
+    selects = [
+        f"SELECT '{k}' AS kind, id, ts_rank({_tsvector(k)}, query) AS score "
+        f"FROM {table}, to_tsquery('simple', :query) AS query WHERE {_tsvector(k)} @@ query"
+        for k, table in _TABLES.items() if kind in (None, k)
+    ]
+    rows = db.session.execute(text(
+        " UNION ALL ".join(selects) + " ORDER BY score DESC, kind, id LIMIT :limit OFFSET :offset"
+    ), {"query": " & ".join(f"{word}:*" for word in words), "limit": limit, "offset": offset})
+    return [tuple(row) for row in rows]
+
+
+_BACKENDS = {
+    "sqlite": (_install_sqlite, _search_sqlite),
+    "postgresql": (_install_postgresql, _search_postgresql),
+}
+
+
+@event.listens_for(db.metadata, "after_create")
+def _install_search(target, connection, **kw):
+    backend = _BACKENDS.get(connection.dialect.name)
+    if backend:
+        backend[0](connection)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def _drop_search(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+
+def search_words(query):
+    """The lower-cased words of ``query`` that take part in matching."""
+    return [word.lower() for word in _WORD.findall(query or "")]
+
+
+def search(query, kind=None, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Best matches first, as ``(kind, id, score)``; scores only compare within one database."""
+    words = search_words(query)
+    if not words:
+        return []
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name not in _BACKENDS:
+        raise NotImplementedError(f"Search is not supported on {dialect_name}")
+    return _BACKENDS[dialect_name][1](words, kind, limit, offset)
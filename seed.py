@@ -1,164 +1,136 @@
-from app import db, app
-from models import User, Mechanic, Service, Booking, MechanicAvailability
-from datetime import datetime
-import calendar
+# File: seed.py
+
+"""Seed the database with demo accounts and, optionally, a synthetic dataset.
+
+Existing data is kept: tables are created if missing, demo accounts are only
+added when their email is not taken, and generated rows are appended after
+the current max ids. Pass --reset to drop and recreate every table first.
+
+    python seed.py                                   # demo accounts only
+    python seed.py --users 200000 --mechanics 20000 --bookings 2000000 --workers 4
+    python seed.py --reset --bookings 100000 --users 20000 --mechanics 2000
+
+Everything goes through Core executemany inserts (no ORM objects), and the
+synthetic rows come from benchmarks/datagen.py, so the same --seed and sizes
+always produce the same data.
+"""
+
+import argparse
+import time
+
+from sqlalchemy import func, select
+
+from app import app, db
+from benchmarks import datagen
+from models import Booking, Mechanic, Service, User, mechanic_services
 
 # -----------------------
-# Seed Data
+# Demo fixture
 # -----------------------
 
-predefined_services = [
-    "Oil Change",
-    "Brake Repair",
-    "Tire Replacement",
-    "Engine Diagnostics",
-    "Battery Replacement",
-    "Transmission Repair",
-    "Suspension Repair",
-    "Air Conditioning",
-    "Electrical Systems",
-    "Car Wash & Detailing"
+DEMO_USERS = [
+    {"name": "Alice Johnson", "email": "alice@example.com", "phone": "+254700111222"},
+    {"name": "Bob Williams", "email": "bob@example.com", "phone": "+254700333444"},
 ]
 
-with app.app_context():
-    # Reset database
-    db.drop_all()
-    db.create_all()
-
-    # -----------------------
-    # Create services
-    # -----------------------
-    services = []
-    for name in predefined_services:
-        service = Service(name=name)
-        db.session.add(service)
-        services.append(service)
-    db.session.commit()
-
-    # -----------------------
-    # Create users
-    # -----------------------
-    user1 = User(
-        name="Alice Johnson",
-        email="alice@example.com",
-        phone="+254700111222",
-        password="password123"
-    )
-    user2 = User(
-        name="Bob Williams",
-        email="bob@example.com",
-        phone="+254700333444",
-        password="password123"
-    )
-    db.session.add_all([user1, user2])
-    db.session.commit()
-
-    # -----------------------
-    # Create mechanics
-    # -----------------------
-    mech1 = Mechanic(
-        name="Joe Garage",
-        email="joe@example.com",
-        phone="+254701234567",
-        password="password123",
-        garage_name="Joe's Garage",
-        garage_location="123 Main St, Nairobi",
-        latitude=-1.28333,
-        longitude=36.81667
-    )
-
-    mech2 = Mechanic(
-        name="QuickFix Auto",
-        email="quickfix@example.com",
-        phone="+254712345678",
-        password="password123",
-        garage_name="QuickFix Garage",
-        garage_location="456 Park Ave, Nairobi",
-        latitude=-1.2900,
-        longitude=36.8200
-    )
-
-    db.session.add_all([mech1, mech2])
-    db.session.commit()
-
-    # -----------------------
-    # Assign services to mechanics
-    # -----------------------
-    mech1.services.extend(services[:5])   # Joe Garage offers first 5 services
-    mech2.services.extend(services[5:])   # QuickFix Auto offers last 5 services
-    db.session.commit()
-    
-    # -----------------------
-    # Seed mechanic availability (necessary for new booking logic)
-    # -----------------------
-    print("\nSeeding default availability for all mechanics...")
-    # Get all days of the week
-    all_days = list(calendar.day_name)
-    
-    # Create a list to hold all new availability records
-    availability_records = []
-    
-    # Iterate through each mechanic and each day to create a record
-    for mechanic in Mechanic.query.all():
-        for day in all_days:
-            # By default, a mechanic is available every day
-            record = MechanicAvailability(
-                mechanic_id=mechanic.id,
-                day_of_week=day,
-                is_available=True
-            )
-            availability_records.append(record)
-            
-    db.session.add_all(availability_records)
-    db.session.commit()
-    print("✅ Availability seeded successfully.")
-
-    # -----------------------
-    # Create sample bookings
-    # -----------------------
-    booking1 = Booking(
-        type=services[0].name,
-        location="123 User St, Nairobi",
-        latitude=-1.2850,
-        longitude=36.8170,
-        status="Pending",
-        customer_id=user1.id,
-        mechanic_id=mech1.id,
-        service_id=services[0].id
-    )
-
-    booking2 = Booking(
-        type=services[6].name,
-        location="456 User Rd, Nairobi",
-        latitude=-1.2870,
-        longitude=36.8190,
-        status="Pending",
-        customer_id=user2.id,
-        mechanic_id=mech2.id,
-        service_id=services[6].id
-    )
-
-    db.session.add_all([booking1, booking2])
-    db.session.commit()
-
-    # -----------------------
-    # Print out mechanics and their services
-    # -----------------------
-    print("\n✅ Mechanics and their services:")
-    for mech in Mechanic.query.all():
-        service_names = [s.name for s in mech.services]
-        print(f"{mech.name} offers: {service_names}")
-
-    # -----------------------
-    # Print out bookings with mechanic and service info
-    # -----------------------
-    print("\n✅ Bookings with details:")
-    for b in Booking.query.all():
-        print({
-            "booking_id": b.id,
-            "customer": b.customer.name,
-            "mechanic": b.mechanic.name if b.mechanic else None,
-            "service": b.service.name if b.service else None,
-            "status": b.status,
-            "location": b.location
-        })
\ No newline at end of file
+# Joe Garage offers the first five services, QuickFix Auto the last five
+DEMO_MECHANICS = [
+    ({"name": "Joe Garage", "email": "joe@example.com", "phone": "+254701234567",
+      "garage_name": "Joe's Garage", "garage_location": "123 Main St, Nairobi",
+      "latitude": -1.28333, "longitude": 36.81667}, slice(0, 5)),
+    ({"name": "QuickFix Auto", "email": "quickfix@example.com", "phone": "+254712345678",
+      "garage_name": "QuickFix Garage", "garage_location": "456 Park Ave, Nairobi",
+      "latitude": -1.2900, "longitude": 36.8200}, slice(5, 10)),
+]
+
+# customer email, mechanic email, service index, location, latitude, longitude
+DEMO_BOOKINGS = [
+    ("alice@example.com", "joe@example.com", 0, "123 User St, Nairobi", -1.2850, 36.8170),
+    ("bob@example.com", "quickfix@example.com", 6, "456 User Rd, Nairobi", -1.2870, 36.8190),
+]
+
+
+def _ids_by_email(conn, table, emails):
+    return dict(conn.execute(select(table.c.email, table.c.id).where(table.c.email.in_(emails))).all())
+
+
+def seed_demo(conn, service_ids):
+    """Insert the demo accounts that do not exist yet; returns how many rows were added."""
+    users, mechanics = User.__table__, Mechanic.__table__
+    added = 0
+
+    existing = _ids_by_email(conn, users, [u["email"] for u in DEMO_USERS])
+    new_users = [dict(u, password=datagen.PASSWORD) for u in DEMO_USERS if u["email"] not in existing]
+    if new_users:
+        conn.execute(users.insert(), new_users)
+        added += len(new_users)
+
+    existing = _ids_by_email(conn, mechanics, [m["email"] for m, _ in DEMO_MECHANICS])
+    new_mechanics = [(m, picks) for m, picks in DEMO_MECHANICS if m["email"] not in existing]
+    if new_mechanics:
+        conn.execute(mechanics.insert(), [dict(m, password=datagen.PASSWORD) for m, _ in new_mechanics])
+        mechanic_ids = _ids_by_email(conn, mechanics, [m["email"] for m, _ in new_mechanics])
+        conn.execute(mechanic_services.insert(), [
+            {"mechanic_id": mechanic_ids[m["email"]], "service_id": service_id}
+            for m, picks in new_mechanics for service_id in service_ids[picks]
+        ])
+        added += len(new_mechanics)
+
+    # Demo bookings belong to freshly created demo accounts only, so re-running never duplicates them
+    created = {u["email"] for u in new_users} | {m["email"] for m, _ in new_mechanics}
+    bookings = [b for b in DEMO_BOOKINGS if b[0] in created and b[1] in created]
+    if bookings:
+        user_ids = _ids_by_email(conn, users, [b[0] for b in bookings])
+        mechanic_ids = _ids_by_email(conn, mechanics, [b[1] for b in bookings])
+        conn.execute(Booking.__table__.insert(), [
+            {"type": datagen.SERVICE_NAMES[index], "location": location,
+             "latitude": lat, "longitude": lng, "status": "Pending",
+             "customer_id": user_ids[customer], "mechanic_id": mechanic_ids[mechanic],
+             "service_id": service_ids[index]}
+            for customer, mechanic, index, location, lat, lng in bookings
+        ])
+        added += len(bookings)
+    return added
+
+
+def table_counts(conn):
+    return {
+        model.__tablename__: conn.execute(select(func.count()).select_from(model)).scalar()
+        for model in (Service, User, Mechanic, Booking)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--no-demo", action="store_true", help="skip the demo accounts")
+    parser.add_argument("--users", type=int, default=0)
+    parser.add_argument("--mechanics", type=int, default=0)
+    parser.add_argument("--bookings", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=datagen.DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="processes generating rows")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+
+        start = time.perf_counter()
+        with db.engine.begin() as conn:
+            service_ids = datagen.ensure_services(conn)
+            if not args.no_demo:
+                print(f"Demo rows added: {seed_demo(conn, service_ids)}")
+
+        if args.users or args.mechanics or args.bookings:
+            counts = datagen.load(db.engine, args.users, args.mechanics, args.bookings,
+                                  seed=args.seed, chunk_size=args.chunk_size, workers=args.workers)
+            print(f"Generated: {counts}")
+
+        with db.engine.connect() as conn:
+            print(f"Totals: {table_counts(conn)} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# File: serializers.py
+
+"""Response serialization: compiled per-model field projections and a fast JSON encoder.
+
+Schemas are built once at import time and turn an ORM entity (or any row with
+attribute access) into a plain dict. Datetimes are left as-is and encoded by
+the JSON layer, which uses orjson when it is installed.
+"""
+
+import csv
+import io
+import json
+import logging
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, islice
+from operator import attrgetter
+
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------
+# JSON encoding
+# ------------------------
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+
+    def loads(s):
+        return orjson.loads(s)
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def loads(s):
+        return json.loads(s)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (or compact stdlib json)."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+
+class socketio_json:
+    """json module replacement for python-socketio packet encoding."""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return dumps(obj)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return loads(s)
+
+
+# ------------------------
+# Schemas
+# ------------------------
+class Nested:
+    """A nested field: ``attr`` is read from the parent and dumped with ``schema``."""
+
+    def __init__(self, schema, attr=None, many=False):
+        self.schema = schema
+        self.attr = attr
+        self.many = many
+
+
+class Schema:
+    """A compiled field projection.
+
+    ``Schema("id", "name", service=SERVICE_REF)`` dumps ``obj.id`` and
+    ``obj.name`` plus ``obj.service`` through ``SERVICE_REF`` (``None`` stays
+    ``None``).
+    """
+
+    def __init__(self, *fields, **nested):
+        self.fields = fields
+        self.nested = {
+            key: value if isinstance(value, Nested) else Nested(value)
+            for key, value in nested.items()
+        }
+
+        if len(fields) == 1:
+            single = attrgetter(fields[0])
+            self._get_fields = lambda obj: (single(obj),)
+        elif fields:
+            self._get_fields = attrgetter(*fields)
+        else:
+            self._get_fields = lambda obj: ()
+
+        self._nested = tuple(
+            (key, attrgetter(spec.attr or key), spec.schema, spec.many)
+            for key, spec in self.nested.items()
+        )
+
+    def extend(self, *fields, **nested):
+        """Return a new schema with extra fields appended."""
+        merged = dict(self.nested)
+        merged.update(nested)
+        return Schema(*(self.fields + fields), **merged)
+
+    def dump(self, obj):
+        if obj is None:
+            return None
+        data = dict(zip(self.fields, self._get_fields(obj)))
+        for key, getter, schema, many in self._nested:
+            value = getter(obj)
+            data[key] = schema.dump_many(value) if many else schema.dump(value)
+        return data
+
+    def dump_many(self, objs):
+        dump = self.dump
+        return [dump(obj) for obj in objs]
+
+
+SERVICE_REF = Schema("id", "name")
+USER_REF = Schema("id", "name", "phone")
+MECHANIC_REF = Schema("id", "name", "phone")
+MECHANIC_GARAGE_REF = MECHANIC_REF.extend("garage_name")
+MECHANIC_LOCATION_REF = MECHANIC_GARAGE_REF.extend("latitude", "longitude")
+
+_BOOKING_BASE = Schema("id", "type", "location", "latitude", "longitude", "status")
+
+# Socket.IO payloads
+NEW_BOOKING_EVENT = _BOOKING_BASE.extend("created_at", customer=USER_REF, service=SERVICE_REF)
+BOOKING_UPDATED_EVENT = _BOOKING_BASE.extend(
+    "updated_at", customer=USER_REF, service=SERVICE_REF, mechanic=MECHANIC_REF
+)
+
+# HTTP payloads
+BOOKING = _BOOKING_BASE.extend(
+    "created_at", "updated_at", customer=USER_REF, mechanic=MECHANIC_REF, service=SERVICE_REF
+)
+BOOKING_DETAIL = _BOOKING_BASE.extend(
+    customer=USER_REF, mechanic=MECHANIC_LOCATION_REF, service=SERVICE_REF
+)
+ADMIN_BOOKING = Schema(
+    "id", "type", "location", "status", "created_at", "updated_at",
+    customer=USER_REF, mechanic=MECHANIC_REF, service=SERVICE_REF
+)
+MECHANIC_BOOKING = _BOOKING_BASE.extend(
+    "created_at", "updated_at", customer=USER_REF, service=SERVICE_REF
+)
+USER_BOOKING = _BOOKING_BASE.extend(
+    "created_at", "updated_at", mechanic=MECHANIC_GARAGE_REF, service=SERVICE_REF
+)
+NOTIFICATION = Schema(
+    "id", "title", "message", "type", "is_read", "related_entity", "related_entity_id", "created_at"
+)
+
+# Column-projected list rows (see get_all_users / get_mechanics)
+USER_LIST_ITEM = Schema("id", "name", "email", "phone", "status", "created_at", "bookings_count")
+MECHANIC_LIST_ITEM = Schema(
+    "id", "name", "email", "phone", "profile_picture", "garage_name", "garage_location",
+    "latitude", "longitude", "status"
+)
+ADMIN_MECHANIC_LIST_ITEM = Schema(
+    "id", "name", "email", "phone", "garage_name", "garage_location", "status", "created_at",
+    "total_bookings", "completed_bookings"
+)
+USER_SEARCH_RESULT = Schema("id", "name", "email", "phone", "status")
+MECHANIC_SEARCH_RESULT = Schema(
+    "id", "name", "email", "phone", "garage_name", "garage_location", "status"
+)
+
+# Flat export rows (see /admin/export/*); no nested fields so they map onto CSV columns
+BOOKING_EXPORT = Schema(
+    "id", "type", "status", "location", "latitude", "longitude", "created_at", "updated_at",
+    "customer_id", "customer_name", "mechanic_id", "mechanic_name", "service_id", "service_name"
+)
+USER_EXPORT = Schema("id", "name", "email", "phone", "status", "created_at")
+MECHANIC_EXPORT = Schema(
+    "id", "name", "email", "phone", "garage_name", "garage_location", "latitude", "longitude",
+    "status", "created_at"
+)
+
+
+# ------------------------
+# Streaming responses
+# ------------------------
+STREAM_CHUNK_SIZE = 500
+# Leading characters that make spreadsheets read a CSV cell as a formula
+_CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Phone numbers and signed numbers start with one too, but cannot call anything
+_CSV_PLAIN_NUMBER = re.compile(r"[+-]?[\d ().-]+")
+
+
+def _streaming_response(generate, items, mimetype):
+    """A Response streaming ``generate(rows)``, with the first row of ``items`` already fetched.
+
+    The first fetch runs the query while the view is still executing, so a
+    failing query raises into the view's own error handling before anything
+    is sent. A failure after that is logged here and aborts the transfer, so
+    the client sees a broken response instead of a short, well-formed one.
+    """
+    rows = iter(items)
+    head = list(islice(rows, 1))
+
+    def guarded():
+        try:
+            yield from generate(chain(head, rows))
+        except Exception:
+            logger.exception("Error while streaming %s response", mimetype)
+            raise
+
+    return Response(stream_with_context(guarded()), mimetype=mimetype)
+
+
+def stream_json_list(items, schema, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream ``items`` as a JSON array, encoding ``chunk_size`` rows at a time.
+
+    ``items`` may be a query using ``yield_per`` so rows are never all held in
+    memory at once.
+    """
+    def generate(items):
+        yield "["
+        first = True
+        chunk = []
+        for item in items:
+            chunk.append(schema.dump(item))
+            if len(chunk) >= chunk_size:
+                yield ("" if first else ",") + dumps(chunk)[1:-1]
+                first = False
+                chunk = []
+        if chunk:
+            yield ("" if first else ",") + dumps(chunk)[1:-1]
+        yield "]"
+
+    return _streaming_response(generate, items, "application/json")
+
+
+def stream_ndjson(items, schema, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream ``items`` as newline-delimited JSON, one object per line."""
+    def generate(items):
+        chunk = []
+        for item in items:
+            chunk.append(dumps(schema.dump(item)))
+            if len(chunk) >= chunk_size:
+                yield "\n".join(chunk) + "\n"
+                chunk = []
+        if chunk:
+            yield "\n".join(chunk) + "\n"
+
+    return _streaming_response(generate, items, "application/x-ndjson")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if (isinstance(value, str) and value.startswith(_CSV_FORMULA_PREFIXES)
+            and not _CSV_PLAIN_NUMBER.fullmatch(value)):
+        return "'" + value
+    return value
+
+
+def stream_csv(items, schema, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream ``items`` as CSV with a header row; ``schema`` must have no nested fields."""
+    def generate(items):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(schema.fields)
+        rows = 0
+        for item in items:
+            writer.writerow([_csv_value(value) for value in schema._get_fields(item)])
+            rows += 1
+            if rows % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return _streaming_response(generate, items, "text/csv")
@@ -0,0 +1,50 @@
+# File: serve.py
+
+"""Production entry point for the HTTP API and the Socket.IO server.
+
+The Flask dev server (``python app.py``) gives every websocket its own OS
+thread. Here the server runs on an async worker instead, where each
+connection is a green thread:
+
+    APP_ENV=production SOCKETIO_ASYNC_MODE=eventlet python serve.py
+    APP_ENV=production gunicorn -k eventlet -w 1 serve:app
+
+Run one worker per process. To scale out, start several processes behind a
+sticky-session load balancer and set SOCKETIO_MESSAGE_QUEUE to a Redis URL so
+emits reach clients connected to any process.
+
+Database drivers must cooperate with the event loop. Use
+``postgresql+psycopg2://`` with psycogreen installed (patched below). SQLite
+calls block the loop while they run, so SQLite deployments should keep the
+WAL profile from sqlite_tuning.py or use SOCKETIO_ASYNC_MODE=threading.
+"""
+
+import os
+
+ASYNC_MODE = os.environ.setdefault("SOCKETIO_ASYNC_MODE", "eventlet")
+
+# Monkey patching must happen before anything imports socket/threading
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+    try:
+        from psycogreen.eventlet import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+elif ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+from app import app, socketio, init_database, start_background_tasks  # noqa: E402
+
+init_database()
+start_background_tasks()
+
+if __name__ == "__main__":
+    socketio.run(app, host=app.config["HOST"], port=app.config["PORT"], debug=False)
@@ -0,0 +1,54 @@
+# File: sqlite_tuning.py
+
+"""Pragma profile for single-node SQLite deployments.
+
+Every new DBAPI connection is switched to WAL journaling (readers no longer
+block the writer), synchronous=NORMAL (safe under WAL, one fsync per
+checkpoint instead of per commit), a memory-mapped read path, a larger page
+cache and a busy timeout so concurrent writers queue instead of failing with
+"database is locked".
+"""
+
+from sqlalchemy import event, text
+
+
+def is_file_sqlite(engine):
+    return engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:")
+
+
+def install_sqlite_tuning(engine, config):
+    """Apply the pragma profile to every connection ``engine`` opens."""
+    if not config.get("SQLITE_TUNING") or not is_file_sqlite(engine):
+        return False
+
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT']) * 1000}",
+        "PRAGMA temp_store=MEMORY",
+    )
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return True
+
+
+def wal_checkpoint(engine, mode="PASSIVE"):
+    """Fold the WAL back into the main database file without blocking writers.
+
+    Returns (busy, wal_pages, checkpointed_pages) as reported by SQLite.
+    """
+    if not is_file_sqlite(engine):
+        return None
+    with engine.connect() as conn:
+        return tuple(conn.execute(text(f"PRAGMA wal_checkpoint({mode})")).one())
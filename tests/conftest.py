@@ -0,0 +1,58 @@
+"""Shared fixtures. The suite runs on in-memory SQLite by default; set
+TEST_DATABASE_URL (e.g. postgresql://mechapp@localhost/mechapp_test) to run
+it against PostgreSQL instead. Every test gets freshly created tables.
+"""
+
+import os
+
+# The app reads its configuration at import time
+os.environ["APP_ENV"] = "testing"
+
+import pytest
+
+from app import app as flask_app, create_default_admin
+from audit import audit_log
+from cache import caches
+from models import db
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.create_all()
+    create_default_admin()
+    yield flask_app
+    with flask_app.app_context():
+        audit_log.flush()
+        db.session.remove()
+        db.drop_all()
+    # Ids restart with the next test's tables, so cached entries would go stale
+    for cache in caches.values():
+        cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def service_id(client):
+    return client.post("/services", json={"name": "Oil Change"}).json["service"]["id"]
+
+
+@pytest.fixture
+def user_id(client):
+    response = client.post("/register", json={
+        "name": "Alice", "email": "alice@example.com", "password": "secret", "phone": "+254700000001"
+    })
+    return response.json["user"]["id"]
+
+
+@pytest.fixture
+def mechanic_id(client, service_id):
+    response = client.post("/mechanics", json={
+        "name": "Joe", "email": "joe@example.com", "password": "secret", "phone": "+254700000002",
+        "latitude": -1.2833, "longitude": 36.8167, "service_ids": [service_id]
+    })
+    return response.json["mechanic"]["id"]
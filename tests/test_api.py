@@ -0,0 +1,300 @@
+import csv
+import io
+import time
+from datetime import datetime, timedelta
+
+import app as app_module
+from analytics import refresh_rollups
+from archive import archive_bookings
+from app import stale_bookings_job, temp_upload_referenced
+from models import db, Booking, IdempotencyKey, MechanicRiskProfile, User
+
+
+def book(client, user_id, service_id):
+    response = client.post("/bookings", json={
+        "customer_id": user_id, "service_id": service_id,
+        "latitude": -1.2840, "longitude": 36.8170, "location": "Kenyatta Ave"
+    })
+    assert response.status_code == 201
+    return response.json["booking"]
+
+
+def test_booking_is_dispatched_to_the_nearest_mechanic(client, user_id, service_id, mechanic_id):
+    booking = book(client, user_id, service_id)
+
+    assert booking["mechanic"]["id"] == mechanic_id
+    listed = client.get(f"/mechanics/{mechanic_id}/bookings").json
+    assert [b["id"] for b in listed] == [booking["id"]]
+
+
+def test_completed_booking_can_be_rated(client, user_id, service_id, mechanic_id):
+    booking = book(client, user_id, service_id)
+    for action in ("Accepted", "Completed"):
+        assert client.post(f"/bookings/{booking['id']}/action", json={"action": action, "mechanic_id": mechanic_id}).status_code == 200
+
+    response = client.post("/ratings", json={"booking_id": booking["id"], "user_id": user_id, "rating": 4})
+    assert response.status_code == 201
+    summary = client.get(f"/mechanics/{mechanic_id}/average-rating").json
+    assert summary["average_rating"] == 4
+    assert summary["total_ratings"] == 1
+
+
+def test_invalid_booking_action_is_rejected(client, user_id, service_id, mechanic_id):
+    booking = book(client, user_id, service_id)
+
+    response = client.post(f"/bookings/{booking['id']}/action", json={"action": "Cancelled"})
+    assert response.status_code == 400
+
+
+def test_archived_booking_cannot_be_rated_or_reported(app, client, user_id, service_id, mechanic_id):
+    booking = book(client, user_id, service_id)
+    for action in ("Accepted", "Completed"):
+        client.post(f"/bookings/{booking['id']}/action", json={"action": action, "mechanic_id": mechanic_id})
+    # The newest booking always stays in the hot table
+    book(client, user_id, service_id)
+    with app.app_context():
+        assert archive_bookings(timedelta(0))["bookings"] == 1
+
+    rating = client.post("/ratings", json={"booking_id": booking["id"], "user_id": user_id, "rating": 4})
+    report = {"user_id": user_id, "mechanic_id": mechanic_id, "booking_id": booking["id"]}
+    complaint = client.post("/complaints/fraud", json=dict(report, complaint_type="Overcharged", description="Twice"))
+    fraud_report = client.post("/reports/fraud", json=dict(report, reason="Overcharged"))
+    missing = client.post("/reports/fraud", json=dict(report, booking_id=booking["id"] + 100, reason="Overcharged"))
+
+    assert [r.status_code for r in (rating, complaint, fraud_report, missing)] == [409, 409, 409, 404]
+    assert "archived" in complaint.json["error"]
+
+
+def test_repeated_fraud_report_is_collapsed(client, user_id, mechanic_id):
+    report = {"user_id": user_id, "mechanic_id": mechanic_id, "reason": "Overcharged"}
+    first = client.post("/reports/fraud", json=report)
+    repeat = client.post("/reports/fraud", json=dict(report, reason="  overcharged "))
+
+    assert first.status_code == 201
+    assert repeat.status_code == 200
+    assert repeat.json["duplicate"] is True
+    assert repeat.json["report_id"] == first.json["report_id"]
+    reports = client.get("/admin/reports/fraud-reports").json
+    assert [(r["id"], r["repeat_count"]) for r in reports] == [(first.json["report_id"], 1)]
+
+
+def test_report_stats_come_from_the_rollups_once_they_have_run(app, client, user_id, service_id, mechanic_id):
+    done, _ = book(client, user_id, service_id), book(client, user_id, service_id)
+    for action in ("Accepted", "Completed"):
+        client.post(f"/bookings/{done['id']}/action", json={"action": action, "mechanic_id": mechanic_id})
+    expected = {"total_bookings": 2, "completed_bookings": 1, "pending_bookings": 1, "active_bookings": 1,
+                "recent_bookings": 2}
+
+    raw = client.get("/admin/reports/stats").json
+    with app.app_context():
+        refresh_rollups(settle=0)
+    rolled_up = client.get("/admin/reports/stats").json
+    # Bookings made after the rollup run show up in none of the figures yet
+    book(client, user_id, service_id)
+    lagging = client.get("/admin/reports/stats").json
+
+    assert raw["bookings_as_of"] is None
+    assert rolled_up["bookings_as_of"] is not None
+    for response in (raw, rolled_up, lagging):
+        assert {name: response["stats"][name] for name in expected} == expected
+
+
+def test_booking_export_streams_csv(client, user_id, service_id, mechanic_id):
+    booking = book(client, user_id, service_id)
+
+    response = client.get("/admin/export/bookings?format=csv")
+    lines = response.get_data(as_text=True).splitlines()
+    assert response.status_code == 200
+    assert lines[0].startswith("id,type,status")
+    assert lines[1].startswith(f"{booking['id']},")
+
+
+def test_booking_export_defuses_spreadsheet_formulas(client, user_id, service_id, mechanic_id):
+    client.post("/bookings", json={
+        "customer_id": user_id, "service_id": service_id,
+        "latitude": -1.2840, "longitude": 36.8170, "location": "=HYPERLINK(\"http://evil\")"
+    })
+
+    rows = list(csv.reader(io.StringIO(client.get("/admin/export/bookings?format=csv").get_data(as_text=True))))
+    assert rows[1][rows[0].index("location")] == "'=HYPERLINK(\"http://evil\")"
+    assert rows[1][rows[0].index("latitude")] == "-1.284"
+
+
+def test_user_export_keeps_phone_numbers_as_they_are(client, user_id):
+    rows = list(csv.reader(io.StringIO(client.get("/admin/export/users?format=csv").get_data(as_text=True))))
+
+    assert rows[1][rows[0].index("phone")] == "+254700000001"
+
+
+def test_idempotency_keys_are_scoped_per_caller(client, user_id, service_id, mechanic_id):
+    other = client.post("/register", json={
+        "name": "Bob", "email": "bob@example.com", "password": "secret", "phone": "+254700000003"
+    }).json["user"]["id"]
+    headers = {"Idempotency-Key": "same-key"}
+    body = {"service_id": service_id, "latitude": -1.2840, "longitude": 36.8170, "location": "Kenyatta Ave"}
+
+    first = client.post("/bookings", json=dict(body, customer_id=user_id), headers=headers)
+    replay = client.post("/bookings", json=dict(body, customer_id=user_id), headers=headers)
+    second = client.post("/bookings", json=dict(body, customer_id=other), headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json["booking"]["id"] == first.json["booking"]["id"]
+    assert second.json["booking"]["id"] != first.json["booking"]["id"]
+
+
+def test_rate_limited_response_releases_the_idempotency_key(app, client, user_id, service_id, mechanic_id, monkeypatch):
+    booking = book(client, user_id, service_id)
+    headers = {"Idempotency-Key": "complaint-1"}
+    body = {"user_id": user_id, "mechanic_id": mechanic_id, "booking_id": booking["id"],
+            "complaint_type": "Overcharged", "description": "Charged twice"}
+
+    monkeypatch.setitem(app.config, "FRAUD_REPORTS_PER_HOUR", 0)
+    limited = client.post("/complaints/fraud", json=body, headers=headers)
+    monkeypatch.setitem(app.config, "FRAUD_REPORTS_PER_HOUR", 5)
+    retried = client.post("/complaints/fraud", json=body, headers=headers)
+
+    assert limited.status_code == 429
+    assert retried.status_code == 201
+    assert "Idempotent-Replayed" not in retried.headers
+
+
+def test_abandoned_idempotency_key_is_reclaimed(app, client, user_id, service_id, mechanic_id):
+    body = {"customer_id": user_id, "service_id": service_id,
+            "latitude": -1.2840, "longitude": 36.8170, "location": "Kenyatta Ave"}
+    with app.app_context():
+        # A worker died after claiming the key, so nothing renewed its lease
+        started = datetime.utcnow() - timedelta(minutes=5)
+        db.session.add(IdempotencyKey(scope=f"create_booking:{user_id}", key="k", request_hash="0" * 64,
+                                      created_at=started, expires_at=started + timedelta(seconds=30)))
+        db.session.commit()
+
+    response = client.post("/bookings", json=body, headers={"Idempotency-Key": "k"})
+    assert response.status_code == 201
+
+
+def test_slow_request_keeps_its_idempotency_key(app, client, user_id, service_id, mechanic_id, monkeypatch):
+    body = {"customer_id": user_id, "service_id": service_id,
+            "latitude": -1.2840, "longitude": 36.8170, "location": "Kenyatta Ave"}
+    monkeypatch.setitem(app.config, "IDEMPOTENCY_IN_FLIGHT_LEASE", 0.3)
+    dispatch = app_module.find_nearest_available_mechanic
+    retries = []
+
+    def slow_dispatch(*args, **kwargs):
+        # Outlive the lease several times over; a retry meanwhile must not run again
+        time.sleep(1)
+        retries.append(app.test_client().post("/bookings", json=body, headers={"Idempotency-Key": "slow"}))
+        return dispatch(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "find_nearest_available_mechanic", slow_dispatch)
+    first = client.post("/bookings", json=body, headers={"Idempotency-Key": "slow"})
+    monkeypatch.setattr(app_module, "find_nearest_available_mechanic", dispatch)
+    replay = client.post("/bookings", json=body, headers={"Idempotency-Key": "slow"})
+
+    assert first.status_code == 201
+    assert [retry.status_code for retry in retries] == [409]
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+def make_stale(app, booking_id):
+    with app.app_context():
+        Booking.query.filter_by(id=booking_id).update({"updated_at": datetime.utcnow() - timedelta(hours=1)})
+        db.session.commit()
+
+
+def add_mechanic(client, service_id, n):
+    return client.post("/mechanics", json={
+        "name": f"Mechanic {n}", "email": f"m{n}@example.com", "password": "secret",
+        "phone": f"+25471000000{n}", "latitude": -1.2833, "longitude": 36.8167, "service_ids": [service_id]
+    }).json["mechanic"]["id"]
+
+
+def test_stale_booking_is_not_offered_back_to_a_mechanic_who_ignored_it(app, client, user_id, service_id, mechanic_id):
+    other = add_mechanic(client, service_id, 2)
+    booking = book(client, user_id, service_id)
+    first = booking["mechanic"]["id"]
+
+    make_stale(app, booking["id"])
+    with app.app_context():
+        assert stale_bookings_job() == {"reassigned": 1, "expired": 0}
+    second = client.get(f"/bookings/{booking['id']}").json["mechanic"]["id"]
+    assert {first, second} == {mechanic_id, other}
+
+    # Both mechanics have now ignored it, so it expires instead of bouncing back
+    make_stale(app, booking["id"])
+    with app.app_context():
+        assert stale_bookings_job() == {"reassigned": 0, "expired": 1}
+    assert client.get(f"/bookings/{booking['id']}").json["status"] == "Expired"
+
+
+def test_booking_actions_only_follow_allowed_transitions(app, client, user_id, service_id, mechanic_id, monkeypatch):
+    other = add_mechanic(client, service_id, 2)
+    booking = book(client, user_id, service_id)
+    first = booking["mechanic"]["id"]
+    rooms = []
+    monkeypatch.setattr(app_module.socketio, "emit", lambda event, data, room, namespace: rooms.append((event, room)))
+
+    def act(action, mechanic):
+        return client.post(f"/bookings/{booking['id']}/action", json={"action": action, "mechanic_id": mechanic})
+
+    assert act("Completed", first).status_code == 409
+    make_stale(app, booking["id"])
+    with app.app_context():
+        stale_bookings_job()
+    second = ({mechanic_id, other} - {first}).pop()
+    # The mechanic it was taken from hears about it, and can no longer accept it
+    assert ("BOOKING_UPDATED", f"mechanic_{first}") in rooms
+    assert act("Accepted", first).status_code == 409
+    assert client.get(f"/bookings/{booking['id']}").json["mechanic"]["id"] == second
+
+    make_stale(app, booking["id"])
+    with app.app_context():
+        stale_bookings_job()
+    assert act("Accepted", second).status_code == 409
+    assert client.get(f"/bookings/{booking['id']}").json["status"] == "Expired"
+
+
+def test_completion_is_counted_once_per_booking(app, client, user_id, service_id, mechanic_id):
+    booking = book(client, user_id, service_id)
+
+    def act(action):
+        return client.post(f"/bookings/{booking['id']}/action", json={"action": action, "mechanic_id": mechanic_id})
+
+    actions = ("Completed", "Accepted", "Completed", "Rejected", "Completed")
+    assert [act(action).status_code for action in actions] == [409, 200, 200, 409, 409]
+    with app.app_context():
+        assert db.session.get(MechanicRiskProfile, mechanic_id).completed_bookings == 1
+
+
+def test_stale_booking_job_keeps_a_booking_accepted_meanwhile(app, client, user_id, service_id, mechanic_id, monkeypatch):
+    booking = book(client, user_id, service_id)
+    make_stale(app, booking["id"])
+
+    real_find = app_module.find_nearest_available_mechanic
+
+    def accept_then_find(*args, **kwargs):
+        # The mechanic accepts while the job is looking for a replacement
+        Booking.query.filter_by(id=booking["id"]).update({"status": "Accepted", "updated_at": datetime.utcnow()})
+        return real_find(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "find_nearest_available_mechanic", accept_then_find)
+    with app.app_context():
+        assert stale_bookings_job() == {"reassigned": 0, "expired": 0}
+    assert client.get(f"/bookings/{booking['id']}").json["status"] == "Accepted"
+
+
+def test_temp_uploads_are_matched_against_their_quoted_public_urls(app, user_id):
+    upload = "temp_uploads/0f8e2a3c-1b2d-4c5e-8f9a-0b1c2d3e4f5a_my photo.jpg"
+    legacy = "temp_uploads/old_scan 1.png"
+    with app.app_context():
+        User.query.filter_by(id=user_id).update({"profile_picture": (
+            "https://storage.googleapis.com/mechapp/temp_uploads/0f8e2a3c-1b2d-4c5e-8f9a-0b1c2d3e4f5a_my%20photo.jpg"
+            " https://storage.googleapis.com/mechapp/temp_uploads/old_scan%201.png"
+        )})
+        db.session.commit()
+
+        assert temp_upload_referenced(upload)
+        assert temp_upload_referenced(legacy)
+        assert not temp_upload_referenced(upload.replace("0f8e2a3c", "11111111"))
+        # _ is a literal underscore, not a LIKE wildcard
+        assert not temp_upload_referenced("temp_uploads/oldXscan 1.png")
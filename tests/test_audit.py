@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from audit import audit_log, partition_name, partition_table
+from models import db, SystemAudit
+
+MOMENT = datetime(2020, 1, 15, 12, 0)
+
+
+def entry(description):
+    return {
+        "admin_id": None, "action": "test_entry", "target_type": None, "target_id": None,
+        "description": description, "ip_address": None, "user_agent": None, "created_at": MOMENT
+    }
+
+
+def test_audit_pages_walk_every_table_once_when_ids_collide(app, client):
+    with app.app_context():
+        audit_log.partitions()
+        # Legacy rows and a new partition both start their ids at 1
+        db.session.add_all([SystemAudit(action="test_entry", description=f"legacy {n}", created_at=MOMENT)
+                            for n in (1, 2)])
+        db.session.commit()
+        audit_log.buffer.extend(entry(f"partition {n}") for n in (1, 2))
+        audit_log.flush()
+        # The flush created a partition, so the cached list was dropped
+        assert partition_name(MOMENT) in audit_log.partitions()
+
+    try:
+        seen, cursor = [], None
+        while True:
+            params = {"action": "test_entry", "per_page": 1}
+            if cursor:
+                params["cursor"] = cursor
+            page = client.get("/admin/audit-logs", query_string=params).json
+            seen.extend(log["description"] for log in page["logs"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert sorted(seen) == ["legacy 1", "legacy 2", "partition 1", "partition 2"]
+    finally:
+        with app.app_context():
+            partition_table(partition_name(MOMENT)).drop(db.engine)
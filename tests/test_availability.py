@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from availability import (
+    FULL_DAY, FULL_WEEK, SLOTS_PER_DAY, available_at, backfill_schedules_from_legacy, day_mask,
+    day_mask_to_intervals, intervals_to_day_mask, load_schedules
+)
+from models import db, MechanicAvailability, MechanicSchedule
+
+MONDAY = date(2026, 3, 2)
+
+
+def test_interval_masks_cover_the_whole_day_at_the_edges():
+    assert intervals_to_day_mask([{"start": "00:00", "end": "24:00"}]) == FULL_DAY
+    assert intervals_to_day_mask([{"start": "00:00", "end": "00:15"}]) == 1
+    assert intervals_to_day_mask([{"start": "23:45", "end": "24:00"}]) == 1 << (SLOTS_PER_DAY - 1)
+    assert day_mask_to_intervals(FULL_DAY) == [{"start": "00:00", "end": "24:00"}]
+
+
+def test_misaligned_minutes_fall_into_the_slot_containing_them():
+    mask = intervals_to_day_mask([{"start": "08:10", "end": "09:05"}])
+
+    assert day_mask_to_intervals(mask) == [{"start": "08:00", "end": "09:00"}]
+    with pytest.raises(ValueError):
+        # Both ends fall into the same slot
+        intervals_to_day_mask([{"start": "08:01", "end": "08:14"}])
+
+
+@pytest.mark.parametrize("interval", [
+    {"start": "24:15", "end": "24:30"}, {"start": "09:00", "end": "08:00"}, {"start": "08:60", "end": "09:00"}
+])
+def test_invalid_intervals_are_rejected(interval):
+    with pytest.raises(ValueError):
+        intervals_to_day_mask([interval])
+
+
+def test_override_replaces_one_day_of_the_weekly_schedule(app, client, mechanic_id):
+    schedule = {"timezone": "UTC", "Monday": [{"start": "08:00", "end": "17:00"}]}
+    assert client.put(f"/mechanics/{mechanic_id}/schedule", json=schedule).status_code == 200
+    override = {"date": MONDAY.isoformat(), "slots": [{"start": "14:00", "end": "16:00"}]}
+    assert client.post(f"/mechanics/{mechanic_id}/availability/overrides", json=override).status_code == 200
+
+    def available(day, hour):
+        with app.app_context():
+            return mechanic_id in available_at([mechanic_id], datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+
+    next_monday = MONDAY + timedelta(days=7)
+    assert [available(MONDAY, hour) for hour in (10, 15)] == [False, True]
+    assert [available(next_monday, hour) for hour in (10, 18)] == [True, False]
+
+
+def test_schedule_rejects_unknown_days(client, mechanic_id):
+    response = client.put(f"/mechanics/{mechanic_id}/schedule", json={"Mondy": []})
+
+    assert response.status_code == 400
+    assert "Mondy" in response.json["error"]
+
+
+def test_legacy_days_are_backfilled_into_schedules(app, mechanic_id):
+    with app.app_context():
+        # A mechanic from before slot schedules: legacy day rows only
+        MechanicSchedule.query.filter_by(mechanic_id=mechanic_id).delete()
+        db.session.add_all([
+            MechanicAvailability(mechanic_id=mechanic_id, day_of_week="Sunday", is_available=False),
+            MechanicAvailability(mechanic_id=mechanic_id, day_of_week="Monday", is_available=True),
+        ])
+        db.session.commit()
+
+        assert backfill_schedules_from_legacy() == 1
+        db.session.commit()
+        week_mask, tz_name = load_schedules([mechanic_id])[mechanic_id]
+        assert [day_mask(week_mask, weekday) for weekday in (0, 6)] == [FULL_DAY, 0]
+        assert week_mask | (FULL_DAY << 6 * SLOTS_PER_DAY) == FULL_WEEK
+        assert tz_name == app.config["DEFAULT_TIMEZONE"]
+        # Mechanics that already have a schedule are left alone
+        assert backfill_schedules_from_legacy() == 0
+
+
+def test_timezone_change_moves_override_windows(app, client, mechanic_id):
+    client.put(f"/mechanics/{mechanic_id}/schedule", json={"timezone": "UTC"})
+    upcoming = date.today() + timedelta(days=3)
+    client.post(f"/mechanics/{mechanic_id}/availability/overrides",
+                json={"date": upcoming.isoformat(), "is_available": False})
+
+    assert client.put(f"/mechanics/{mechanic_id}/schedule", json={"timezone": "Africa/Nairobi"}).status_code == 200
+
+    with app.app_context():
+        # Nairobi is UTC+3, so the local day starts at 21:00 UTC the day before
+        midnight = datetime.combine(upcoming, datetime.min.time())
+        assert mechanic_id not in available_at([mechanic_id], midnight - timedelta(hours=2))
+        assert mechanic_id in available_at([mechanic_id], midnight + timedelta(hours=22))
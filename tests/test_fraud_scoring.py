@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta
+
+import fraud_scoring
+from models import db, MechanicRiskProfile
+
+
+def test_scores_decay_as_reports_age_out_of_the_window(app, client, user_id, mechanic_id):
+    client.post("/reports/fraud", json={"user_id": user_id, "mechanic_id": mechanic_id, "reason": "Overcharged"})
+    with app.app_context():
+        before = db.session.get(MechanicRiskProfile, mechanic_id).risk_score
+
+        later = datetime.utcnow() + timedelta(days=2 * app.config["FRAUD_WINDOW_DAYS"])
+        assert fraud_scoring.rescore_decayed(now=later) == 1
+        profile = db.session.get(MechanicRiskProfile, mechanic_id)
+        # Both fixed windows have rolled past the report, so it drops out of the next run
+        assert profile.risk_score < before
+        assert fraud_scoring.rescore_decayed(now=later) == 0
+
+    queue = client.get("/admin/reports/fraud-queue").json["queue"]
+    assert [(entry["mechanic"]["id"], entry["risk_score"]) for entry in queue] == [(mechanic_id, profile.risk_score)]
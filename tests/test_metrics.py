@@ -0,0 +1,26 @@
+import pytest
+
+from metrics import http_requests
+
+
+def requests_counted(route, status):
+    return http_requests._values.get(("GET", route, status), 0)
+
+
+def test_unhandled_errors_are_counted_as_500s(app, client, monkeypatch):
+    def broken():
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(app.view_functions, "get_admin_reports_stats", broken)
+    before = requests_counted("/admin/reports/stats", "500")
+    with pytest.raises(RuntimeError):
+        client.get("/admin/reports/stats")
+
+    assert requests_counted("/admin/reports/stats", "500") == before + 1
+
+
+def test_handled_responses_keep_their_status(client):
+    before = requests_counted("/users/<int:user_id>", "404")
+    client.get("/users/999")
+
+    assert requests_counted("/users/<int:user_id>", "404") == before + 1
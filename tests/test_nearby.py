@@ -0,0 +1,63 @@
+import calendar
+
+from app import bounding_box
+
+NAIROBI = {"lat": -1.2833, "lng": 36.8167}
+
+
+def add_mechanic(client, n, latitude, longitude, service_ids):
+    return client.post("/mechanics", json={
+        "name": f"Mechanic {n}", "email": f"m{n}@example.com", "password": "secret",
+        "phone": f"+25471000000{n}", "latitude": latitude, "longitude": longitude, "service_ids": service_ids
+    }).json["mechanic"]["id"]
+
+
+def nearby(client, **params):
+    response = client.get("/mechanics/nearby", query_string=dict(NAIROBI, **params))
+    assert response.status_code == 200
+    return response.json["mechanics"]
+
+
+def test_nearby_mechanics_are_nearest_first_within_the_radius(client, service_id, mechanic_id):
+    # About 20 km and 5 km north of the fixture mechanic, added farthest first
+    far = add_mechanic(client, 1, NAIROBI["lat"] + 0.18, NAIROBI["lng"], [service_id])
+    near = add_mechanic(client, 2, NAIROBI["lat"] + 0.045, NAIROBI["lng"], [service_id])
+
+    found = nearby(client, radius_km=50)
+    assert [m["id"] for m in found] == [mechanic_id, near, far]
+    assert [round(m["distance_km"]) for m in found] == [0, 5, 20]
+    assert [m["id"] for m in nearby(client, radius_km=10)] == [mechanic_id, near]
+    assert [m["id"] for m in nearby(client, radius_km=50, limit=2)] == [mechanic_id, near]
+
+
+def test_nearby_mechanics_filter_by_service(client, service_id, mechanic_id):
+    other_service = client.post("/services", json={"name": "Tyres"}).json["service"]["id"]
+    tyres_only = add_mechanic(client, 1, NAIROBI["lat"], NAIROBI["lng"] + 0.01, [other_service])
+
+    assert {m["id"] for m in nearby(client)} == {mechanic_id, tyres_only}
+    assert [m["id"] for m in nearby(client, service_id=service_id)] == [mechanic_id]
+    assert [m["id"] for m in nearby(client, service_id=other_service)] == [tyres_only]
+
+
+def test_available_now_skips_mechanics_with_an_empty_schedule(client, service_id, mechanic_id):
+    off_duty = add_mechanic(client, 1, NAIROBI["lat"], NAIROBI["lng"], [service_id])
+    week_off = dict.fromkeys(calendar.day_name, [])
+    assert client.put(f"/mechanics/{off_duty}/schedule", json=week_off).status_code == 200
+
+    assert {m["id"] for m in nearby(client)} == {mechanic_id, off_duty}
+    assert [m["id"] for m in nearby(client, available_now="true")] == [mechanic_id]
+
+
+def test_nearby_search_crosses_the_antimeridian(client, service_id):
+    east = add_mechanic(client, 1, 0, -179.99, [service_id])
+
+    found = client.get("/mechanics/nearby", query_string={"lat": 0, "lng": 179.99, "radius_km": 10}).json
+    assert [m["id"] for m in found["mechanics"]] == [east]
+
+
+def test_bounding_box_widens_at_the_poles_and_the_antimeridian():
+    min_lat, max_lat, min_lng, max_lng = bounding_box(0, 0, 111.2)
+    assert round(min_lat) == -1 and round(max_lat) == 1
+    assert round(min_lng) == -1 and round(max_lng) == 1
+    assert bounding_box(89.5, 10, 100)[1:] == (90, -180, 180)
+    assert bounding_box(0, 179.9, 50)[2:] == (-180, 180)
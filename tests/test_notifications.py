@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import db, Admin, AdminFeedEntry, Notification, NotificationCounter
+from notifications import notification_service
+
+
+def add_admin(app, email):
+    with app.app_context():
+        admin = Admin(name=email, email=email, password="secret", role="admin", status="active")
+        db.session.add(admin)
+        db.session.commit()
+        return admin.id
+
+
+def test_admin_feed_shows_each_fan_out_once(app, client):
+    second = add_admin(app, "second@example.com")
+    with app.app_context():
+        admins = [("admin", admin_id) for admin_id, in db.session.query(Admin.id)]
+        notification_service.send(admins, "Fraud report", "Mechanic flagged", type="alert")
+        notification_service.send(admins, "Fraud report", "Mechanic flagged", type="alert")
+        db.session.commit()
+
+    feed = client.get("/admin/notifications").json
+    assert [(n["title"], n["is_read"]) for n in feed] == [("Fraud report", False), ("Fraud report", False)]
+
+    client.post(f"/notifications/admin/{second}/read", json={"all": True})
+    feed = client.get("/admin/notifications").json
+    assert [n["is_read"] for n in feed] == [True, True]
+
+
+def test_admin_feed_is_backfilled_from_existing_notifications(app, client):
+    add_admin(app, "second@example.com")
+    with app.app_context():
+        admins = [admin_id for admin_id, in db.session.query(Admin.id)]
+        # Written before fan-outs were recorded: two copies of one alert and a legacy broadcast
+        db.session.execute(insert(Notification), [
+            {"admin_id": admin_id, "title": "Fraud report", "message": "m", "is_read": False,
+             "created_at": datetime(2026, 1, 1)} for admin_id in admins
+        ] + [{"title": "Legacy", "message": "Broadcast", "is_read": False, "created_at": datetime(2026, 1, 2)}])
+        db.session.commit()
+        AdminFeedEntry.__table__.drop(db.engine)
+        AdminFeedEntry.__table__.create(db.engine)
+
+    feed = client.get("/admin/notifications").json
+    assert [n["title"] for n in feed] == ["Legacy", "Fraud report"]
+
+
+def test_counters_are_backfilled_when_their_table_is_created(app, user_id):
+    with app.app_context():
+        db.session.execute(insert(Notification), [
+            {"user_id": user_id, "title": "t", "message": "m", "is_read": False},
+            {"user_id": user_id, "title": "t", "message": "m", "is_read": False},
+            {"user_id": user_id, "title": "t", "message": "m", "is_read": True},
+        ])
+        db.session.commit()
+        NotificationCounter.__table__.drop(db.engine)
+        NotificationCounter.__table__.create(db.engine)
+
+        assert notification_service.unread_count("user", user_id) == 2
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFTEST = """
+import os
+
+os.environ["APP_ENV"] = "testing"
+"""
+
+TESTS = """
+import pytest
+from sqlalchemy import text
+
+from app import app
+from models import db
+
+
+def run(times):
+    with app.app_context():
+        for n in range(times):
+            db.session.execute(text("SELECT :n"), {"n": n})
+
+
+def test_clean():
+    run(1)
+
+
+def test_repeated():
+    run(6)
+
+
+@pytest.mark.allow_n_plus_one
+def test_repeated_but_allowed():
+    run(6)
+"""
+
+
+@pytest.fixture
+def pytester(pytester, monkeypatch):
+    # The app is imported fresh in a subprocess, after the plugin sets QUERY_PROFILER
+    monkeypatch.setenv("PYTHONPATH", REPO_ROOT)
+    monkeypatch.delenv("QUERY_PROFILER", raising=False)
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(test_queries=TESTS)
+    return pytester
+
+
+def test_repeated_queries_fail_the_test(pytester):
+    result = pytester.runpytest_subprocess("-p", "pytest_query_profiler")
+
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines(["*1 new N+1 query pattern(s):*", "*FAILED test_queries.py::test_repeated - *"])
+    result.stdout.no_fnmatch_line("*test_clean - *")
+
+
+def test_baseline_tolerates_recorded_findings(pytester):
+    pytester.runpytest_subprocess("-p", "pytest_query_profiler", "--n-plus-one-update-baseline")
+    result = pytester.runpytest_subprocess("-p", "pytest_query_profiler")
+
+    result.assert_outcomes(passed=3)
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+import report_dedup
+from models import db, FraudReportDedup
+
+
+def test_repeats_collapse_within_a_sliding_window(app, user_id, mechanic_id):
+    with app.app_context():
+        window = timedelta(seconds=app.config["FRAUD_DEDUP_WINDOW"])
+        start = datetime(2026, 1, 1, 23, 0)
+
+        def claim(at):
+            return report_dedup.claim(user_id, mechanic_id, None, "Overcharged", now=at)[1]
+
+        assert claim(start) is None
+        # Each repeat is within the window of the one before, across any fixed boundary
+        assert claim(start + window - timedelta(minutes=1)).repeat_count == 1
+        assert claim(start + 2 * window - timedelta(minutes=2)).repeat_count == 2
+        # After a quiet window the same report counts as new again
+        assert claim(start + 4 * window) is None
+        db.session.commit()
+
+        assert report_dedup.purge_expired(now=start + 5 * window - timedelta(minutes=1)) == 0
+        assert report_dedup.purge_expired(now=start + 5 * window + timedelta(minutes=1)) == 1
+        assert FraudReportDedup.query.count() == 0
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+import pytest
+
+from models import db, SchedulerLease
+from scheduler import Scheduler, acquire_lease, heartbeat
+
+
+@pytest.fixture
+def scheduler():
+    return Scheduler()
+
+
+def lease_expiry(app, name):
+    with app.app_context():
+        return db.session.get(SchedulerLease, name).expires_at
+
+
+def test_lease_is_held_for_the_whole_run(app, scheduler):
+    seen = []
+
+    @scheduler.register("slow", interval=0.01)
+    def slow():
+        # Far past interval * 0.9, yet no other worker may take over
+        seen.append(acquire_lease("job:slow", 60, owner="other-worker"))
+        return "done"
+
+    assert scheduler.run_job(app, scheduler.jobs["slow"]) == "done"
+    assert seen == [False]
+
+
+def test_lease_is_cut_back_to_the_interval_when_the_job_ends(app, scheduler):
+    @scheduler.register("hourly", interval=3600)
+    def hourly():
+        return None
+
+    job = scheduler.jobs["hourly"]
+    scheduler.run_job(app, job)
+    assert lease_expiry(app, "job:hourly") == job.last_started_at + timedelta(seconds=3240)
+
+
+def test_heartbeat_extends_the_lease_and_stops_a_job_that_lost_it(app, scheduler):
+    @scheduler.register("batches", interval=3600)
+    def batches():
+        before = db.session.get(SchedulerLease, "job:batches").expires_at
+        heartbeat()
+        db.session.expire_all()
+        assert db.session.get(SchedulerLease, "job:batches").expires_at >= before
+        # Another worker took over, e.g. after this one stalled past the TTL
+        SchedulerLease.query.filter_by(name="job:batches").update({"owner": "other-worker"})
+        db.session.commit()
+        heartbeat()
+        return "unreachable"
+
+    job = scheduler.jobs["batches"]
+    assert scheduler.run_job(app, job) is None
+    assert job.failures == 1
+    assert "job:batches" in job.last_error
+
+
+def test_heartbeat_outside_a_job_does_nothing(app):
+    with app.app_context():
+        heartbeat()
@@ -0,0 +1,18 @@
+import pytest
+
+
+def found(client, query, **params):
+    response = client.get("/admin/search", query_string=dict(params, q=query))
+    assert response.status_code == 200
+    return [(hit["type"], hit["id"]) for hit in response.json["results"]]
+
+
+@pytest.mark.parametrize("query", ["alice@example.com", "alice@exa", "example.com", "254700000001", "+2547"])
+def test_emails_and_phones_match_whole_or_by_prefix(client, user_id, query):
+    assert found(client, query) == [("user", user_id)]
+
+
+def test_every_word_must_match_and_type_filters(client, user_id, mechanic_id):
+    assert sorted(found(client, "example.com")) == [("mechanic", mechanic_id), ("user", user_id)]
+    assert found(client, "example.com", type="mechanic") == [("mechanic", mechanic_id)]
+    assert found(client, "alice joe") == []
@@ -1,10 +1,12 @@
 import os
+import logging
 from flask import Blueprint, request, jsonify
 from firebase_admin import storage
 import uuid
 
 # Define a Flask Blueprint for the upload routes
 upload_routes = Blueprint('upload_routes', __name__)
+logger = logging.getLogger(__name__)
 
 @upload_routes.route('/upload-image', methods=['POST'])
 def upload_image():
@@ -35,9 +37,9 @@ def upload_image():
         # The public URL is generated after the upload is complete
         public_url = blob.public_url
 
-        print(f"✅ File uploaded successfully: {public_url}")
+        logger.info("File uploaded", extra={"url": public_url})
         return jsonify({"url": public_url}), 200
 
-    except Exception as e:
-        print(f"Error during file upload: {e}")
+    except Exception:
+        logger.exception("Error during file upload")
         return jsonify({"error": "Failed to upload file to Firebase"}), 500